@@ -1,6 +1,12 @@
 ﻿import streamlit as st
-import pandas as pd
 from src.planner.hybrid_agent import run_hybrid_agent
+from src.rag.requirement_store import RequirementStore
+from src.rag.ingestion_jobs import IngestionJobManager, IngestionQueueFull
+from src.utils.single_flight import get_coalescing_stats
+from src.utils.token_usage import get_token_usage_stats
+from src.utils.deadline import DEFAULT_REQUEST_DEADLINE_SEC, Deadline
+from src.sql_agent.formatter import to_display_table
+from src.sql_agent.schema_refresher import start_schema_refresher
 
 st.set_page_config(
     page_title="Vendor Intelligence Agent POC",
@@ -11,6 +17,33 @@ st.title("🧠 Vendor Intelligence Agent (Hybrid SQL + RAG)")
 st.caption("Planner-Based | Schema-Aware | Secure SQL | Requirement Matching")
 
 
+@st.cache_resource
+def get_requirement_store():
+    # Shared across sessions, persisted under data/requirement_store
+    return RequirementStore()
+
+
+requirement_store = get_requirement_store()
+
+
+@st.cache_resource
+def get_ingestion_jobs():
+    # Background extraction / chunking / embedding, shared across sessions
+    return IngestionJobManager(requirement_store)
+
+
+ingestion_jobs = get_ingestion_jobs()
+
+
+@st.cache_resource
+def get_schema_refresher():
+    # Enabled by SCHEMA_REFRESH_INTERVAL_SEC; None when unset
+    return start_schema_refresher()
+
+
+get_schema_refresher()
+
+
 # =====================================
 # SIDEBAR
 # =====================================
@@ -22,6 +55,44 @@ show_sql = st.sidebar.checkbox("Show SQL Query", value=True)
 show_rag = st.sidebar.checkbox("Show RAG Chunks", value=True)
 show_scoring = st.sidebar.checkbox("Show Scoring", value=True)
 
+retrieval_mode = st.sidebar.selectbox(
+    "Requirement Retrieval",
+    ["hybrid", "lexical", "vector"],
+    help="lexical = BM25 only (no embedding call), hybrid = BM25 + vector fused"
+)
+
+deadline_sec = st.sidebar.number_input(
+    "Request Deadline (sec)",
+    min_value=1.0,
+    value=DEFAULT_REQUEST_DEADLINE_SEC,
+    step=5.0,
+    help="End-to-end budget; stages still running at the deadline are cancelled"
+)
+
+with st.sidebar.expander("Request Coalescing"):
+    st.json(get_coalescing_stats())
+
+with st.sidebar.expander("LLM Token Usage"):
+    st.json(get_token_usage_stats())
+
+st.sidebar.header("Requirement Library")
+
+stored_documents = {
+    f"{d['name']} ({d['chunk_count']} chunks, {d['status']})": d["document_id"]
+    for d in requirement_store.list_documents()
+}
+
+selected_documents = st.sidebar.multiselect(
+    "Search stored documents",
+    list(stored_documents.keys())
+)
+selected_document_ids = [stored_documents[label] for label in selected_documents]
+
+if selected_document_ids and st.sidebar.button("Delete selected documents"):
+    for doc_id in selected_document_ids:
+        requirement_store.delete_document(doc_id)
+    st.rerun()
+
 
 # =====================================
 # INPUT SECTION
@@ -32,11 +103,66 @@ user_query = st.text_input(
     placeholder="Example: Find construction vendors in Selangor with CIDB"
 )
 
-uploaded_file = st.file_uploader(
-    "Upload requirement document (optional)",
-    type=["pdf", "txt"]
+uploaded_files = st.file_uploader(
+    "Upload requirement documents (optional)",
+    type=["pdf", "txt"],
+    accept_multiple_files=True
 )
 
+# Each upload becomes a background ingestion job (once per file)
+submitted_jobs = st.session_state.setdefault("ingestion_jobs", {})
+
+for f in uploaded_files or []:
+    if f.file_id not in submitted_jobs:
+        try:
+            submitted_jobs[f.file_id] = ingestion_jobs.submit(f.name, f.type, f.getvalue())
+        except IngestionQueueFull:
+            st.warning(f"{f.name}: ingestion queue is full; it is submitted again on the next run.")
+
+# Uploads whose job was accepted
+accepted_files = [f for f in uploaded_files or [] if f.file_id in submitted_jobs]
+
+upload_document_ids = [
+    submitted_jobs[f.file_id]["document_id"] for f in accepted_files
+]
+
+
+def ingestion_fraction(job):
+    pages = job["pages_done"] / job["pages_total"] if job["pages_total"] else 0.0
+    batches = job["batches_done"] / job["batches_total"] if job["batches_total"] else 0.0
+    return 1.0 if job["status"] == "done" else 0.3 * pages + 0.7 * batches
+
+
+active_jobs = [
+    ingestion_jobs.get(submitted_jobs[f.file_id]["job_id"]) for f in accepted_files
+]
+
+
+@st.fragment(run_every=1.0 if any(j["status"] not in ("done", "failed") for j in active_jobs) else None)
+def show_ingestion_progress():
+    for f in accepted_files:
+        job = ingestion_jobs.get(submitted_jobs[f.file_id]["job_id"])
+        st.progress(
+            ingestion_fraction(job),
+            text=(
+                f"{job['name']}: {job['status']} | "
+                f"pages {job['pages_done']}/{job['pages_total'] or '?'} | "
+                f"chunks {job['chunks_total'] if job['chunks_total'] is not None else '?'} | "
+                f"batches {job['batches_done']}/{job['batches_total'] or '?'} | "
+                f"duplicates skipped {job['duplicate_chunks']}"
+            )
+        )
+        if job["error"]:
+            st.error(f"{job['name']}: {job['error']}")
+
+
+if active_jobs:
+    show_ingestion_progress()
+    st.caption(
+        "Queries can run now; they search whatever has been indexed so far "
+        "(vendors are scored once some requirement text is indexed)."
+    )
+
 run_button = st.button("Run Hybrid Agent")
 
 
@@ -46,20 +172,51 @@ run_button = st.button("Run Hybrid Agent")
 
 if run_button and user_query:
 
+    # Live view of plan / SQL fields as they stream in
+    live_plan = st.empty()
+    live_sql = st.empty()
+    streamed_fields = {}
+
+    def render_progress(stage, key, value):
+        streamed_fields.setdefault(stage, {})[key] = value
+        if stage == "sql":
+            if key == "sql" and show_sql:
+                live_sql.code(value, language="sql")
+        elif show_plan:
+            live_plan.json(streamed_fields)
+
     with st.spinner("Running Hybrid Intelligence Engine..."):
 
-        result = run_hybrid_agent(
+        # Kept in session state so result paging survives reruns
+        st.session_state["result"] = run_hybrid_agent(
             user_query=user_query,
-            uploaded_file=uploaded_file
+            retrieval_mode=retrieval_mode,
+            requirement_store=requirement_store,
+            document_ids=selected_document_ids + upload_document_ids,
+            on_event=render_progress,
+            deadline=Deadline(deadline_sec)
         )
 
+    live_plan.empty()
+    live_sql.empty()
+
     st.success("Execution Completed")
 
+result = st.session_state.get("result")
+
+if result:
+
     hybrid_plan = result.get("hybrid_plan")
     sql_result = result.get("sql_result")
     rag_result = result.get("rag_result")
     scored_result = result.get("scored_result")
 
+    if result.get("degraded"):
+        st.warning(
+            "Partial result (deadline reached):\n"
+            + "\n".join(f"- {d['stage']}: {d['reason']}" for d in result["degraded"])
+        )
+
     # =====================================
     # TABS
     # =====================================
@@ -79,16 +236,38 @@ if run_button and user_query:
 
         if scored_result:
             st.subheader("🏆 Ranked Vendors")
-            st.dataframe(scored_result["ranked_dataframe"])
+            st.dataframe(to_display_table(scored_result["ranked_dataframe"]))
+            if show_scoring:
+                st.caption(
+                    f"Lexical prefilter over {scored_result['total_candidates']} rows | "
+                    f"embedding rerank of top {scored_result['rerank_top_n']} "
+                    f"({scored_result['candidates_embedded']} embedded)"
+                )
         elif sql_result and sql_result.get("dataframe") is not None:
             st.subheader("SQL Results")
-            st.dataframe(sql_result["dataframe"])
+            st.dataframe(to_display_table(sql_result["dataframe"]))
         elif rag_result:
             st.subheader("RAG Output")
             st.write(rag_result)
         else:
             st.warning("No results returned.")
 
+        pager = sql_result.get("pager") if sql_result else None
+
+        if pager and st.checkbox("Browse full result set"):
+            page_number = st.number_input("Page", min_value=1, value=1, step=1) - 1
+
+            try:
+                page_df = pager.get_page(page_number)
+                st.caption(
+                    f"Page {page_number + 1} | {pager.page_size} rows per page | "
+                    f"{pager.strategy} paging"
+                    + ("" if pager.has_next(page_number) else " | last page")
+                )
+                st.dataframe(to_display_table(page_df))
+            except Exception as e:
+                st.error(f"Failed to load page: {e}")
+
     # -------------------------------------
     # TAB 2 - PLAN
     # -------------------------------------
@@ -110,9 +289,31 @@ if run_button and user_query:
                 if show_sql:
                     st.subheader("Generated SQL")
                     st.code(sql_result.get("sql"), language="sql")
+                    if sql_result.get("sql_params"):
+                        st.write("Bound Parameters:", list(sql_result["sql_params"]))
+
+                st.write("SQL Source:", sql_result.get("sql_source"))
+
+                cost_review = sql_result.get("cost_review")
+                if cost_review:
+                    st.write("Scan Risk:", cost_review["risk"], cost_review["access"])
+                    for rewrite in cost_review["rewrites"]:
+                        st.caption(f"Rewritten: {rewrite}")
+                    # The scan risk alone can trigger "warn"; only list
+                    # findings worth acting on
+                    serious = [
+                        f for f in cost_review["findings"]
+                        if f["risk"] in ("medium", "high")
+                    ]
+                    if cost_review["action"] == "warn" and serious:
+                        st.warning("\n".join(
+                            f"- {f['table']}.{f['column']}: {f['detail']}"
+                            for f in serious
+                        ))
 
                 st.write("Row Count:", sql_result.get("row_count"))
                 st.write("Execution Time (sec):", sql_result.get("execution_time_sec"))
+                st.write("Result Memory (bytes):", sql_result.get("memory_bytes"))
 
             else:
                 st.error("SQL Stage Failed")
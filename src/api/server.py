@@ -0,0 +1,291 @@
+import os
+import asyncio
+import functools
+import threading
+import uvicorn
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from pydantic import BaseModel
+from src.planner.hybrid_agent import run_hybrid_agent
+from src.sql_agent.sql_agent import run_sql_agent
+from src.sql_agent.paginator import ResultPager
+from src.rag.rag_pipeline import run_store_rag_pipeline
+from src.rag.requirement_store import RequirementStore
+from src.rag.file_processor import UploadedDocument
+from src.rag.ingestion_jobs import IngestionJobManager, IngestionQueueFull
+from src.sql_agent.schema_refresher import start_schema_refresher
+from src.utils.single_flight import get_coalescing_stats
+from src.utils.token_usage import get_token_usage_stats
+from src.utils.deadline import Deadline
+from src.utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+# ============================
+# ⚙️ CONFIG
+# ============================
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8080"))
+API_WORKERS = int(os.getenv("API_WORKERS", str(os.cpu_count() or 1)))
+
+# Per worker process: pipelines running at once, and requests allowed to wait
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "4"))
+API_MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "16"))
+
+
+# ============================
+# 🚦 BOUNDED REQUEST QUEUE
+# ============================
+
+class AdmissionQueue:
+    """
+    Runs blocking pipeline calls on a fixed thread pool.
+    At most max_concurrency run and max_queue wait; anything beyond
+    that is rejected with 503 + Retry-After so the load balancer
+    can send it to another replica.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="pipeline"
+        )
+        self.max_concurrency = max_concurrency
+        self.capacity = max_concurrency + max_queue
+        self.admitted = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    async def run(self, fn, *args, **kwargs):
+        with self.lock:
+            if self.admitted >= self.capacity:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server busy, retry later.",
+                    headers={"Retry-After": "1"}
+                )
+            self.admitted += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor,
+                functools.partial(fn, *args, **kwargs)
+            )
+        finally:
+            with self.lock:
+                self.admitted -= 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "running": min(self.admitted, self.max_concurrency),
+                "queued": max(self.admitted - self.max_concurrency, 0),
+                "capacity": self.capacity,
+                "rejected": self.rejected
+            }
+
+
+admission = AdmissionQueue(API_MAX_CONCURRENCY, API_MAX_QUEUE)
+
+# One instance per worker; all workers share the on-disk store
+requirement_store = RequirementStore()
+ingestion_jobs = IngestionJobManager(requirement_store)
+
+
+# ============================
+# 📦 SERIALIZATION
+# ============================
+
+async def read_uploads(files: Optional[List[UploadFile]]) -> List[UploadedDocument]:
+    return [
+        UploadedDocument(f.filename, await f.read(), f.content_type)
+        for f in (files or [])
+    ]
+
+
+def to_jsonable(value):
+    """
+    Pipeline results -> JSON: DataFrames become records, numpy scalars
+    become Python values, NaN becomes null, result pagers are dropped.
+    """
+    if isinstance(value, pd.DataFrame):
+        frame = value.astype(object).where(value.notna(), None)
+        return [to_jsonable(row) for row in frame.to_dict(orient="records")]
+    if isinstance(value, dict):
+        return {
+            k: to_jsonable(v) for k, v in value.items()
+            if not isinstance(v, ResultPager)
+        }
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def parse_document_ids(document_ids: Optional[str]) -> Optional[List[str]]:
+    if not document_ids:
+        return None
+    return [d.strip() for d in document_ids.split(",") if d.strip()]
+
+
+# ============================
+# 🌐 APP
+# ============================
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Enabled by SCHEMA_REFRESH_INTERVAL_SEC
+    start_schema_refresher()
+    yield
+    admission.executor.shutdown(wait=False)
+
+
+app = FastAPI(title="Vendor Intelligence API", lifespan=lifespan)
+
+
+class SQLRequest(BaseModel):
+    query: str
+    has_uploaded_file: bool = False
+    deadline_sec: Optional[float] = None
+
+
+def request_deadline(deadline_sec: Optional[float]) -> Deadline:
+    # Starts at admission, so time spent queued counts against the budget
+    return Deadline(deadline_sec) if deadline_sec is not None else Deadline()
+
+
+@app.get("/health")
+def health():
+    return {
+        "status": "ok",
+        "pid": os.getpid(),
+        "queue": admission.stats(),
+        "ingestion": ingestion_jobs.stats(),
+        "coalescing": get_coalescing_stats(),
+        "token_usage": get_token_usage_stats()
+    }
+
+
+@app.post("/sql")
+async def sql_endpoint(request: SQLRequest):
+    result = await admission.run(
+        run_sql_agent,
+        user_query=request.query,
+        has_uploaded_file=request.has_uploaded_file,
+        deadline=request_deadline(request.deadline_sec)
+    )
+    return to_jsonable(result)
+
+
+@app.post("/rag")
+async def rag_endpoint(
+    query: Optional[str] = Form(None),
+    retrieval_mode: str = Form("hybrid"),
+    document_ids: Optional[str] = Form(None),
+    deadline_sec: Optional[float] = Form(None),
+    files: Optional[List[UploadFile]] = File(None)
+):
+    uploads = await read_uploads(files)
+
+    if not uploads and not document_ids:
+        raise HTTPException(status_code=400, detail="Upload a file or pass document_ids.")
+
+    deadline = request_deadline(deadline_sec)
+    result = await admission.run(
+        run_store_rag_pipeline,
+        requirement_store,
+        uploaded_files=uploads,
+        user_query=query,
+        retrieval_mode=retrieval_mode,
+        document_ids=parse_document_ids(document_ids),
+        deadline=deadline
+    )
+    return to_jsonable(dict(result, degraded=deadline.degraded))
+
+
+@app.post("/hybrid")
+async def hybrid_endpoint(
+    query: str = Form(...),
+    retrieval_mode: str = Form("hybrid"),
+    document_ids: Optional[str] = Form(None),
+    deadline_sec: Optional[float] = Form(None),
+    files: Optional[List[UploadFile]] = File(None)
+):
+    uploads = await read_uploads(files)
+
+    result = await admission.run(
+        run_hybrid_agent,
+        user_query=query,
+        uploaded_file=uploads,
+        retrieval_mode=retrieval_mode,
+        requirement_store=requirement_store,
+        document_ids=parse_document_ids(document_ids),
+        deadline=request_deadline(deadline_sec)
+    )
+    return to_jsonable(result)
+
+
+@app.get("/documents")
+def list_documents():
+    return requirement_store.list_documents()
+
+
+@app.post("/ingest")
+async def ingest_endpoint(files: List[UploadFile] = File(...)):
+    """
+    Returns job and document ids immediately; ingestion runs in the
+    background. Document ids can be queried right away via /rag or /hybrid.
+
+    503 + Retry-After when the pipeline queue or this worker's ingestion
+    queue is full. Files of the request accepted before that keep
+    ingesting; sending them again is harmless (same document ids).
+    """
+    uploads = await read_uploads(files)
+    return await admission.run(submit_ingestion_jobs, uploads)
+
+
+def submit_ingestion_jobs(uploads: List[UploadedDocument]) -> List[dict]:
+    try:
+        return [
+            dict(ingestion_jobs.submit(u.name, u.type, u.getvalue()), name=u.name)
+            for u in uploads
+        ]
+    except IngestionQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Ingestion queue full, retry later.",
+            headers={"Retry-After": "5"}
+        )
+
+
+@app.get("/ingest/{job_id}")
+def ingest_status(job_id: str):
+    # Any worker can answer: job status is kept in the shared store
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    return job
+
+
+# ============================
+# 🚀 RUN DIRECTLY
+# ============================
+
+if __name__ == "__main__":
+    # Several worker processes share data/ (schema cache, templates, requirement store)
+    uvicorn.run(
+        "src.api.server:app",
+        host=API_HOST,
+        port=API_PORT,
+        workers=API_WORKERS
+    )
@@ -0,0 +1,349 @@
+import os
+import base64
+import re
+import json
+import time
+import hashlib
+import threading
+import contextlib
+import numpy as np
+import httpx
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from openai import APITimeoutError
+import src.sql_agent.executor as executor
+from src.utils.clients import set_openai_client
+from src.sql_agent.schema_loader import SCHEMA_CACHE_PATH, set_current_schema
+
+
+# ============================
+# ⏱️ LATENCY MODEL
+# ============================
+
+class LatencyModel:
+    """
+    Log-normal latency fitted to a median and p95 (milliseconds):
+    most calls are near the median, with a long right tail.
+    """
+
+    def __init__(self, median_ms: float, p95_ms: float):
+        self.mu = np.log(median_ms / 1000.0)
+        self.sigma = max(np.log(p95_ms / median_ms) / 1.645, 1e-6)
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return float(rng.lognormal(self.mu, self.sigma))
+
+
+class StageRecorder:
+    """
+    Thread-safe latency samples (seconds) per stage name.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+
+    def record(self, stage: str, seconds: float):
+        with self.lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    @contextlib.contextmanager
+    def timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        with self.lock:
+            return {stage: list(values) for stage, values in self.samples.items()}
+
+
+# ============================
+# 🗄️ SYNTHETIC VENDOR DATA
+# ============================
+
+FAKE_SCHEMA = {
+    "database": "loadtest",
+    "version": {"max_modify_date": "loadtest", "object_count": 1},
+    "tables": [
+        {
+            "name": "Vendors",
+            "columns": [
+                {"name": "VendorID", "type": "int", "nullable": False},
+                {"name": "VendorName", "type": "nvarchar", "nullable": False},
+                {"name": "Industry", "type": "nvarchar", "nullable": True},
+                {"name": "State", "type": "nvarchar", "nullable": True},
+                {"name": "Certification", "type": "nvarchar", "nullable": True},
+                {"name": "AnnualSpend", "type": "decimal", "nullable": True}
+            ],
+            "primary_keys": ["VendorID"],
+            "foreign_keys": [],
+            "indexes": []
+        }
+    ]
+}
+
+INDUSTRIES = ["Construction", "Electrical", "Civil Works", "IT Services", "Security", "Cleaning"]
+STATES = ["Gauteng", "Western Cape", "KwaZulu-Natal", "Limpopo", "Free State"]
+CERTIFICATIONS = ["CIDB 7CE", "CIDB 5GB", "ISO 9001", "ISO 14001", "B-BBEE Level 1", "None"]
+
+REQUIREMENT_PHRASES = [
+    "The contractor must hold a valid CIDB grading",
+    "Proof of ISO 9001 certification is required",
+    "Bidders shall demonstrate five years of relevant experience",
+    "A B-BBEE certificate must accompany the submission",
+    "Site safety plans must comply with the OHS Act",
+    "The service provider must be registered on the CSD",
+    "Electrical work requires a registered master installation electrician",
+    "Tender validity period is ninety days from closing"
+]
+
+
+def vendor_rows(count: int, seed: int = 7) -> List[Dict]:
+    # Same shapes pymssql returns (Decimal for DECIMAL columns)
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "VendorID": i + 1,
+            "VendorName": f"Vendor {i + 1:05d} (Pty) Ltd",
+            "Industry": INDUSTRIES[rng.integers(len(INDUSTRIES))],
+            "State": STATES[rng.integers(len(STATES))],
+            "Certification": CERTIFICATIONS[rng.integers(len(CERTIFICATIONS))],
+            "AnnualSpend": Decimal(f"{rng.uniform(1e4, 5e7):.2f}")
+        }
+        for i in range(count)
+    ]
+
+
+def requirement_document(size_kb: int, rng: np.random.Generator) -> bytes:
+    lines = []
+    size = 0
+    while size < size_kb * 1024:
+        line = f"{len(lines) + 1}. {REQUIREMENT_PHRASES[rng.integers(len(REQUIREMENT_PHRASES))]}."
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines).encode("utf-8")
+
+
+# ============================
+# 🤖 FAKE AZURE OPENAI
+# ============================
+
+def _between(text: str, start: str, end: str) -> str:
+    match = re.search(re.escape(start) + r"\s*(.*?)\s*" + re.escape(end), text, re.S)
+    return match.group(1) if match else ""
+
+
+class FakeStream:
+    """
+    Iterable of chat completion chunks; generation time is spread
+    evenly across chunks.
+    """
+
+    def __init__(self, text: str, generation: float, chunk_chars: int = 8):
+        self.pieces = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        self.per_chunk = generation / max(len(self.pieces), 1)
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.closed = True
+
+    def __iter__(self):
+        for piece in self.pieces:
+            if self.closed:
+                return
+            delta = SimpleNamespace(content=piece)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+            time.sleep(self.per_chunk)
+
+
+class FakeOpenAI:
+    """
+    Stands in for the shared AzureOpenAI client (chat + embeddings).
+    Responses are derived from the prompts so the real pipeline
+    (planner -> SQL generation -> validation -> execution) runs unchanged.
+    """
+
+    def __init__(self, backends: "FakeBackends", timeout: Optional[float] = None):
+        self.backends = backends
+        self.timeout = timeout
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.embeddings = SimpleNamespace(create=self._embed)
+
+    def with_options(self, timeout=None, **kwargs):
+        return FakeOpenAI(self.backends, timeout=timeout)
+
+    def _sleep(self, seconds: float):
+        # A real client raises once its timeout elapses
+        if self.timeout is not None and seconds > self.timeout:
+            time.sleep(self.timeout)
+            raise APITimeoutError(request=httpx.Request("POST", "https://loadtest.invalid"))
+        time.sleep(seconds)
+
+    def _chat(self, messages, stream=False, **kwargs):
+        system, user = messages[0]["content"], messages[1]["content"]
+        stage, payload = self.backends.respond(system, user)
+
+        first_token = self.backends.sample("llm_first_token")
+        generation = self.backends.sample("llm_generation")
+        self.backends.recorder.record(f"llm:{stage}", first_token + generation)
+
+        if stream:
+            self._sleep(first_token)
+            return FakeStream(json.dumps(payload), generation)
+
+        self._sleep(first_token + generation)
+        message = SimpleNamespace(content=json.dumps(payload))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def _embed(self, model, input, dimensions=None, encoding_format="float", **kwargs):
+        # Latency grows with batch size
+        seconds = self.backends.sample("embedding") * (1 + len(input) / 256)
+        self.backends.recorder.record("embedding", seconds)
+        self._sleep(seconds)
+
+        data = []
+        for text in input:
+            vector = self.backends.embedding(text, dimensions)
+            if encoding_format == "base64":
+                data.append(SimpleNamespace(embedding=base64.b64encode(vector.tobytes()).decode("ascii")))
+            else:
+                data.append(SimpleNamespace(embedding=vector.tolist()))
+        return SimpleNamespace(data=data)
+
+
+# ============================
+# 🗄️ FAKE AZURE SQL
+# ============================
+
+class FakeCursor:
+
+    def __init__(self, backends: "FakeBackends"):
+        self.backends = backends
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        seconds = self.backends.sample("sql")
+        self.backends.recorder.record("sql_execute", seconds)
+        time.sleep(seconds)
+
+        top = re.search(r"\bTOP\s*\(?\s*(\d+)", sql, re.I)
+        count = int(top.group(1)) if top else self.backends.profile["sql_rows"]
+        self.rows = self.backends.rows[:min(count, self.backends.profile["sql_rows"])]
+
+    def fetchall(self):
+        return [dict(row) for row in self.rows]
+
+
+class FakeConnection:
+
+    def __init__(self, backends: "FakeBackends"):
+        self.backends = backends
+
+    def cursor(self, as_dict=False):
+        return FakeCursor(self.backends)
+
+    def close(self):
+        pass
+
+
+# ============================
+# 🧪 BACKEND BUNDLE
+# ============================
+
+class FakeBackends:
+    """
+    Fake LLM, embedding and SQL backends driven by a load profile.
+
+    install() swaps them in for the shared OpenAI client and the SQL
+    connection factory, and restores the originals on exit.
+    """
+
+    def __init__(self, profile: Dict, recorder: StageRecorder, seed: int = 0):
+        self.profile = profile
+        self.recorder = recorder
+        self.latency = {
+            name: LatencyModel(cfg["median"], cfg["p95"])
+            for name, cfg in profile["latency_ms"].items()
+        }
+        self.rng = np.random.default_rng(seed)
+        self.rng_lock = threading.Lock()
+        self.rows = vendor_rows(max(profile["sql_rows"], 1))
+        self.queries = {q["text"]: q for q in profile["queries"]}
+
+    def sample(self, name: str) -> float:
+        with self.rng_lock:
+            return self.latency[name].sample(self.rng)
+
+    def embedding(self, text: str, dimensions: Optional[int] = None) -> np.ndarray:
+        # Deterministic per text so identical chunks match
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.profile["embedding_dim"])
+        if dimensions:
+            # Shortened like the API does: truncate, then re-normalise
+            vector = vector[:dimensions]
+        return (vector / np.linalg.norm(vector)).astype("<f4")
+
+    def respond(self, system: str, user: str):
+        if "Hybrid Planning Agent" in system:
+            query = self.queries.get(_between(user, "User Query:", "Document Uploaded:"), {})
+            has_document = _between(user, "Document Uploaded:", "Decide") == "True"
+            mode = query.get("mode", "sql_only")
+            if not has_document and mode != "sql_only":
+                mode = "sql_only"
+            return "hybrid_plan", {
+                "mode": mode,
+                "execution_steps": ["plan", "execute"],
+                "reasoning": ["Synthetic load-test plan."] * 4
+            }
+
+        if "query planning agent" in system:
+            query = self.queries.get(_between(user, "User Query:", "Schema Summary:"), {})
+            rag_only = query.get("mode") == "rag_only"
+            return "sql_plan", {
+                "intent": "vendor_search",
+                "tables": [] if rag_only else ["Vendors"],
+                "columns": ["VendorID", "VendorName", "Industry", "State", "Certification", "AnnualSpend"],
+                "filters": query.get("filters", {}),
+                "aggregations": {"type": "", "column": ""},
+                "requires_rag": query.get("mode", "sql_only") != "sql_only",
+                "reasoning": ["Synthetic load-test plan."] * 4
+            }
+
+        plan = json.loads(_between(user, "Structured Plan:", "Relevant Schema Metadata:") or "{}")
+        where = " AND ".join(
+            f"{column} = N'{str(value).replace(chr(39), chr(39) * 2)}'"
+            for column, value in (plan.get("filters") or {}).items()
+        )
+        sql = "SELECT TOP 50 " + ", ".join(plan.get("columns") or ["VendorID"]) + " FROM Vendors"
+        if where:
+            sql += " WHERE " + where
+        return "sql_generate", {"sql": sql, "tables_used": ["Vendors"], "notes": []}
+
+    @contextlib.contextmanager
+    def install(self):
+        original_client = set_openai_client(FakeOpenAI(self))
+        original_connection = executor.get_connection
+
+        executor.get_connection = lambda timeout=executor.SQL_EXECUTION_TIMEOUT_SEC: FakeConnection(self)
+        set_current_schema(FAKE_SCHEMA, _cache_mtime())
+        try:
+            yield self
+        finally:
+            set_openai_client(original_client)
+            executor.get_connection = original_connection
+            set_current_schema(None, None)
+
+
+def _cache_mtime():
+    # Matching the on-disk mtime keeps get_current_schema() on the fake schema
+    return os.path.getmtime(SCHEMA_CACHE_PATH) if os.path.exists(SCHEMA_CACHE_PATH) else None
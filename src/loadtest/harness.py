@@ -0,0 +1,367 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import threading
+import tracemalloc
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import src.planner.hybrid_agent as hybrid_agent
+import src.sql_agent.sql_agent as sql_agent
+from src.loadtest.backends import FakeBackends, StageRecorder, requirement_document
+from src.rag.file_processor import UploadedDocument
+from src.rag.requirement_store import RequirementStore
+from src.sql_agent.template_cache import SQLTemplateStore
+from src.utils.deadline import DEFAULT_REQUEST_DEADLINE_SEC, Deadline
+from src.utils.single_flight import get_coalescing_stats
+from src.utils.token_usage import get_token_usage_stats
+
+
+# ============================
+# ⚙️ DEFAULT PROFILE
+# ============================
+
+DEFAULT_PROFILE = {
+    # Weighted query mix; "mode" is what the fake hybrid planner answers
+    "queries": [
+        {"text": "List construction vendors in Gauteng", "mode": "sql_only", "weight": 4,
+         "filters": {"Industry": "Construction", "State": "Gauteng"}},
+        {"text": "Which vendors hold ISO 9001?", "mode": "sql_only", "weight": 2,
+         "filters": {"Certification": "ISO 9001"}},
+        {"text": "Match electrical vendors to the uploaded tender", "mode": "sql_and_rag", "weight": 3,
+         "filters": {"Industry": "Electrical"}},
+        {"text": "Summarise the tender requirements", "mode": "rag_only", "weight": 1}
+    ],
+    # Per request: no document, a new document, or one uploaded before
+    "uploads": {"none": 0.5, "new": 0.3, "repeat": 0.2},
+    "upload_kb": [10, 120],
+    "latency_ms": {
+        "llm_first_token": {"median": 400, "p95": 1500},
+        "llm_generation": {"median": 1200, "p95": 4000},
+        "embedding": {"median": 150, "p95": 600},
+        "sql": {"median": 80, "p95": 400}
+    },
+    "sql_rows": 100,
+    "embedding_dim": 1536,
+    "think_time_ms": 0
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def load_profile(path: Optional[str]) -> Dict:
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+        for key, value in overrides.items():
+            if isinstance(value, dict) and isinstance(profile.get(key), dict):
+                profile[key].update(value)
+            else:
+                profile[key] = value
+    return profile
+
+
+# ============================
+# 📈 MEMORY
+# ============================
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        # ru_maxrss is KB on Linux, bytes on macOS
+        scale = 2 ** 20 if sys.platform == "darwin" else 2 ** 10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+class MemorySampler(threading.Thread):
+    """
+    Samples resident memory while the load runs; reports the high-water mark.
+    """
+
+    def __init__(self, interval_sec: float = 0.05):
+        super().__init__(name="loadtest-memory", daemon=True)
+        self.interval_sec = interval_sec
+        self.stop_event = threading.Event()
+        self.start_mb = _rss_mb()
+        self.peak_mb = self.start_mb
+
+    def run(self):
+        while not self.stop_event.wait(self.interval_sec):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def stop(self) -> Dict:
+        self.stop_event.set()
+        self.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+        return {
+            "rss_start_mb": round(self.start_mb, 1),
+            "rss_peak_mb": round(self.peak_mb, 1),
+            "rss_growth_mb": round(self.peak_mb - self.start_mb, 1)
+        }
+
+
+# ============================
+# 🧪 LOAD GENERATOR
+# ============================
+
+class LoadGenerator:
+    """
+    Closed-loop load: `users` threads each run run_hybrid_agent back to
+    back (plus think time) until `requests` have been issued.
+    Pipeline stages are timed by wrapping the functions hybrid_agent
+    calls; backend calls are timed by the fake backends.
+    """
+
+    def __init__(self, profile: Dict, users: int, requests: int, deadline_sec: float, seed: int = 0):
+        self.profile = profile
+        self.users = users
+        self.requests = requests
+        self.deadline_sec = deadline_sec
+
+        self.recorder = StageRecorder()
+        self.backends = FakeBackends(profile, self.recorder, seed=seed)
+        self.rng = np.random.default_rng(seed + 1)
+        self.lock = threading.Lock()
+
+        self.issued = 0
+        self.errors: List[str] = []
+        self.degraded = 0
+        self.documents: List[UploadedDocument] = []
+
+        weights = np.array([q.get("weight", 1) for q in profile["queries"]], dtype=float)
+        self.query_weights = weights / weights.sum()
+        upload_kinds = list(profile["uploads"])
+        upload_weights = np.array([profile["uploads"][k] for k in upload_kinds], dtype=float)
+        self.upload_kinds = upload_kinds
+        self.upload_weights = upload_weights / upload_weights.sum()
+
+    def _next_request(self):
+        with self.lock:
+            if self.issued >= self.requests:
+                return None
+            self.issued += 1
+
+            query = self.profile["queries"][self.rng.choice(len(self.query_weights), p=self.query_weights)]
+            kind = self.upload_kinds[self.rng.choice(len(self.upload_weights), p=self.upload_weights)]
+
+            upload = None
+            if kind == "repeat" and self.documents:
+                previous = self.documents[self.rng.integers(len(self.documents))]
+                upload = UploadedDocument(previous.name, previous.getvalue())
+            elif kind in ("new", "repeat"):
+                low, high = self.profile["upload_kb"]
+                data = requirement_document(int(self.rng.integers(low, high + 1)), self.rng)
+                upload = UploadedDocument(f"tender_{len(self.documents) + 1}.txt", data)
+                self.documents.append(upload)
+
+        return query, upload
+
+    def _timed(self, stage: str, fn):
+        def wrapper(*args, **kwargs):
+            with self.recorder.timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def _user(self, store: RequirementStore):
+        think = self.profile.get("think_time_ms", 0) / 1000.0
+
+        while True:
+            request = self._next_request()
+            if request is None:
+                return
+            query, upload = request
+
+            try:
+                with self.recorder.timed("overall"):
+                    result = hybrid_agent.run_hybrid_agent(
+                        user_query=query["text"],
+                        uploaded_file=[upload] if upload else None,
+                        requirement_store=store,
+                        deadline=Deadline(self.deadline_sec)
+                    )
+
+                sql_result = result.get("sql_result")
+                with self.lock:
+                    if result.get("degraded"):
+                        self.degraded += 1
+                    if sql_result and not sql_result.get("success"):
+                        self.errors.append(f"sql:{sql_result.get('stage')}")
+            except Exception as e:
+                with self.lock:
+                    self.errors.append(f"{type(e).__name__}: {e}")
+
+            if think:
+                time.sleep(think)
+
+    def run(self) -> Dict:
+        patched = {
+            "run_sql_agent": "sql_agent",
+            "run_store_rag_pipeline": "rag",
+            "run_rag_pipeline": "rag",
+            "score_vendors_against_requirements": "scoring"
+        }
+        originals = {name: getattr(hybrid_agent, name) for name in patched}
+        original_templates = sql_agent.template_store
+
+        with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir, self.backends.install():
+            # Isolated store and templates: production data/ is untouched
+            store = RequirementStore(os.path.join(workdir, "requirement_store"))
+            sql_agent.template_store = SQLTemplateStore(os.path.join(workdir, "sql_templates.json"))
+            for name, stage in patched.items():
+                setattr(hybrid_agent, name, self._timed(stage, originals[name]))
+
+            memory = MemorySampler()
+            memory.start()
+            started = time.perf_counter()
+
+            try:
+                with ThreadPoolExecutor(max_workers=self.users, thread_name_prefix="loadtest-user") as pool:
+                    for _ in range(self.users):
+                        pool.submit(self._user, store)
+            finally:
+                elapsed = time.perf_counter() - started
+                memory_report = memory.stop()
+                for name, fn in originals.items():
+                    setattr(hybrid_agent, name, fn)
+                sql_agent.template_store = original_templates
+
+        return self._report(elapsed, memory_report)
+
+    def _report(self, elapsed: float, memory: Dict) -> Dict:
+        stages = {}
+        for stage, samples in sorted(self.recorder.snapshot().items()):
+            values = np.asarray(samples) * 1000.0
+            stages[stage] = dict(
+                {f"p{p}": round(float(np.percentile(values, p)), 1) for p in PERCENTILES},
+                count=len(samples),
+                max=round(float(values.max()), 1)
+            )
+
+        completed = stages.get("overall", {}).get("count", 0)
+        if tracemalloc.is_tracing():
+            memory["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+
+        return {
+            "users": self.users,
+            "requests": completed,
+            "duration_sec": round(elapsed, 2),
+            "throughput_rps": round(completed / elapsed, 3) if elapsed else 0.0,
+            "error_rate": round(len(self.errors) / completed, 4) if completed else 0.0,
+            "degraded_rate": round(self.degraded / completed, 4) if completed else 0.0,
+            "errors": sorted(set(self.errors)),
+            "latency_ms": stages,
+            "memory": memory,
+            "coalescing": get_coalescing_stats(),
+            "token_usage": get_token_usage_stats()
+        }
+
+
+# ============================
+# ✅ THRESHOLDS
+# ============================
+
+def check_thresholds(report: Dict, thresholds: Dict) -> List[str]:
+    """
+    Returns the violated thresholds (empty list = pass).
+    """
+    failures = []
+
+    def above(name, actual, limit):
+        if actual is not None and actual > limit:
+            failures.append(f"{name} = {actual} > {limit}")
+
+    if "min_throughput_rps" in thresholds and report["throughput_rps"] < thresholds["min_throughput_rps"]:
+        failures.append(f"throughput_rps = {report['throughput_rps']} < {thresholds['min_throughput_rps']}")
+
+    if "max_error_rate" in thresholds:
+        above("error_rate", report["error_rate"], thresholds["max_error_rate"])
+    if "max_degraded_rate" in thresholds:
+        above("degraded_rate", report["degraded_rate"], thresholds["max_degraded_rate"])
+    if "max_rss_peak_mb" in thresholds:
+        above("rss_peak_mb", report["memory"]["rss_peak_mb"], thresholds["max_rss_peak_mb"])
+    if "max_rss_growth_mb" in thresholds:
+        above("rss_growth_mb", report["memory"]["rss_growth_mb"], thresholds["max_rss_growth_mb"])
+
+    for stage, limits in thresholds.get("latency_ms", {}).items():
+        measured = report["latency_ms"].get(stage)
+        if measured is None:
+            continue
+        for percentile, limit in limits.items():
+            above(f"{stage}.{percentile}", measured.get(percentile), limit)
+
+    return failures
+
+
+def format_report(report: Dict) -> str:
+    lines = [
+        f"users={report['users']} requests={report['requests']} "
+        f"duration={report['duration_sec']}s throughput={report['throughput_rps']} req/s",
+        f"error_rate={report['error_rate']} degraded_rate={report['degraded_rate']}",
+        "",
+        f"{'stage':<18}{'count':>8}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES) + f"{'max':>10}"
+    ]
+    for stage, stats in report["latency_ms"].items():
+        lines.append(
+            f"{stage:<18}{stats['count']:>8}"
+            + "".join(f"{stats['p' + str(p)]:>10}" for p in PERCENTILES)
+            + f"{stats['max']:>10}"
+        )
+    lines.append("")
+    lines.append("memory: " + ", ".join(f"{k}={v}" for k, v in report["memory"].items()))
+    for error in report["errors"]:
+        lines.append(f"error: {error}")
+    return "\n".join(lines)
+
+
+# ============================
+# 🚀 RUN DIRECTLY
+# ============================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent load test for run_hybrid_agent on fake backends.")
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=200, help="total requests to issue")
+    parser.add_argument("--profile", help="JSON overrides for the query / upload mix and latencies")
+    parser.add_argument("--thresholds", help="JSON pass/fail thresholds")
+    parser.add_argument("--deadline-sec", type=float, default=DEFAULT_REQUEST_DEADLINE_SEC)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tracemalloc", action="store_true", help="also report Python heap peak (slower)")
+    parser.add_argument("--json", dest="json_path", help="write the full report here")
+    args = parser.parse_args(argv)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    generator = LoadGenerator(
+        load_profile(args.profile),
+        users=args.users,
+        requests=args.requests,
+        deadline_sec=args.deadline_sec,
+        seed=args.seed
+    )
+    report = generator.run()
+    print(format_report(report))
+
+    failures = []
+    if args.thresholds:
+        with open(args.thresholds, "r", encoding="utf-8") as f:
+            failures = check_thresholds(report, json.load(f))
+        report["threshold_failures"] = failures
+        print("\nPASS" if not failures else "\nFAIL\n" + "\n".join(f"  {f}" for f in failures))
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
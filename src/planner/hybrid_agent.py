@@ -1,50 +1,149 @@
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Callable, Dict, Optional
 from src.planner.hybrid_planner import generate_hybrid_plan
 from src.sql_agent.sql_agent import run_sql_agent
-from src.rag.rag_pipeline import run_rag_pipeline
+from src.rag.rag_pipeline import run_rag_pipeline, run_store_rag_pipeline
 from src.planner.merge_and_score import score_vendors_against_requirements
+from src.utils.deadline import Deadline, DeadlineExceeded
+
+
+# RAG runs here while SQL runs on the caller's thread (on_event stays there)
+_branch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-branch")
+
 
 def run_hybrid_agent(
     user_query: str,
-    uploaded_file=None
+    uploaded_file=None,
+    retrieval_mode: str = "hybrid",
+    requirement_store=None,
+    document_ids=None,
+    on_event: Optional[Callable] = None,
+    deadline: Optional[Deadline] = None
 ) -> Dict:
+    """
+    uploaded_file may be a single file or a list of files.
+    With a requirement_store, uploads are persisted incrementally and
+    previously stored documents can be searched via document_ids.
 
-    has_file = uploaded_file is not None
+    on_event(stage, key, value) receives plan / SQL fields as they
+    stream in. Stages start as soon as the hybrid plan's "mode" is known.
 
-    hybrid_plan = generate_hybrid_plan(
-        user_query=user_query,
-        has_uploaded_file=has_file
+    The whole request shares one deadline (default REQUEST_DEADLINE_SEC).
+    SQL and RAG run as parallel branches; a branch still running at the
+    deadline is cancelled and left out. Whatever was cut short is listed
+    in result["degraded"].
+    """
+
+    emit = on_event or (lambda stage, key, value: None)
+    deadline = deadline or Deadline()
+
+    uploaded_files = uploaded_file if isinstance(uploaded_file, list) else (
+        [uploaded_file] if uploaded_file is not None else []
     )
 
-    mode = hybrid_plan.get("mode")
+    has_file = bool(uploaded_files) or bool(document_ids)
+
+    plan_stream = generate_hybrid_plan(
+        user_query=user_query,
+        has_uploaded_file=has_file,
+        stream=True,
+        deadline=deadline
+    )
 
     sql_result = None
     rag_result = None
+    scored_result = None
+
+    # Only "mode" is needed to dispatch; the rest of the plan keeps streaming
+    plan_fields = plan_stream.iter_fields(deadline)
+    try:
+        for key, value in plan_fields:
+            emit("hybrid_plan", key, value)
+            if key == "mode":
+                break
+
+        mode = plan_stream.wait_for("mode", deadline=deadline).get("mode")
+    except DeadlineExceeded:
+        deadline.degrade("hybrid_plan", "no execution mode before the deadline")
+        return {
+            "hybrid_plan": plan_stream.snapshot(),
+            "sql_result": sql_result,
+            "rag_result": rag_result,
+            "scored_result": scored_result,
+            "degraded": deadline.degraded
+        }
+
+    # --------------------------------
+    # RAG branch (background) + SQL branch (this thread)
+    # --------------------------------
+    rag_future = None
+    rag_deadline = deadline.branch()
+
+    if mode in ["rag_only", "sql_and_rag"] and has_file:
+        if requirement_store is not None:
+            rag_future = _branch_pool.submit(
+                run_store_rag_pipeline,
+                requirement_store,
+                uploaded_files=uploaded_files,
+                user_query=user_query,
+                retrieval_mode=retrieval_mode,
+                document_ids=document_ids,
+                deadline=rag_deadline
+            )
+        elif uploaded_files:
+            rag_future = _branch_pool.submit(
+                run_rag_pipeline,
+                uploaded_file=uploaded_files[0],
+                user_query=user_query,
+                retrieval_mode=retrieval_mode,
+                deadline=rag_deadline
+            )
 
     if mode in ["sql_only", "sql_and_rag"]:
         sql_result = run_sql_agent(
             user_query=user_query,
-            has_uploaded_file=has_file
+            has_uploaded_file=has_file,
+            on_event=on_event,
+            deadline=deadline.branch()
         )
+        if sql_result.get("stage") == "deadline_exceeded":
+            deadline.degrade("sql", sql_result["error"])
 
-    if mode in ["rag_only", "sql_and_rag"] and uploaded_file:
-        rag_result = run_rag_pipeline(
-            uploaded_file=uploaded_file,
-            user_query=user_query
-        )
-
-    scored_result = None
+    if rag_future is not None:
+        try:
+            rag_result = rag_future.result(timeout=deadline.remaining())
+        except FuturesTimeoutError:
+            # Abandoned: stops at its next deadline check
+            rag_deadline.cancel()
+            deadline.degrade("rag", "cancelled at the request deadline")
+        except DeadlineExceeded as e:
+            deadline.degrade("rag", str(e))
 
     if sql_result and rag_result:
         if sql_result.get("dataframe") is not None:
-            scored_result = score_vendors_against_requirements(
-                sql_result["dataframe"],
-                rag_result
-            )
+            if not rag_result["retrieved_chunks"]:
+                # e.g. the documents are still queued or being extracted
+                deadline.degrade("scoring", "no requirement text indexed yet; vendors not scored")
+            else:
+                scored_result = score_vendors_against_requirements(
+                    sql_result["dataframe"],
+                    rag_result,
+                    deadline=deadline
+                )
+
+    try:
+        for key, value in plan_fields:
+            emit("hybrid_plan", key, value)
+
+        hybrid_plan = plan_stream.result(deadline)
+    except DeadlineExceeded:
+        deadline.degrade("hybrid_plan", "plan reasoning incomplete")
+        hybrid_plan = plan_stream.snapshot()
 
     return {
         "hybrid_plan": hybrid_plan,
         "sql_result": sql_result,
         "rag_result": rag_result,
-        "scored_result": scored_result
-    }
\ No newline at end of file
+        "scored_result": scored_result,
+        "degraded": deadline.degraded
+    }
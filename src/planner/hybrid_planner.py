@@ -1,6 +1,7 @@
 import json
-from typing import Dict
-from src.utils.llm_client import call_llm_json
+from typing import Dict, Optional
+from src.utils.deadline import Deadline
+from src.utils.llm_client import call_llm_json, stream_llm_json
 
 
 SYSTEM_PROMPT = """
@@ -39,8 +40,14 @@ Output format:
 
 def generate_hybrid_plan(
     user_query: str,
-    has_uploaded_file: bool
+    has_uploaded_file: bool,
+    stream: bool = False,
+    deadline: Optional[Deadline] = None
 ) -> Dict:
+    """
+    stream=True returns a StreamingJSONResult so callers can act
+    on "mode" before the rest of the plan arrives.
+    """
 
     user_prompt = f"""
 User Query:
@@ -52,10 +59,21 @@ Document Uploaded:
 Decide the best execution mode.
 """
 
+    if stream:
+        return stream_llm_json(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+            temperature=0.2,
+            deadline=deadline,
+            stage="hybrid_plan"
+        )
+
     response = call_llm_json(
         system_prompt=SYSTEM_PROMPT,
         user_prompt=user_prompt,
-        temperature=0.2
+        temperature=0.2,
+        deadline=deadline,
+        stage="hybrid_plan"
     )
 
     return response
\ No newline at end of file
@@ -1,6 +1,15 @@
-import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
 from src.rag.embedder import embed_texts
+from src.rag.lexical_index import BM25Index
+from src.utils.deadline import Deadline, DeadlineExceeded
+from src.utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+# Only this many lexical candidates are embedded for reranking
+RERANK_TOP_N = 20
 
 
 def cosine_similarity(vec1, vec2):
@@ -11,55 +20,108 @@ def cosine_similarity(vec1, vec2):
     )
 
 
-def build_vendor_text_representation(df):
+def build_vendor_text_representation(df, columns=None):
     """
     Convert vendor dataframe row into text blob
     for similarity comparison.
     """
-    vendor_texts = []
+    columns = list(df.columns) if columns is None else columns
+
+    if len(df) == 0 or not columns:
+        return [""] * len(df)
+
+    # Column-wise string concat instead of iterrows
+    parts = [f"{col}: " + df[col].astype(str) for col in columns]
+    combined = parts[0]
+    for part in parts[1:]:
+        combined = combined + " | " + part
+
+    return combined.tolist()
+
+
+def lexical_prefilter(df, requirement_chunks: List[str]) -> "np.ndarray":
+    """
+    BM25 score of every row's text columns against the requirement chunks.
+    No embedding calls.
+    """
+    text_columns = [
+        col for col in df.columns
+        if pd.api.types.is_string_dtype(df[col])
+        or isinstance(df[col].dtype, pd.CategoricalDtype)
+    ]
+
+    index = BM25Index()
+    index.add_documents(build_vendor_text_representation(df, text_columns))
 
-    for _, row in df.iterrows():
-        text_parts = []
-        for col in df.columns:
-            text_parts.append(f"{col}: {row[col]}")
-        vendor_texts.append(" | ".join(text_parts))
+    scores = np.zeros(len(df))
+    for doc_id, score in index.search_ids(" ".join(requirement_chunks), top_k=len(df)):
+        scores[doc_id] = score
 
-    return vendor_texts
+    return scores
 
 
 def score_vendors_against_requirements(
     sql_dataframe,
-    rag_result
+    rag_result,
+    rerank_top_n: int = RERANK_TOP_N,
+    deadline: Optional[Deadline] = None
 ) -> Dict:
+    """
+    Two-stage ranking:
+    1. BM25 prefilter over every row (cheap, no embeddings)
+    2. Embedding rerank of the top rerank_top_n rows only
+    Rows outside the top N keep match_score = NaN and rank below.
+    If the rerank runs out of time, the lexical ranking is returned.
+    Returns None without requirement chunks (nothing indexed yet):
+    there is nothing to rank against.
+    """
 
-    if sql_dataframe is None or rag_result is None:
+    if sql_dataframe is None or rag_result is None or not rag_result["retrieved_chunks"]:
         return None
 
     requirement_text = " ".join(rag_result["retrieved_chunks"])
 
-    # Embed requirement once
-    requirement_embedding = embed_texts([requirement_text])[0]
+    # Stage 1: lexical prefilter
+    lexical_scores = lexical_prefilter(sql_dataframe, rag_result["retrieved_chunks"])
+
+    # Stable sort keeps SQL order for ties
+    candidate_positions = np.argsort(-lexical_scores, kind="stable")[:rerank_top_n]
 
-    # Build vendor text
-    vendor_texts = build_vendor_text_representation(sql_dataframe)
+    # Stage 2: embedding rerank of candidates
+    scores = np.full(len(sql_dataframe), np.nan)
 
-    vendor_embeddings = embed_texts(vendor_texts)
+    if len(candidate_positions):
+        candidates = sql_dataframe.iloc[candidate_positions]
+        vendor_texts = build_vendor_text_representation(candidates)
 
-    scores = []
+        try:
+            # Requirement + candidates in a single embedding call
+            embeddings = embed_texts([requirement_text] + vendor_texts, deadline=deadline)
+            requirement_embedding = embeddings[0]
 
-    for i, emb in enumerate(vendor_embeddings):
-        score = cosine_similarity(emb, requirement_embedding)
-        scores.append(score)
+            for pos, emb in zip(candidate_positions, embeddings[1:]):
+                scores[pos] = cosine_similarity(emb, requirement_embedding)
+        except DeadlineExceeded:
+            if deadline is None:
+                raise
+            deadline.degrade("scoring", "embedding rerank timed out; ranked by lexical score only")
+            candidate_positions = candidate_positions[:0]
 
-    sql_dataframe = sql_dataframe.copy()
+    # Shallow copy: column buffers are shared with the SQL result
+    sql_dataframe = sql_dataframe.copy(deep=False)
+    sql_dataframe["lexical_score"] = lexical_scores
     sql_dataframe["match_score"] = scores
 
     ranked_df = sql_dataframe.sort_values(
-        by="match_score",
-        ascending=False
+        by=["match_score", "lexical_score"],
+        ascending=False,
+        na_position="last"
     )
 
     return {
         "ranked_dataframe": ranked_df,
-        "requirement_text_used": requirement_text
-    }
\ No newline at end of file
+        "requirement_text_used": requirement_text,
+        "rerank_top_n": rerank_top_n,
+        "candidates_embedded": len(candidate_positions),
+        "total_candidates": len(sql_dataframe)
+    }
@@ -1,20 +1,65 @@
 import os
-from openai import AzureOpenAI
-from dotenv import load_dotenv
+import base64
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Optional
+from src.utils.clients import call_with_retries, openai
+from src.utils.deadline import Deadline, DeadlineExceeded
+from src.utils.lazy_import import lazy_import
+from src.utils.single_flight import embedding_flight, payload_key
 
-load_dotenv()
+np = lazy_import("numpy")
 
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_KEY"),
-    api_version="2024-02-15-preview",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
 
+# Shorter vectors straight from the model (text-embedding-3 and later);
+# unset keeps the deployment's native size
+EMBEDDING_DIMENSIONS = int(os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS", "0")) or None
 
-def embed_texts(texts):
-    response = client.embeddings.create(
-        model=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT"),
-        input=texts
-    )
 
-    return [item.embedding for item in response.data]
\ No newline at end of file
+def embed_texts(texts, deadline: Optional[Deadline] = None):
+    """
+    Returns a float32 array of shape (len(texts), dimension).
+    """
+    # Identical concurrent requests share one API call
+    key = payload_key(os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT"), EMBEDDING_DIMENSIONS, texts)
+    try:
+        return embedding_flight.do(
+            key,
+            lambda: _embed_texts(texts, deadline),
+            timeout=deadline.timeout("embedding") if deadline else None
+        )
+    except FuturesTimeoutError:
+        raise DeadlineExceeded("embedding")
+
+
+def _embed_texts(texts, deadline: Optional[Deadline] = None):
+    options = {"dimensions": EMBEDDING_DIMENSIONS} if EMBEDDING_DIMENSIONS else {}
+    try:
+        response = call_with_retries(deadline, "embedding", lambda client: client.embeddings.create(
+            model=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT"),
+            input=texts,
+            encoding_format="base64",
+            **options
+        ))
+    except openai.APITimeoutError:
+        if deadline is None:
+            raise
+        raise DeadlineExceeded("embedding")
+
+    return _to_matrix([item.embedding for item in response.data])
+
+
+def _to_matrix(embeddings):
+    # base64 payloads are raw little-endian float32: decode straight
+    # into the result buffer instead of one Python float per value
+    first = _decode(embeddings[0])
+    matrix = np.empty((len(embeddings), len(first)), dtype="float32")
+    matrix[0] = first
+    for row, embedding in enumerate(embeddings[1:], start=1):
+        matrix[row] = _decode(embedding)
+    return matrix
+
+
+def _decode(embedding):
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype="<f4")
+    return np.asarray(embedding, dtype="float32")
@@ -1,13 +1,41 @@
 import io
-import pdfplumber
-from typing import List
+from typing import Callable, List, Optional
+from src.utils.deadline import Deadline
+from src.utils.lazy_import import lazy_import
 
+pdfplumber = lazy_import("pdfplumber")
 
-def extract_text_from_pdf(file_bytes: bytes) -> str:
+
+class UploadedDocument(io.BytesIO):
+    """
+    Mimics the Streamlit UploadedFile interface the RAG pipeline expects,
+    for uploads that do not come from Streamlit (API, load tests).
+    """
+
+    def __init__(self, name: str, data: bytes, type: str = "text/plain"):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+
+
+def extract_text_from_pdf(
+    file_bytes: bytes,
+    on_page: Optional[Callable] = None,
+    deadline: Optional[Deadline] = None
+) -> str:
+    """
+    on_page(pages_done, pages_total) is called after each page.
+    Raises DeadlineExceeded between pages once the deadline passes.
+    """
     text = ""
     with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-        for page in pdf.pages:
+        total = len(pdf.pages)
+        for i, page in enumerate(pdf.pages, start=1):
+            if deadline is not None:
+                deadline.check("pdf_extraction")
             text += page.extract_text() or ""
+            if on_page:
+                on_page(i, total)
     return text
 
 
@@ -24,13 +52,13 @@ def simple_chunk_text(text: str, chunk_size: int = 500, overlap: int = 100) -> L
     return chunks
 
 
-def process_uploaded_file(file) -> List[str]:
+def process_uploaded_file(file, deadline: Optional[Deadline] = None) -> List[str]:
     """
     Accepts Streamlit uploaded file.
     Returns list of text chunks.
     """
     if file.type == "application/pdf":
-        text = extract_text_from_pdf(file.read())
+        text = extract_text_from_pdf(file.read(), deadline=deadline)
     else:
         text = file.read().decode("utf-8")
 
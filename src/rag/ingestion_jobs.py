@@ -0,0 +1,195 @@
+import os
+import re
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from src.rag.file_processor import extract_text_from_pdf, simple_chunk_text
+from src.rag.requirement_store import EMBED_BATCH_SIZE, RequirementStore, document_id_for
+from src.utils.atomic_file import atomic_write
+
+
+# Status files of finished jobs are removed after this long
+JOB_RETENTION_SEC = 24 * 3600
+
+# Per process: jobs queued or running at once (each holds its file in memory)
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "8"))
+
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+class IngestionQueueFull(RuntimeError):
+    """
+    Raised by submit() when max_pending jobs are already queued or running.
+    """
+
+
+class IngestionJobManager:
+    """
+    Background document ingestion.
+
+    submit() returns a job id and the document id at once; extraction,
+    chunking and embedding run on a worker pool. Each embedded batch is
+    appended to the RequirementStore straight away, so queries scoped to
+    the document see a growing partial index while the job runs.
+
+    Job status is also written to <store>/jobs/<job_id>.json on every
+    update, so any process sharing the store (e.g. another API worker)
+    can report progress of a job it did not run.
+
+    At most max_pending jobs are queued or running; submit() rejects
+    more with IngestionQueueFull.
+    """
+
+    def __init__(
+        self,
+        store: RequirementStore,
+        max_workers: int = 2,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_pending: int = INGEST_MAX_PENDING
+    ):
+        self.store = store
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.pending = 0
+        self.jobs_path = os.path.join(store.path, "jobs")
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.lock = threading.Lock()
+        self.jobs: Dict[str, Dict] = {}
+
+    def _job_file(self, job_id: str) -> str:
+        return os.path.join(self.jobs_path, f"{job_id}.json")
+
+    def _persist(self, job: Dict):
+        # Only the process running a job writes its file; atomic so
+        # readers never see a half-written status
+        with atomic_write(self._job_file(job["job_id"])) as f:
+            json.dump(job, f)
+
+    def _load(self, job_id: str) -> Optional[Dict]:
+        try:
+            with open(self._job_file(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _prune(self):
+        if not os.path.isdir(self.jobs_path):
+            return
+        cutoff = time.time() - JOB_RETENTION_SEC
+        for name in os.listdir(self.jobs_path):
+            path = os.path.join(self.jobs_path, name)
+            try:
+                if name.endswith(".json") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _update(self, job_id: str, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+            self._persist(self.jobs[job_id])
+
+    def submit(self, name: str, file_type: str, content: bytes, metadata: Optional[Dict] = None) -> Dict:
+        job_id = uuid.uuid4().hex
+        doc_id = document_id_for(content)
+
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise IngestionQueueFull(f"{self.pending} ingestion jobs already pending")
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "document_id": doc_id,
+                "name": name,
+                "status": "queued",
+                "pages_done": 0,
+                "pages_total": None,
+                "chunks_total": None,
+                "batches_done": 0,
+                "batches_total": None,
+                "embedded_chunks": 0,
+                "duplicate_chunks": 0,
+                "error": None,
+                "submitted_at": time.time(),
+                "finished_at": None
+            }
+            self._persist(self.jobs[job_id])
+            self.pending += 1
+
+        self._prune()
+        self.executor.submit(self._run, job_id, name, file_type, content, metadata)
+        return {"job_id": job_id, "document_id": doc_id}
+
+    def _run(self, job_id: str, name: str, file_type: str, content: bytes, metadata: Optional[Dict]):
+        doc_id = None
+        try:
+            doc_id = self.store.begin_document(name, content, dict(metadata or {}, type=file_type))
+            if doc_id is None:
+                self._update(job_id, status="done", note="already stored", finished_at=time.time())
+                return
+
+            # 1️⃣ Extract
+            self._update(job_id, status="extracting")
+            if file_type == "application/pdf":
+                text = extract_text_from_pdf(
+                    content,
+                    on_page=lambda done, total: self._update(job_id, pages_done=done, pages_total=total)
+                )
+            else:
+                text = content.decode("utf-8")
+                self._update(job_id, pages_done=1, pages_total=1)
+
+            # 2️⃣ Chunk
+            self._update(job_id, status="chunking")
+            # Resuming a "partial", "failed" or abandoned document: stored chunks are kept
+            chunks = simple_chunk_text(text)[self.store.stored_chunk_count(doc_id):]
+            batches = [
+                chunks[i:i + self.batch_size]
+                for i in range(0, len(chunks), self.batch_size)
+            ]
+            self._update(job_id, status="embedding", chunks_total=len(chunks), batches_total=len(batches))
+
+            # 3️⃣ Embed + index batch by batch (searchable as it grows)
+            embedded = duplicates = 0
+            for n, batch in enumerate(batches, start=1):
+                counts = self.store.append_chunks(doc_id, batch)
+                embedded += counts["embedded_chunks"]
+                duplicates += counts["duplicate_chunks"]
+                self._update(job_id, batches_done=n, embedded_chunks=embedded, duplicate_chunks=duplicates)
+
+            self.store.finish_document(doc_id)
+            self._update(job_id, status="done", finished_at=time.time())
+
+        except Exception as e:
+            if doc_id is not None:
+                # No-op if another worker took the document over
+                self.store.finish_document(doc_id, status="failed")
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Status of a job run by this process or, via its status file,
+        by any other process sharing the store.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job:
+                return dict(job)
+
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        return self._load(job_id)
+
+    def list(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def stats(self):
+        with self.lock:
+            return {"pending": self.pending, "max_pending": self.max_pending}
@@ -0,0 +1,77 @@
+import re
+import math
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens.
+    Keeps alphanumeric codes intact (e.g. "G7", "9001").
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory inverted index with BM25 scoring.
+    Document ids are positions in the order chunks were added,
+    matching the ids used by FAISSVectorStore.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        self.text_chunks: List[str] = []
+        self.total_length = 0
+
+    def add_documents(self, chunks: List[str]):
+        for chunk in chunks:
+            doc_id = len(self.doc_lengths)
+            tokens = tokenize(chunk)
+
+            term_counts = defaultdict(int)
+            for token in tokens:
+                term_counts[token] += 1
+
+            for term, tf in term_counts.items():
+                self.postings[term].append((doc_id, tf))
+
+            self.doc_lengths.append(len(tokens))
+            self.total_length += len(tokens)
+            self.text_chunks.append(chunk)
+
+    def search_ids(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Returns [(doc_id, score)] sorted by descending BM25 score.
+        Documents sharing no terms with the query are not returned.
+        """
+        n_docs = len(self.doc_lengths)
+        if n_docs == 0:
+            return []
+
+        avg_length = self.total_length / n_docs
+        scores = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+            for doc_id, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
+
+    def search(self, query: str, top_k: int = 5) -> List[str]:
+        return [self.text_chunks[doc_id] for doc_id, _ in self.search_ids(query, top_k)]
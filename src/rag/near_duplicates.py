@@ -0,0 +1,156 @@
+import os
+import zlib
+import functools
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional
+from src.rag.lexical_index import tokenize
+from src.utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+
+# Estimated Jaccard similarity (word shingles) at which two chunks
+# count as the same text
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.85"))
+
+SHINGLE_SIZE = 3
+NUM_PERMUTATIONS = 128
+
+# 16 bands x 8 rows: pairs at 0.85 similarity share a band ~99% of the
+# time, pairs at 0.5 only ~6%; every candidate is then checked
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+@functools.lru_cache(maxsize=1)
+def _permutations():
+    # Fixed seed: signatures must agree across processes and restarts
+    rng = np.random.default_rng(1)
+    a = rng.integers(1, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype="uint64")
+    b = rng.integers(0, _MERSENNE_PRIME, NUM_PERMUTATIONS, dtype="uint64")
+    return a, b
+
+
+def shingles(text: str) -> List[str]:
+    tokens = tokenize(text)
+    if len(tokens) < SHINGLE_SIZE:
+        return [" ".join(tokens)]
+    return [
+        " ".join(tokens[i:i + SHINGLE_SIZE])
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    ]
+
+
+def minhash_signature(text: str):
+    """
+    NUM_PERMUTATIONS minimum hashes of the text's shingles (uint64).
+    Equal positions estimate the Jaccard similarity of the shingle sets.
+    """
+    a, b = _permutations()
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in set(shingles(text))),
+        dtype="uint64"
+    )
+    # a * h + b wraps around in uint64 (as in datasketch); the wrap only
+    # adds mixing, and a spanning the whole prime range keeps the
+    # permutations independent of hash magnitude
+    return ((np.outer(hashes, a) + b) % _MERSENNE_PRIME).min(axis=0)
+
+
+def estimated_similarity(sig1, sig2) -> float:
+    return float(np.mean(sig1 == sig2))
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH lookup of previously seen chunks.
+
+    find() returns the key of an indexed chunk whose estimated
+    similarity is at least the threshold (the most similar one), or None.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.buckets: Dict[tuple, List[Hashable]] = defaultdict(list)
+        self.signatures: Dict[Hashable, object] = {}
+
+    def _bands(self, signature):
+        for band in range(LSH_BANDS):
+            yield band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+
+    def add(self, key: Hashable, signature):
+        self.signatures[key] = signature
+        for bucket in self._bands(signature):
+            self.buckets[bucket].append(key)
+
+    def find(self, signature) -> Optional[Hashable]:
+        candidates = {
+            key
+            for bucket in self._bands(signature)
+            for key in self.buckets.get(bucket, ())
+        }
+
+        best, best_similarity = None, self.threshold
+        for key in candidates:
+            similarity = estimated_similarity(signature, self.signatures[key])
+            if similarity >= best_similarity:
+                best, best_similarity = key, similarity
+        return best
+
+    def __len__(self):
+        return len(self.signatures)
+
+
+def duplicate_stats(chunks: List[str], canonical: List[int]) -> Dict:
+    """
+    How much embedding input collapsing saves. canonical[i] is the
+    position of the chunk that chunk i was collapsed into.
+    """
+    duplicates = [i for i, c in enumerate(canonical) if c != i]
+    chars_total = sum(len(chunk) for chunk in chunks)
+    chars_saved = sum(len(chunks[i]) for i in duplicates)
+
+    return {
+        "chunks": len(chunks),
+        "unique_chunks": len(chunks) - len(duplicates),
+        "duplicate_chunks": len(duplicates),
+        "chars_total": chars_total,
+        "chars_saved": chars_saved,
+        "saved_ratio": round(chars_saved / chars_total, 4) if chars_total else 0.0
+    }
+
+
+def collapse_near_duplicates(chunks: List[str], threshold: float = NEAR_DUPLICATE_THRESHOLD) -> Dict:
+    """
+    Keeps the first chunk of each group of (near-)duplicates.
+
+    Returns:
+    - unique_chunks: chunks to embed, in original order
+    - mapping: for every original chunk, its index in unique_chunks
+    - stats: see duplicate_stats
+    """
+    index = NearDuplicateIndex(threshold)
+    exact: Dict[str, int] = {}
+    canonical: List[int] = []
+
+    for i, chunk in enumerate(chunks):
+        match = exact.get(chunk)
+        if match is None:
+            signature = minhash_signature(chunk)
+            match = index.find(signature)
+            if match is None:
+                index.add(i, signature)
+                match = i
+            exact[chunk] = match
+        canonical.append(match)
+
+    unique_positions = sorted(set(canonical))
+    unique_index = {pos: n for n, pos in enumerate(unique_positions)}
+
+    return {
+        "unique_chunks": [chunks[pos] for pos in unique_positions],
+        "mapping": [unique_index[c] for c in canonical],
+        "stats": duplicate_stats(chunks, canonical)
+    }
@@ -1,30 +1,125 @@
 ﻿from src.rag.file_processor import process_uploaded_file
 from src.rag.embedder import embed_texts
 from src.rag.vector_store import FAISSVectorStore
+from src.rag.lexical_index import BM25Index
+from src.rag.near_duplicates import collapse_near_duplicates
 from src.rag.retriever import retrieve_relevant_chunks
+from src.rag.requirement_store import add_uploaded_file, ScopedStoreView
+from src.utils.deadline import DeadlineExceeded
 
 
-def run_rag_pipeline(uploaded_file, user_query=None):
+def run_rag_pipeline(uploaded_file, user_query=None, retrieval_mode="hybrid", deadline=None):
+    """
+    With a deadline, embedding that runs out of time degrades to
+    lexical retrieval (recorded on the deadline).
+    """
 
     # 1️⃣ Process file
-    chunks = process_uploaded_file(uploaded_file)
+    chunks = process_uploaded_file(uploaded_file, deadline=deadline)
 
-    # 2️⃣ Embed chunks
-    embeddings = embed_texts(chunks)
+    # 2️⃣ Build lexical index over every chunk (no embedding cost)
+    lexical_index = BM25Index()
+    lexical_index.add_documents(chunks)
 
-    # 3️⃣ Build vector store
-    dimension = len(embeddings[0])
-    store = FAISSVectorStore(dimension)
-    store.add_embeddings(embeddings, chunks)
+    # 3️⃣ Embed chunks + build vector store (skipped in lexical fast mode).
+    # Near-duplicates are embedded once; every chunk is indexed with
+    # its representative's vector, so none drops out of retrieval.
+    store = None
+    deduplication = None
+    if retrieval_mode != "lexical":
+        collapsed = collapse_near_duplicates(chunks)
+        deduplication = dict(collapsed["stats"], mapping=collapsed["mapping"])
+        try:
+            embeddings = embed_texts(collapsed["unique_chunks"], deadline=deadline)
+            dimension = len(embeddings[0])
+            store = FAISSVectorStore(dimension)
+            store.add_embeddings(embeddings[collapsed["mapping"]], chunks)
+        except DeadlineExceeded:
+            if deadline is None:
+                raise
+            deadline.degrade("embedding", "chunk embedding timed out; using lexical retrieval")
+            retrieval_mode = "lexical"
 
     # 4️⃣ Retrieve relevant chunks
     if user_query:
-        relevant_chunks = retrieve_relevant_chunks(store, user_query)
+        relevant_chunks = retrieve_relevant_chunks(
+            store,
+            user_query,
+            mode=retrieval_mode,
+            lexical_index=lexical_index,
+            deadline=deadline
+        )
     else:
         # If no query, just return top chunks
         relevant_chunks = chunks[:5]
 
     return {
         "total_chunks": len(chunks),
+        "retrieval_mode": retrieval_mode,
+        "deduplication": deduplication,
         "retrieved_chunks": relevant_chunks
-    }
\ No newline at end of file
+    }
+
+def run_store_rag_pipeline(
+    requirement_store,
+    uploaded_files=None,
+    user_query=None,
+    retrieval_mode="hybrid",
+    document_ids=None,
+    document_filters=None,
+    deadline=None
+):
+    """
+    Multi-document variant backed by the persistent RequirementStore.
+    New uploads are added incrementally (only unseen chunks are embedded);
+    retrieval is scoped to the uploaded documents plus any document_ids.
+
+    With a deadline, an upload that cannot be ingested in time is left
+    out (or searched as far as it was indexed) and recorded as degraded.
+    """
+
+    # 1️⃣ Add new uploads (no-op for documents already stored)
+    ingestion = []
+    for f in uploaded_files or []:
+        try:
+            ingestion.append(add_uploaded_file(requirement_store, f, deadline=deadline))
+        except DeadlineExceeded:
+            if deadline is None:
+                raise
+            deadline.degrade("ingestion", f"{f.name}: not indexed (extraction timed out)")
+
+    scope = list(document_ids or []) + [r["document_id"] for r in ingestion]
+    # Uploads that were left out must not widen the scope to every document
+    scope = requirement_store.resolve_document_ids(
+        document_ids=scope if (uploaded_files or document_ids) else None,
+        filters=document_filters
+    )
+
+    scoped_chunks = requirement_store.get_chunks(scope)
+    view = ScopedStoreView(requirement_store, scope, scoped_chunks)
+    texts = view.text_chunks
+
+    # 2️⃣ Retrieve relevant chunks
+    if user_query and texts:
+        lexical_index = BM25Index()
+        lexical_index.add_documents(texts)
+
+        relevant_chunks = retrieve_relevant_chunks(
+            view,
+            user_query,
+            mode=retrieval_mode,
+            lexical_index=lexical_index,
+            deadline=deadline
+        )
+    else:
+        relevant_chunks = texts[:5]
+
+    return {
+        "total_chunks": len(scoped_chunks),
+        "unique_chunks": len(view.positions),
+        "retrieval_mode": retrieval_mode,
+        "document_ids": scope,
+        "embedded_chunks": sum(r["embedded_chunks"] for r in ingestion),
+        "duplicate_chunks": sum(r["duplicate_chunks"] for r in ingestion),
+        "retrieved_chunks": relevant_chunks
+    }
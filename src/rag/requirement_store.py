@@ -0,0 +1,768 @@
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import threading
+import contextlib
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from src.rag.embedder import embed_texts
+from src.rag.file_processor import process_uploaded_file
+from src.rag.near_duplicates import NearDuplicateIndex, minhash_signature
+from src.rag.vector_store import (
+    VECTOR_STORAGE,
+    PQ_MIN_TRAINING_VECTORS,
+    PQ_FULL_TRAINING_VECTORS,
+    PQ_RESCORE_FACTOR,
+    new_index,
+    train_pq_index,
+    is_pq_index,
+    search_parameters,
+    exact_distances
+)
+from src.utils.atomic_file import atomic_path, atomic_write
+from src.utils.deadline import Deadline, DeadlineExceeded
+from src.utils.lazy_import import lazy_import
+
+faiss = lazy_import("faiss")
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_STORE_PATH = "data/requirement_store"
+
+# Chunks embedded (and made searchable) per step
+EMBED_BATCH_SIZE = 64
+
+# Ingestion cut short (deadline) or aborted (error): adding the same
+# content again resumes after the chunks already stored
+RESUMABLE_STATUSES = ("partial", "failed")
+
+# A worker ingesting a document renews its lease well within this;
+# an "ingesting" document whose lease ran out was left by a worker that
+# crashed or was scaled away, and is resumable like a "partial" one
+INGEST_LEASE_SEC = float(os.getenv("INGEST_LEASE_SEC", "120"))
+
+
+class IngestionLeaseLost(RuntimeError):
+    """
+    Raised when a document this worker was ingesting was taken over
+    by another worker (its lease ran out meanwhile) or deleted.
+    """
+
+
+def _hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hash_text(text: str) -> str:
+    return _hash_bytes(text.encode("utf-8"))
+
+
+def document_id_for(content: bytes) -> str:
+    return _hash_bytes(content)[:16]
+
+
+class RequirementStore:
+    """
+    Persistent multi-document requirement store.
+
+    Vectors live in a FAISS IndexIDMap2 keyed by chunk id, so single
+    documents can be added or removed without rebuilding the index.
+    Identical and near-duplicate chunk text (repeated boilerplate) is
+    embedded and indexed once: later copies keep their own chunk record,
+    with "duplicate_of" pointing at the chunk that holds the vector.
+
+    Several processes may share one store directory: writes hold an
+    exclusive file lock, and every operation reloads from disk first
+    if another process changed it.
+
+    Listing documents only reads meta.json; FAISS and the index file
+    are loaded on the first search or write.
+
+    A document being ingested is leased to one worker: a file under
+    leases/ naming the owner, kept fresh by a background thread. Once
+    the lease is older than INGEST_LEASE_SEC another worker may resume
+    the document; the old owner can then no longer append to it.
+
+    Vector storage (flat / fp16 / pq, see vector_store) is fixed when
+    the store is created. A pq store also writes exact float32 vectors
+    to vectors.f32, row = chunk id: enough of them train the PQ index,
+    and search re-scores PQ candidates against them. That file is read
+    through a memory map, so only the rows touched are paged in.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self.index_path = os.path.join(path, "index.faiss")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.lock_path = os.path.join(path, ".lock")
+        self.leases_path = os.path.join(path, "leases")
+
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.held_leases = set()
+        self.lease_thread = None
+
+        self.lock = threading.RLock()
+        self.meta_mtime = None
+        self.index_wanted = False
+        self._reset()
+        self.sync()
+
+    def _reset(self):
+        self.index = None
+        self.dimension = None
+        self.storage = VECTOR_STORAGE
+        self.pq_trained_on = 0
+        self.documents: Dict[str, Dict] = {}
+        self.chunks: Dict[int, Dict] = {}
+        self.chunk_hash_to_id: Dict[str, int] = {}
+        self.near_duplicates: Optional[NearDuplicateIndex] = None
+        self.next_chunk_id = 0
+
+    # ============================
+    # 💾 PERSISTENCE
+    # ============================
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextlib.contextmanager
+    def _writing(self):
+        with self.lock, self._file_lock(exclusive=True):
+            self.index_wanted = True
+            self._load_if_changed()
+            yield
+            self.save()
+
+    def sync(self, with_index: bool = False):
+        """
+        Pick up changes written by other processes.
+        """
+        with self.lock, self._file_lock(exclusive=False):
+            self.index_wanted = self.index_wanted or with_index
+            self._load_if_changed()
+
+    def _load_if_changed(self):
+        if not os.path.exists(self.meta_path):
+            return
+
+        mtime = os.path.getmtime(self.meta_path)
+        if mtime != self.meta_mtime:
+            self._reset()
+            self._load()
+            self.meta_mtime = mtime
+
+        # Read under the same file lock as the meta it belongs to
+        if self.index is None and self.index_wanted and os.path.exists(self.index_path):
+            self.index = faiss.read_index(self.index_path)
+
+    def _load(self):
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        self.dimension = meta["dimension"]
+        self.storage = meta.get("storage", "flat")
+        # Stores from before retraining were only trained on a full set
+        self.pq_trained_on = meta.get("pq_trained_on", PQ_FULL_TRAINING_VECTORS)
+        self.next_chunk_id = meta["next_chunk_id"]
+        self.documents = meta["documents"]
+        self.chunks = {int(cid): chunk for cid, chunk in meta["chunks"].items()}
+        self.chunk_hash_to_id = {
+            chunk["hash"]: cid for cid, chunk in self.chunks.items()
+        }
+
+    def save(self):
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+
+            # Atomic so readers never see partial files
+            if self.index is not None:
+                with atomic_path(self.index_path) as tmp_path:
+                    faiss.write_index(self.index, tmp_path)
+
+            meta = {
+                "dimension": self.dimension,
+                "storage": self.storage,
+                "pq_trained_on": self.pq_trained_on,
+                "next_chunk_id": self.next_chunk_id,
+                "documents": self.documents,
+                "chunks": {str(cid): chunk for cid, chunk in self.chunks.items()}
+            }
+            with atomic_write(self.meta_path) as f:
+                json.dump(meta, f)
+
+            self.meta_mtime = os.path.getmtime(self.meta_path)
+
+    # ============================
+    # 🔒 INGESTION LEASES
+    # ============================
+
+    def _lease_file(self, doc_id: str) -> str:
+        return os.path.join(self.leases_path, doc_id)
+
+    def _lease_owner(self, doc_id: str) -> Optional[str]:
+        """
+        Worker holding the document's lease, None if nobody holds a
+        live one. Caller holds the store file lock.
+        """
+        path = self._lease_file(doc_id)
+        try:
+            if time.time() - os.path.getmtime(path) > INGEST_LEASE_SEC:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _take_lease(self, doc_id: str):
+        with atomic_write(self._lease_file(doc_id)) as f:
+            f.write(self.owner)
+
+        self.held_leases.add(doc_id)
+        if self.lease_thread is None:
+            self.lease_thread = threading.Thread(target=self._renew_leases, daemon=True, name="ingest-lease")
+            self.lease_thread.start()
+
+    def _check_lease(self, doc_id: str):
+        if doc_id not in self.documents:
+            raise IngestionLeaseLost(f"Document {doc_id} was deleted during ingestion")
+        owner = self._lease_owner(doc_id)
+        if owner is not None and owner != self.owner:
+            raise IngestionLeaseLost(f"Document {doc_id} is being ingested by another worker")
+
+    def _release_lease(self, doc_id: str):
+        if doc_id in self.held_leases and self._lease_owner(doc_id) in (None, self.owner):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._lease_file(doc_id))
+        self.held_leases.discard(doc_id)
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(INGEST_LEASE_SEC / 4)
+            with self.lock:
+                doc_ids = list(self.held_leases)
+            for doc_id in doc_ids:
+                try:
+                    # Touching the file is the heartbeat
+                    os.utime(self._lease_file(doc_id))
+                except OSError as e:
+                    logger.warning("Ingestion lease for %s not renewed: %s", doc_id, e)
+
+    def _resumable(self, doc_id: str, doc: Dict) -> bool:
+        return doc["status"] in RESUMABLE_STATUSES or (
+            doc["status"] == "ingesting" and self._lease_owner(doc_id) is None
+        )
+
+    def is_stored(self, doc_id: str) -> bool:
+        """
+        True if the document is stored and need not be ingested again
+        (ready, or being ingested by a live worker).
+        """
+        with self.lock, self._file_lock(exclusive=False):
+            self._load_if_changed()
+            doc = self.documents.get(doc_id)
+            return doc is not None and not self._resumable(doc_id, doc)
+
+    # ============================
+    # ➕ ADD / ➖ DELETE
+    # ============================
+
+    def _ensure_index(self, dimension: int):
+        if self.index is None:
+            if self.dimension not in (None, dimension):
+                raise ValueError(
+                    f"Embedding dimension {dimension} does not match the store ({self.dimension})"
+                )
+            self.dimension = dimension
+            self.index = faiss.IndexIDMap2(new_index(dimension, self.storage))
+
+    def _write_exact_vectors(self, chunk_ids: List[int], vectors):
+        # Written in place: rows of new chunk ids are not referenced
+        # until meta.json is replaced
+        os.makedirs(self.path, exist_ok=True)
+        mode = "r+b" if os.path.exists(self.vectors_path) else "wb"
+        with open(self.vectors_path, mode) as f:
+            for cid, vector in zip(chunk_ids, vectors):
+                f.seek(cid * self.dimension * 4)
+                f.write(vector.tobytes())
+
+    def _exact_vectors(self, chunk_ids):
+        rows = np.memmap(self.vectors_path, dtype="float32", mode="r").reshape(-1, self.dimension)
+        return np.array(rows[np.asarray(chunk_ids, dtype="int64")])
+
+    def _stored_vectors(self, chunk_ids):
+        if self.storage == "pq":
+            return self._exact_vectors(chunk_ids)
+        return np.vstack([self.index.reconstruct(cid) for cid in chunk_ids])
+
+    def _maybe_train_pq(self):
+        # (Re)built from the exact vectors once there are enough, then
+        # each time the store doubles up to PQ_FULL_TRAINING_VECTORS;
+        # adds in between are encoded with the current codebooks
+        if self.storage != "pq" or self.index.ntotal < PQ_MIN_TRAINING_VECTORS:
+            return
+        if is_pq_index(self.index) and (
+            self.pq_trained_on >= PQ_FULL_TRAINING_VECTORS
+            or self.index.ntotal < 2 * self.pq_trained_on
+        ):
+            return
+
+        chunk_ids = sorted(cid for cid, chunk in self.chunks.items() if "duplicate_of" not in chunk)
+        self.index = train_pq_index(self._exact_vectors(chunk_ids), chunk_ids)
+        self.pq_trained_on = len(chunk_ids)
+
+    def add_document(
+        self,
+        name: str,
+        content: bytes,
+        chunks: List[str],
+        metadata: Optional[Dict] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Dict:
+        """
+        Add one document. Only chunks whose text is not already in the
+        store are embedded. Re-adding identical content is a no-op.
+
+        When the deadline passes between batches, the batches already
+        appended stay searchable and the document is marked "partial";
+        adding the same content again resumes after the stored chunks.
+        """
+        doc_id = self.begin_document(name, content, metadata)
+        if doc_id is None:
+            return {
+                "document_id": document_id_for(content),
+                "added": False,
+                "embedded_chunks": 0,
+                "duplicate_chunks": 0
+            }
+
+        embedded = duplicates = 0
+        try:
+            for start in range(self.stored_chunk_count(doc_id), len(chunks), EMBED_BATCH_SIZE):
+                counts = self.append_chunks(doc_id, chunks[start:start + EMBED_BATCH_SIZE], deadline)
+                embedded += counts["embedded_chunks"]
+                duplicates += counts["duplicate_chunks"]
+        except DeadlineExceeded:
+            self.finish_document(doc_id, status="partial")
+            deadline.degrade(
+                "ingestion",
+                f"{name}: {self.stored_chunk_count(doc_id)}/{len(chunks)} chunks indexed"
+            )
+            return {
+                "document_id": doc_id,
+                "added": True,
+                "partial": True,
+                "embedded_chunks": embedded,
+                "duplicate_chunks": duplicates
+            }
+
+        self.finish_document(doc_id)
+
+        return {
+            "document_id": doc_id,
+            "added": True,
+            "embedded_chunks": embedded,
+            "duplicate_chunks": duplicates
+        }
+
+    def begin_document(self, name: str, content: bytes, metadata: Optional[Dict] = None) -> Optional[str]:
+        """
+        Register an empty document in "ingesting" state so chunks can be
+        appended batch by batch and searched before ingestion finishes.
+        Returns None if the same content is already stored; a "partial"
+        or "failed" document, or one whose ingesting worker's lease ran
+        out, is reopened so ingestion can resume.
+        """
+        doc_id = document_id_for(content)
+
+        with self._writing():
+            existing = self.documents.get(doc_id)
+            if existing is not None:
+                if not self._resumable(doc_id, existing):
+                    return None
+                existing["status"] = "ingesting"
+                self._take_lease(doc_id)
+                return doc_id
+
+            self._take_lease(doc_id)
+            self.documents[doc_id] = {
+                "name": name,
+                "chunk_ids": [],
+                "status": "ingesting",
+                "added_at": time.time(),
+                "metadata": metadata or {}
+            }
+
+        return doc_id
+
+    def stored_chunk_count(self, doc_id: str) -> int:
+        with self.lock:
+            return len(self.documents[doc_id]["chunk_ids"])
+
+    def _canonical_id(self, cid: int) -> int:
+        return self.chunks[cid].get("duplicate_of", cid)
+
+    def _near_duplicate_index(self) -> NearDuplicateIndex:
+        # Rebuilt from chunk text after a reload or a delete
+        if self.near_duplicates is None:
+            index = NearDuplicateIndex()
+            for cid, chunk in self.chunks.items():
+                if "duplicate_of" not in chunk:
+                    index.add(cid, minhash_signature(chunk["text"]))
+            self.near_duplicates = index
+        return self.near_duplicates
+
+    def _plan_canonical(self, chunk_hashes: List[str], signatures: List, first_chunk_id: int) -> List[int]:
+        """
+        Canonical chunk id for each new chunk; its own id when it needs
+        a vector. Earlier chunks of the same batch count as stored.
+        Does not modify the store.
+        """
+        stored = self._near_duplicate_index()
+        batch = NearDuplicateIndex(stored.threshold)
+        batch_hashes: Dict[str, int] = {}
+        canonical = []
+
+        for i, (h, signature) in enumerate(zip(chunk_hashes, signatures)):
+            match = batch_hashes.get(h)
+            if match is None and h in self.chunk_hash_to_id:
+                match = self._canonical_id(self.chunk_hash_to_id[h])
+            if match is None:
+                match = stored.find(signature)
+            if match is None:
+                match = batch.find(signature)
+            if match is None:
+                match = first_chunk_id + i
+                batch.add(match, signature)
+            batch_hashes.setdefault(h, match)
+            canonical.append(match)
+
+        return canonical
+
+    def append_chunks(self, doc_id: str, chunks: List[str], deadline: Optional[Deadline] = None) -> Dict:
+        """
+        Append chunks to a document. Chunks that repeat (exactly or
+        nearly) a stored chunk or an earlier one in the batch share its
+        vector; only the rest are embedded and indexed.
+        Returns {"embedded_chunks": ..., "duplicate_chunks": ...}.
+        """
+        chunk_hashes = [_hash_text(chunk) for chunk in chunks]
+        signatures = [minhash_signature(chunk) for chunk in chunks]
+
+        self.sync()
+
+        with self.lock:
+            first = self.next_chunk_id
+            planned = self._plan_canonical(chunk_hashes, signatures, first)
+            new_positions = [i for i, cid in enumerate(planned) if cid == first + i]
+
+        # Embed outside the lock so other sessions can keep searching
+        new_embeddings = None
+        if new_positions:
+            new_embeddings = embed_texts([chunks[i] for i in new_positions], deadline=deadline)
+
+        with self._writing():
+            self._check_lease(doc_id)
+
+            # Planned again: another process may have written meanwhile
+            first = self.next_chunk_id
+            chunk_ids = list(range(first, first + len(chunks)))
+            canonical = self._plan_canonical(chunk_hashes, signatures, first)
+            owners = [i for i, cid in enumerate(canonical) if cid == chunk_ids[i]]
+
+            # hash -> row in new_embeddings
+            fresh = {chunk_hashes[i]: row for row, i in enumerate(new_positions)}
+            missing = [i for i in owners if chunk_hashes[i] not in fresh]
+            if missing:
+                # The stored chunk they matched was deleted meanwhile
+                extra = embed_texts([chunks[i] for i in missing], deadline=deadline)
+                offset = 0 if new_embeddings is None else len(new_embeddings)
+                new_embeddings = extra if new_embeddings is None else np.vstack([new_embeddings, extra])
+                fresh.update({chunk_hashes[i]: offset + n for n, i in enumerate(missing)})
+
+            doc = self.documents[doc_id]
+            offset = len(doc["chunk_ids"])
+            self.next_chunk_id += len(chunks)
+
+            for i, (chunk, h) in enumerate(zip(chunks, chunk_hashes)):
+                record = {
+                    "document_id": doc_id,
+                    "position": offset + i,
+                    "text": chunk,
+                    "hash": h
+                }
+                if canonical[i] != chunk_ids[i]:
+                    record["duplicate_of"] = canonical[i]
+                self.chunks[chunk_ids[i]] = record
+                self.chunk_hash_to_id.setdefault(h, chunk_ids[i])
+
+            if owners:
+                self._ensure_index(new_embeddings.shape[1])
+                owner_ids = [chunk_ids[i] for i in owners]
+                vectors = new_embeddings[[fresh[chunk_hashes[i]] for i in owners]]
+
+                if self.storage == "pq":
+                    self._write_exact_vectors(owner_ids, vectors)
+                self.index.add_with_ids(vectors, np.asarray(owner_ids, dtype="int64"))
+                self._maybe_train_pq()
+
+                index = self._near_duplicate_index()
+                for i, cid in zip(owners, owner_ids):
+                    index.add(cid, signatures[i])
+
+            doc["chunk_ids"].extend(chunk_ids)
+
+        return {
+            "embedded_chunks": len(new_positions) + len(missing),
+            "duplicate_chunks": len(chunks) - len(owners)
+        }
+
+    def finish_document(self, doc_id: str, status: str = "ready"):
+        """
+        Ends this worker's ingestion. A no-op if another worker has
+        taken the document over.
+        """
+        with self._writing():
+            if self._lease_owner(doc_id) not in (None, self.owner):
+                self.held_leases.discard(doc_id)
+                return
+            if doc_id in self.documents:
+                self.documents[doc_id]["status"] = status
+            self._release_lease(doc_id)
+
+    def delete_document(self, doc_id: str) -> bool:
+        with self._writing():
+            doc = self.documents.pop(doc_id, None)
+            if doc is None:
+                return False
+
+            # A worker still ingesting it fails its next append
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._lease_file(doc_id))
+            self.held_leases.discard(doc_id)
+
+            chunk_ids = doc["chunk_ids"]
+            removed = set(chunk_ids)
+
+            # Duplicates elsewhere of a removed chunk: the first of them
+            # takes its vector over, the rest point at that one
+            dependants: Dict[int, List[int]] = {}
+            for cid, chunk in self.chunks.items():
+                if cid not in removed and chunk.get("duplicate_of") in removed:
+                    dependants.setdefault(chunk["duplicate_of"], []).append(cid)
+
+            for old, group in dependants.items():
+                vector = self._stored_vectors([old])
+                if self.storage == "pq":
+                    self._write_exact_vectors(group[:1], vector)
+                self.index.add_with_ids(vector, np.asarray(group[:1], dtype="int64"))
+                del self.chunks[group[0]]["duplicate_of"]
+                for cid in group[1:]:
+                    self.chunks[cid]["duplicate_of"] = group[0]
+
+            owned = [cid for cid in chunk_ids if "duplicate_of" not in self.chunks[cid]]
+            if owned:
+                self.index.remove_ids(np.asarray(owned, dtype="int64"))
+
+            for cid in chunk_ids:
+                chunk = self.chunks.pop(cid)
+                if self.chunk_hash_to_id.get(chunk["hash"]) == cid:
+                    del self.chunk_hash_to_id[chunk["hash"]]
+
+            # Re-point hashes still held by other documents
+            for cid, chunk in self.chunks.items():
+                self.chunk_hash_to_id.setdefault(chunk["hash"], cid)
+            self.near_duplicates = None
+
+            return True
+
+    # ============================
+    # 🔍 LOOKUP
+    # ============================
+
+    def list_documents(self, filters: Optional[Dict] = None) -> List[Dict]:
+        """
+        filters: exact-match on document metadata fields
+        (plus "name").
+        """
+        filters = filters or {}
+        results = []
+
+        self.sync()
+
+        with self.lock:
+            for doc_id, doc in self.documents.items():
+                fields = dict(doc["metadata"], name=doc["name"])
+                if all(fields.get(k) == v for k, v in filters.items()):
+                    results.append({
+                        "document_id": doc_id,
+                        "name": doc["name"],
+                        "status": doc.get("status", "ready"),
+                        "chunk_count": len(doc["chunk_ids"]),
+                        "duplicate_chunks": sum(
+                            "duplicate_of" in self.chunks[cid] for cid in doc["chunk_ids"]
+                        ),
+                        "metadata": doc["metadata"]
+                    })
+
+        return results
+
+    def resolve_document_ids(
+        self,
+        document_ids: Optional[List[str]] = None,
+        filters: Optional[Dict] = None
+    ) -> List[str]:
+        ids = [d["document_id"] for d in self.list_documents(filters)]
+        if document_ids is not None:
+            ids = [doc_id for doc_id in ids if doc_id in document_ids]
+        return ids
+
+    def get_chunks(self, document_ids: List[str]) -> List[Dict]:
+        with self.lock:
+            return [
+                {"chunk_id": cid, **self.chunks[cid]}
+                for doc_id in document_ids
+                for cid in self.documents[doc_id]["chunk_ids"]
+            ]
+
+    # ============================
+    # 🚀 SEARCH
+    # ============================
+
+    def search_ids(
+        self,
+        query_embedding,
+        top_k: int = 5,
+        document_ids: Optional[List[str]] = None
+    ):
+        """
+        Returns [(chunk_id, distance)], optionally scoped to documents.
+        Only chunks that hold a vector are returned, never their duplicates.
+        """
+        self.sync(with_index=True)
+
+        with self.lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+
+            params = None
+            if document_ids is not None:
+                scoped = [
+                    self._canonical_id(cid)
+                    for doc_id in document_ids
+                    for cid in self.documents.get(doc_id, {}).get("chunk_ids", [])
+                ]
+                if not scoped:
+                    return []
+                params = search_parameters(self.index, scoped)
+
+            query_vector = np.asarray([query_embedding], dtype="float32")
+            candidate_k = top_k * PQ_RESCORE_FACTOR if self.storage == "pq" else top_k
+            distances, indices = self.index.search(query_vector, candidate_k, params=params)
+
+            hits = [
+                (int(cid), float(dist))
+                for dist, cid in zip(distances[0], indices[0])
+                if cid >= 0
+            ]
+
+            if self.storage == "pq" and hits:
+                chunk_ids = [cid for cid, _ in hits]
+                exact = exact_distances(query_vector[0], self._exact_vectors(chunk_ids))
+                hits = sorted(
+                    ((cid, float(dist)) for cid, dist in zip(chunk_ids, exact)),
+                    key=lambda hit: hit[1]
+                )[:top_k]
+
+        return hits
+
+    def search(self, query_embedding, top_k: int = 5, document_ids=None) -> List[str]:
+        return [
+            self.chunks[cid]["text"]
+            for cid, _ in self.search_ids(query_embedding, top_k, document_ids)
+        ]
+
+
+def add_uploaded_file(
+    store: RequirementStore,
+    file,
+    metadata: Optional[Dict] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict:
+    """
+    Accepts Streamlit uploaded file.
+    Skips extraction entirely when the same bytes were stored before
+    (unless that ingestion was cut short, failed or abandoned and can
+    be resumed).
+    """
+    content = file.getvalue()
+    doc_id = document_id_for(content)
+
+    if store.is_stored(doc_id):
+        return {"document_id": doc_id, "added": False, "embedded_chunks": 0, "duplicate_chunks": 0}
+
+    # Nothing is stored if extraction runs out of time
+    chunks = process_uploaded_file(file, deadline=deadline)
+
+    return store.add_document(
+        name=file.name,
+        content=content,
+        chunks=chunks,
+        metadata=dict(metadata or {}, type=file.type),
+        deadline=deadline
+    )
+
+
+class ScopedStoreView:
+    """
+    FAISSVectorStore-compatible view over a subset of stored documents.
+    Ids returned by search_ids are positions in text_chunks, so results
+    can be fused with a BM25Index built over the same chunk list.
+
+    chunks come from get_chunks(); every one keeps its own position.
+    A vector hit on a chunk is reported for each chunk in scope that
+    shares its vector (its duplicates), at the same distance.
+    """
+
+    def __init__(self, store: RequirementStore, document_ids: List[str], chunks: List[Dict]):
+        self.store = store
+        self.document_ids = document_ids
+        self.text_chunks: List[str] = [chunk["text"] for chunk in chunks]
+
+        # chunk id holding the vector -> positions sharing it
+        self.positions: Dict[int, List[int]] = {}
+        for pos, chunk in enumerate(chunks):
+            canonical = chunk.get("duplicate_of", chunk["chunk_id"])
+            self.positions.setdefault(canonical, []).append(pos)
+
+    def search_ids(self, query_embedding, top_k=5):
+        hits = [
+            (pos, dist)
+            for cid, dist in self.store.search_ids(query_embedding, top_k, self.document_ids)
+            for pos in self.positions.get(cid, ())
+        ]
+        return hits[:top_k]
+
+    def search(self, query_embedding, top_k=5):
+        return [self.text_chunks[pos] for pos, _ in self.search_ids(query_embedding, top_k)]
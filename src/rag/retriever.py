@@ -1,7 +1,69 @@
+from typing import Dict, List, Optional
 from src.rag.embedder import embed_texts
+from src.utils.deadline import Deadline, DeadlineExceeded
 
 
-def retrieve_relevant_chunks(vector_store, query: str, top_k=5):
-    query_embedding = embed_texts([query])[0]
-    results = vector_store.search(query_embedding, top_k=top_k)
-    return results
\ No newline at end of file
+RETRIEVAL_MODES = ["vector", "lexical", "hybrid"]
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[int]], k: int = 60) -> List[int]:
+    """
+    Merge several ranked id lists.
+    score(id) = sum over lists of 1 / (k + rank)
+    """
+    scores: Dict[int, float] = {}
+
+    for ranked in ranked_lists:
+        for rank, doc_id in enumerate(ranked, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+
+
+def retrieve_relevant_chunks(
+    vector_store,
+    query: str,
+    top_k=5,
+    mode: str = "vector",
+    lexical_index=None,
+    deadline: Optional[Deadline] = None
+):
+    """
+    mode:
+    - vector:  embed query, FAISS search
+    - lexical: BM25 only, no embedding call
+    - hybrid:  BM25 + vector, reciprocal rank fusion
+
+    If the query embedding runs out of time and a lexical index is
+    available, BM25 results are returned and the deadline is marked degraded.
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+
+    if mode == "lexical":
+        return lexical_index.search(query, top_k=top_k)
+
+    try:
+        query_embedding = embed_texts([query], deadline=deadline)[0]
+    except DeadlineExceeded:
+        if lexical_index is None:
+            raise
+        deadline.degrade("retrieval", f"{mode} retrieval fell back to lexical (query embedding timed out)")
+        return lexical_index.search(query, top_k=top_k)
+
+    if mode == "vector":
+        return vector_store.search(query_embedding, top_k=top_k)
+
+    # Over-fetch from both sides so fusion has room to reorder
+    candidate_k = top_k * 4
+
+    vector_ids = [
+        idx for idx, _ in vector_store.search_ids(query_embedding, top_k=candidate_k)
+    ]
+    lexical_ids = [
+        idx for idx, _ in lexical_index.search_ids(query, top_k=candidate_k)
+    ]
+
+    fused_ids = reciprocal_rank_fusion([vector_ids, lexical_ids])
+
+    return [vector_store.text_chunks[idx] for idx in fused_ids[:top_k]]
@@ -1,26 +1,124 @@
-import faiss
-import numpy as np
+import os
+from src.utils.lazy_import import lazy_import
+
+faiss = lazy_import("faiss")
+np = lazy_import("numpy")
+
+
+# How vectors are held in memory and on disk:
+#   flat - float32, exact (4 bytes per dimension)
+#   fp16 - half precision (2 bytes per dimension), near-identical ranking
+#   pq   - product-quantized codes (1 byte per PQ_DIMS_PER_CODE dimensions);
+#          candidates are re-scored against exact vectors kept on disk
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "fp16")
+VECTOR_STORAGE_MODES = ("flat", "fp16", "pq")
+
+PQ_DIMS_PER_CODE = 8
+PQ_CODE_BITS = 8
+
+# k-means needs at least one training point per centroid (256 per
+# sub-quantizer codebook); until then a pq store keeps fp16 vectors.
+# Early codebooks are coarse (exact re-scoring makes up for it) and are
+# retrained each time the store doubles, until they have the ~39
+# points per centroid faiss recommends.
+PQ_MIN_TRAINING_VECTORS = 1 << PQ_CODE_BITS
+PQ_FULL_TRAINING_VECTORS = 39 * PQ_MIN_TRAINING_VECTORS
+
+# Candidates fetched per requested result before exact re-scoring
+PQ_RESCORE_FACTOR = 8
+
+
+def as_vector_matrix(embeddings):
+    """
+    Embeddings as one contiguous float32 (n, dimension) array
+    (no copy when they already are).
+    """
+    vectors = np.ascontiguousarray(embeddings, dtype="float32")
+    return vectors.reshape(1, -1) if vectors.ndim == 1 else vectors
+
+
+def new_index(dimension: int, storage: str = VECTOR_STORAGE):
+    """
+    Empty index that needs no training. pq starts out as fp16;
+    see train_pq_index.
+    """
+    if storage not in VECTOR_STORAGE_MODES:
+        raise ValueError(f"Unknown vector storage: {storage}")
+    if storage == "flat":
+        return faiss.IndexFlatL2(dimension)
+    return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+
+
+def pq_subquantizers(dimension: int) -> int:
+    m = max(1, dimension // PQ_DIMS_PER_CODE)
+    while dimension % m:
+        m -= 1
+    return m
+
+
+def train_pq_index(vectors, ids):
+    """
+    PQ index trained on and holding the given vectors.
+    A single-list IVF, because plain IndexPQ rejects id selectors.
+    """
+    dimension = vectors.shape[1]
+    index = faiss.IndexIVFPQ(
+        faiss.IndexFlatL2(dimension), dimension, 1, pq_subquantizers(dimension), PQ_CODE_BITS
+    )
+    # Below PQ_FULL_TRAINING_VECTORS on purpose: no per-codebook warning
+    index.pq.cp.min_points_per_centroid = 1
+    index.train(vectors)
+    index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    return index
+
+
+def is_pq_index(index) -> bool:
+    return isinstance(index, faiss.IndexIVF)
+
+
+def search_parameters(index, ids):
+    selector = faiss.IDSelectorBatch(np.asarray(ids, dtype="int64"))
+    if is_pq_index(index):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nlist)
+    return faiss.SearchParameters(sel=selector)
+
+
+def exact_distances(query_vector, vectors):
+    """
+    Squared L2 distances (what IndexFlatL2 reports) from one query.
+    """
+    diff = vectors - query_vector.reshape(1, -1)
+    return np.einsum("ij,ij->i", diff, diff)
 
 
 class FAISSVectorStore:
+    """
+    In-memory index for one request's chunks. These never reach the
+    size where pq pays off, so pq storage falls back to fp16 here.
+    """
 
-    def __init__(self, dimension: int):
+    def __init__(self, dimension: int, storage: str = VECTOR_STORAGE):
         self.dimension = dimension
-        self.index = faiss.IndexFlatL2(dimension)
+        self.index = new_index(dimension, storage)
         self.text_chunks = []
 
     def add_embeddings(self, embeddings, chunks):
-        vectors = np.array(embeddings).astype("float32")
-        self.index.add(vectors)
+        self.index.add(as_vector_matrix(embeddings))
         self.text_chunks.extend(chunks)
 
-    def search(self, query_embedding, top_k=5):
-        query_vector = np.array([query_embedding]).astype("float32")
+    def search_ids(self, query_embedding, top_k=5):
+        query_vector = as_vector_matrix(query_embedding)
         distances, indices = self.index.search(query_vector, top_k)
 
         results = []
-        for idx in indices[0]:
-            if idx < len(self.text_chunks):
-                results.append(self.text_chunks[idx])
+        for dist, idx in zip(distances[0], indices[0]):
+            if 0 <= idx < len(self.text_chunks):
+                results.append((int(idx), float(dist)))
 
-        return results
\ No newline at end of file
+        return results
+
+    def search(self, query_embedding, top_k=5):
+        return [
+            self.text_chunks[idx]
+            for idx, _ in self.search_ids(query_embedding, top_k=top_k)
+        ]
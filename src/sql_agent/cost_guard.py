@@ -0,0 +1,460 @@
+import os
+import re
+from typing import Dict, List, Optional
+
+
+# ============================
+# ⚙️ POLICY
+# ============================
+
+# warn:       report scan risk, run the SQL unchanged
+# rewrite:    also apply rewrites that return the same rows
+# regenerate: also send high-risk SQL back to generation with the reason
+SQL_COST_POLICY = os.getenv("SQL_COST_POLICY", "rewrite")
+COST_POLICIES = ("warn", "rewrite", "regenerate")
+
+SQL_COST_MAX_REGENERATIONS = int(os.getenv("SQL_COST_MAX_REGENERATIONS", "1"))
+
+# Scans below SMALL are cheap; at or above LARGE they risk the executor timeout
+SMALL_TABLE_ROWS = int(os.getenv("SQL_COST_SMALL_TABLE_ROWS", "10000"))
+LARGE_TABLE_ROWS = int(os.getenv("SQL_COST_LARGE_TABLE_ROWS", "1000000"))
+
+# Azure SQL's default collation is case-insensitive, so UPPER()/LOWER()
+# around a compared column change nothing but the index use
+CASE_INSENSITIVE_COLLATION = os.getenv("SQL_CASE_INSENSITIVE_COLLATION", "1") == "1"
+
+RISK_LEVELS = ["none", "low", "medium", "high"]
+
+DATE_TYPES = {"date", "datetime", "datetime2", "smalldatetime", "datetimeoffset"}
+
+
+# ============================
+# 🔍 SQL SCANNING
+# ============================
+
+NAME = r"(?:\[[^\]]+\]|\w+)"
+COLUMN_REF = rf"(?:{NAME}\.)?{NAME}"
+
+STRING_LITERAL = re.compile(r"N?'(?:[^']|'')*'")
+
+CLAUSE_END = r"(?=\b(?:GROUP\s+BY|ORDER\s+BY|HAVING|OPTION|UNION)\b|$)"
+WHERE_CLAUSE = re.compile(rf"\bWHERE\b(.*?){CLAUSE_END}", re.I | re.S)
+ORDER_CLAUSE = re.compile(r"\bORDER\s+BY\b(.*?)(?=\bOPTION\b|$)", re.I | re.S)
+ON_CLAUSE = re.compile(
+    r"\bON\b(.*?)(?=\b(?:INNER|LEFT|RIGHT|FULL|CROSS|JOIN|WHERE|GROUP|ORDER|HAVING|OPTION)\b|$)",
+    re.I | re.S
+)
+
+NOT_ALIAS = r"(?!(?:WHERE|ON|INNER|LEFT|RIGHT|FULL|CROSS|OUTER|JOIN|GROUP|ORDER|HAVING|OPTION|WITH|UNION)\b)"
+TABLE_REF = re.compile(
+    rf"\b(?:FROM|JOIN)\s+(?P<table>(?:{NAME}\.)*{NAME})(?:\s+(?:AS\s+)?{NOT_ALIAS}(?P<alias>\w+))?",
+    re.I
+)
+
+# Bare column compared to something: "col = ...", "t.col IN (...)"
+PREDICATE = re.compile(
+    rf"(?<![\w.\]'])(?P<ref>{COLUMN_REF})\s*"
+    r"(?P<op><=|>=|<>|!=|=|<|>|\bNOT\s+LIKE\b|\bLIKE\b|\bNOT\s+IN\b|\bIN\b|\bBETWEEN\b|\bIS\s+NOT\b|\bIS\b)",
+    re.I
+)
+SEEK_OPERATORS = {"=", "<", ">", "<=", ">=", "IN", "BETWEEN", "LIKE", "IS"}
+
+# Column wrapped in a function: no index seek on it
+WRAPPED_FIRST_ARG = re.compile(
+    rf"\b(?P<func>UPPER|LOWER|RTRIM|LTRIM|TRIM|YEAR|MONTH|DAY|ISNULL|COALESCE|SUBSTRING|LEFT|RIGHT|CAST)"
+    rf"\s*\(\s*(?P<ref>{COLUMN_REF})\s*(?:[,)]|\s+AS\b)",
+    re.I
+)
+WRAPPED_SECOND_ARG = re.compile(
+    rf"\b(?P<func>CONVERT|TRY_CONVERT|DATEPART|DATENAME)\s*\(\s*\w+(?:\s*\(\s*\d+\s*\))?\s*,\s*(?P<ref>{COLUMN_REF})\s*[,)]",
+    re.I
+)
+
+# Literals are masked: the pattern text is checked in the original SQL
+LIKE_PATTERN = re.compile(rf"(?P<ref>{COLUMN_REF})\s+(?P<not>NOT\s+)?LIKE\s+(?P<literal>N?'[^']*')", re.I)
+WILDCARD_FREE_LITERAL = re.compile(r"N?'(?:[^'%_\[]|'')*[^'%_\[ ]'")
+JOIN_EQUALITY = re.compile(rf"(?P<left>{COLUMN_REF})\s*=\s*(?P<right>{COLUMN_REF})(?!\s*\()")
+
+# Rewrites (matched on the masked SQL, applied to the original)
+CASE_FOLD = re.compile(
+    rf"\b(?:UPPER|LOWER)\s*\(\s*(?P<ref>{COLUMN_REF})\s*\)(?=\s*(?:<=|>=|<>|!=|=|<|>|\bNOT\b|\bLIKE\b|\bIN\b))",
+    re.I
+)
+RTRIM_EQUALITY = re.compile(
+    rf"\bRTRIM\s*\(\s*(?P<ref>{COLUMN_REF})\s*\)(?=\s*(?:<>|!=|=|\bNOT\s+IN\b|\bIN\b))",
+    re.I
+)
+YEAR_EQUALS = re.compile(rf"\bYEAR\s*\(\s*(?P<ref>{COLUMN_REF})\s*\)\s*=\s*(?P<year>\d{{4}})\b", re.I)
+
+
+def _mask_literal(match) -> str:
+    text = match.group(0)
+    quote = text.index("'")
+    return text[:quote + 1] + "_" * (len(text) - quote - 2) + "'"
+
+
+def _mask_literals(sql: str) -> str:
+    # Same length, so positions in the mask are positions in the SQL
+    return STRING_LITERAL.sub(_mask_literal, sql)
+
+
+def _unquote(name: str) -> str:
+    return name.strip("[]").lower()
+
+
+def _clause_spans(pattern, masked: str) -> List[tuple]:
+    return [match.span(1) for match in pattern.finditer(masked)]
+
+
+def _in_spans(position: int, spans: List[tuple]) -> bool:
+    return any(start <= position < end for start, end in spans)
+
+
+def _top_level(text: str) -> str:
+    # Drop parenthesised parts (IN lists, nested conditions)
+    previous = None
+    while previous != text:
+        previous, text = text, re.sub(r"\([^()]*\)", " ", text)
+    return text
+
+
+# ============================
+# 🗂️ INDEX METADATA
+# ============================
+
+def index_metadata(schema: Dict) -> Dict[str, Dict]:
+    """
+    Per table (lowercase name): leading index columns (usable by a seek),
+    column types and names, and the captured row count.
+
+    Caches written before key_ordinal was captured count every index
+    column as leading.
+    """
+    tables = {}
+
+    for table in schema.get("tables", []):
+        leading = {
+            idx["column"].lower()
+            for idx in table.get("indexes", [])
+            if not idx.get("included") and idx.get("key_ordinal", 1) == 1
+        }
+        if table.get("primary_keys"):
+            leading.add(table["primary_keys"][0].lower())
+
+        tables[table["name"].lower()] = {
+            "name": table["name"],
+            "leading": leading,
+            "types": {c["name"].lower(): c["type"].lower() for c in table.get("columns", [])},
+            "columns": {c["name"].lower(): c["name"] for c in table.get("columns", [])},
+            "rows": table.get("row_count")
+        }
+
+    return tables
+
+
+def _table_aliases(masked: str, tables: Dict) -> Dict[str, str]:
+    aliases = {}
+    for match in TABLE_REF.finditer(masked):
+        table = _unquote(re.split(r"\.(?![^\[]*\])", match.group("table"))[-1])
+        if table in tables:
+            aliases[table] = table
+            if match.group("alias"):
+                aliases[match.group("alias").lower()] = table
+    return aliases
+
+
+def _resolve(ref: str, aliases: Dict[str, str], tables: Dict) -> Optional[tuple]:
+    """
+    (table, column) for a column reference, or None if it is not a
+    column of a table in the query.
+    """
+    parts = [_unquote(p) for p in re.findall(NAME, ref)]
+    column = parts[-1]
+
+    if len(parts) > 1:
+        table = aliases.get(parts[-2])
+        return (table, column) if table and column in tables[table]["types"] else None
+
+    owners = {t for t in aliases.values() if column in tables[t]["types"]}
+    return (owners.pop(), column) if len(owners) == 1 else None
+
+
+def scan_risk(rows: Optional[int]) -> str:
+    if rows is None:
+        return "medium"
+    if rows < SMALL_TABLE_ROWS:
+        return "low"
+    return "high" if rows >= LARGE_TABLE_ROWS else "medium"
+
+
+def _max_risk(levels) -> str:
+    return max(levels, key=RISK_LEVELS.index, default="none")
+
+
+# ============================
+# 📊 ANALYSIS
+# ============================
+
+def analyze_sql_cost(sql: str, schema: Dict) -> Dict:
+    """
+    Static scan-risk estimate from the captured index metadata
+    (no round trip to the database).
+
+    Per table: "seek" when a WHERE predicate can use a leading index
+    column, else "scan". Findings name the filter, join and ORDER BY
+    columns that force scans, with a risk from the table's row count.
+    """
+    tables = index_metadata(schema)
+    masked = _mask_literals(sql)
+    aliases = _table_aliases(masked, tables)
+    in_query = sorted(set(aliases.values()))
+
+    where_spans = _clause_spans(WHERE_CLAUSE, masked)
+    where_text = " ".join(masked[start:end] for start, end in where_spans)
+    has_or = re.search(r"\bOR\b", _top_level(where_text), re.I) is not None
+
+    findings = []
+
+    def finding(kind, table, column, risk, detail):
+        findings.append({
+            "kind": kind,
+            "table": tables[table]["name"],
+            "column": tables[table]["columns"].get(column, column),
+            "risk": risk,
+            "detail": detail
+        })
+
+    # 1️⃣ WHERE: which predicates could drive a seek
+    sargable, filtered = {}, {}
+    for match in PREDICATE.finditer(masked):
+        if not _in_spans(match.start(), where_spans):
+            continue
+        resolved = _resolve(match.group("ref"), aliases, tables)
+        if resolved is None:
+            continue
+        table, column = resolved
+        op = " ".join(match.group("op").upper().split())
+        filtered.setdefault(table, set()).add(column)
+        if op in SEEK_OPERATORS and column in tables[table]["leading"]:
+            sargable.setdefault(table, set()).add(column)
+
+    wildcard = [
+        (_resolve(m.group("ref"), aliases, tables), m)
+        for m in LIKE_PATTERN.finditer(masked)
+        if _in_spans(m.start(), where_spans)
+        and sql[m.start("literal"):m.end("literal")].lstrip("N").startswith("'%")
+    ]
+    wrapped = [
+        (_resolve(m.group("ref"), aliases, tables), m)
+        for pattern in (WRAPPED_FIRST_ARG, WRAPPED_SECOND_ARG)
+        for m in pattern.finditer(masked)
+        if _in_spans(m.start(), where_spans)
+    ]
+    for resolved, _ in wildcard:
+        if resolved:
+            sargable.get(resolved[0], set()).discard(resolved[1])
+
+    access = {}
+    for table in in_query:
+        seek = bool(sargable.get(table))
+        if has_or:
+            # An OR branch on an unindexed column still reads every row
+            seek = seek and filtered.get(table, set()) <= tables[table]["leading"]
+        access[table] = "seek" if seek else "scan"
+
+    def risk_for(table):
+        return scan_risk(tables[table]["rows"]) if access[table] == "scan" else "low"
+
+    for resolved, m in wildcard:
+        if resolved:
+            finding(
+                "leading_wildcard", resolved[0], resolved[1], risk_for(resolved[0]),
+                "LIKE with a leading % cannot use an index"
+            )
+    for resolved, m in wrapped:
+        if resolved:
+            finding(
+                "wrapped_column", resolved[0], resolved[1], risk_for(resolved[0]),
+                f"{m.group('func').upper()}() around the column prevents an index seek"
+            )
+    reported = {(f["table"].lower(), f["column"].lower()) for f in findings}
+    for table in in_query:
+        unindexed = sorted(
+            column for column in filtered.get(table, set()) - tables[table]["leading"]
+            if (table, column) not in reported
+        )
+        if access[table] == "scan" and unindexed:
+            for column in unindexed:
+                finding("unindexed_filter", table, column, risk_for(table), "filter column has no leading index")
+
+    # 2️⃣ JOINs: a seek needs an index on at least one side
+    for start, end in _clause_spans(ON_CLAUSE, masked):
+        for m in JOIN_EQUALITY.finditer(masked, start, end):
+            left = _resolve(m.group("left"), aliases, tables)
+            right = _resolve(m.group("right"), aliases, tables)
+            if not left or not right:
+                continue
+            if left[1] in tables[left[0]]["leading"] or right[1] in tables[right[0]]["leading"]:
+                continue
+            risk = _max_risk([scan_risk(tables[left[0]]["rows"]), scan_risk(tables[right[0]]["rows"])])
+            finding(
+                "unindexed_join", left[0], left[1], risk,
+                f"join to {tables[right[0]]['name']}.{tables[right[0]]['columns'][right[1]]}: neither side is indexed"
+            )
+
+    # 3️⃣ ORDER BY: without an index every matching row is sorted before TOP
+    for start, end in _clause_spans(ORDER_CLAUSE, masked):
+        for item in _top_level(masked[start:end]).split(","):
+            words = item.split()
+            resolved = _resolve(words[0], aliases, tables) if words else None
+            if resolved and resolved[1] not in tables[resolved[0]]["leading"]:
+                finding(
+                    "unindexed_order", resolved[0], resolved[1], risk_for(resolved[0]),
+                    "ORDER BY column is not indexed; all matching rows are sorted"
+                )
+
+    return {
+        "risk": _max_risk(f["risk"] for f in findings),
+        "access": {tables[t]["name"]: access[t] for t in in_query},
+        "row_counts": {tables[t]["name"]: tables[t]["rows"] for t in in_query},
+        "findings": findings
+    }
+
+
+# ============================
+# ✏️ SAFE REWRITES
+# ============================
+
+def rewrite_sql(sql: str, schema: Dict) -> Dict:
+    """
+    Rewrites that return the same rows and let the column use an index:
+    - UPPER(col)/LOWER(col) compared -> col (case-insensitive collation)
+    - RTRIM(col) =, <>, IN -> col (= ignores trailing spaces)
+    - YEAR(date_col) = 2024 -> half-open date range
+    - col LIKE 'text' without wildcards -> col = 'text'
+    Returns {"sql": ..., "rewrites": [description, ...]}.
+    """
+    tables = index_metadata(schema)
+    rewrites = []
+
+    # One rewrite can expose another: UPPER(col) LIKE 'X' -> col LIKE 'X' -> col = 'X'
+    for _ in range(3):
+        sql, applied = _rewrite_once(sql, tables)
+        if not applied:
+            break
+        rewrites.extend(applied)
+
+    return {"sql": sql, "rewrites": rewrites}
+
+
+def _rewrite_once(sql: str, tables: Dict) -> tuple:
+    masked = _mask_literals(sql)
+    aliases = _table_aliases(masked, tables)
+    where_spans = _clause_spans(WHERE_CLAUSE, masked)
+
+    def column_type(ref):
+        resolved = _resolve(ref, aliases, tables)
+        return tables[resolved[0]]["types"][resolved[1]] if resolved else None
+
+    def literal(m):
+        return sql[m.start("literal"):m.end("literal")]
+
+    edits = []
+    for pattern, applies in (
+        (CASE_FOLD, lambda m: CASE_INSENSITIVE_COLLATION),
+        (RTRIM_EQUALITY, lambda m: True),
+        (YEAR_EQUALS, lambda m: column_type(m.group("ref")) in DATE_TYPES),
+        (LIKE_PATTERN, lambda m: not m.group("not") and WILDCARD_FREE_LITERAL.fullmatch(literal(m)))
+    ):
+        for m in pattern.finditer(masked):
+            if not _in_spans(m.start(), where_spans) or not applies(m):
+                continue
+            ref = sql[m.start("ref"):m.end("ref")]
+
+            if pattern is YEAR_EQUALS:
+                year = int(m.group("year"))
+                replacement = f"({ref} >= '{year}-01-01' AND {ref} < '{year + 1}-01-01')"
+            elif pattern is LIKE_PATTERN:
+                replacement = f"{ref} = {literal(m)}"
+            else:
+                replacement = ref
+
+            edits.append((m.start(), m.end(), replacement, f"{sql[m.start():m.end()]} -> {replacement}"))
+
+    # Later edits first so earlier offsets stay valid; overlapping ones wait a pass
+    applied = []
+    last_start = len(sql)
+    for start, end, replacement, description in sorted(edits, reverse=True):
+        if end > last_start:
+            continue
+        sql = sql[:start] + replacement + sql[end:]
+        last_start = start
+        applied.append(description)
+
+    return sql, list(reversed(applied))
+
+
+# ============================
+# 🚦 POLICY DECISION
+# ============================
+
+def _regeneration_reason(analysis: Dict, schema: Dict) -> str:
+    tables = index_metadata(schema)
+    problems = [
+        f"{f['table']}.{f['column']}: {f['detail']}"
+        for f in analysis["findings"]
+        if f["risk"] == "high"
+    ]
+    indexed = []
+    for name in analysis["access"]:
+        table = tables[name.lower()]
+        columns = sorted(table["columns"].get(c, c) for c in table["leading"])
+        indexed.append(f"{table['name']}({', '.join(columns) or 'none'})")
+    return (
+        "High scan risk: " + "; ".join(problems)
+        + ". Indexed columns: " + "; ".join(indexed)
+        + ". Filter, join and sort on indexed columns and avoid leading-% LIKE and functions on filtered columns."
+    )
+
+
+def review_sql_cost(
+    sql: str,
+    schema: Dict,
+    policy: str = SQL_COST_POLICY,
+    allow_regenerate: bool = True
+) -> Dict:
+    """
+    Runs after validate_sql.
+
+    action:
+    - "pass":       nothing above low risk
+    - "warn":       run it (rewritten where possible); findings attached
+    - "regenerate": generate again with "reason" (policy regenerate,
+                    high risk left after rewrites, retries left)
+    """
+    if policy not in COST_POLICIES:
+        raise ValueError(f"Unknown SQL cost policy: {policy}")
+
+    rewrites = []
+    if policy != "warn":
+        rewritten = rewrite_sql(sql, schema)
+        sql, rewrites = rewritten["sql"], rewritten["rewrites"]
+
+    analysis = analyze_sql_cost(sql, schema)
+
+    action = "pass"
+    reason = None
+    if analysis["risk"] == "high" and policy == "regenerate" and allow_regenerate:
+        action = "regenerate"
+        reason = _regeneration_reason(analysis, schema)
+    elif RISK_LEVELS.index(analysis["risk"]) >= RISK_LEVELS.index("medium"):
+        action = "warn"
+
+    return {
+        "sql": sql,
+        "action": action,
+        "reason": reason,
+        "policy": policy,
+        "rewrites": rewrites,
+        **analysis
+    }
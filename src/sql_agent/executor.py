@@ -1,26 +1,34 @@
 ﻿import os
 import time
-import pandas as pd
-import pymssql
-from typing import Dict
+from typing import Dict, Optional
 from dotenv import load_dotenv
+from src.utils.deadline import Deadline, DeadlineExceeded, stage_timeout, whole_seconds
+from src.utils.lazy_import import lazy_import
+from src.sql_agent.formatter import compact_dataframe, memory_usage_bytes
+
+pd = lazy_import("pandas")
+pymssql = lazy_import("pymssql")
 
 load_dotenv()
 
 
+# Upper bound per statement; a request deadline can only shorten it
+SQL_EXECUTION_TIMEOUT_SEC = 15
+
+
 # ============================
 # 🔐 CONNECTION
 # ============================
 
-def get_connection():
+def get_connection(timeout: int = SQL_EXECUTION_TIMEOUT_SEC):
     return pymssql.connect(
         server=os.getenv("AZURE_SQL_SERVER"),
         user=os.getenv("AZURE_SQL_USERNAME"),
         password=os.getenv("AZURE_SQL_PASSWORD"),
         database=os.getenv("AZURE_SQL_DATABASE"),
         port=1433,
-        login_timeout=5,
-        timeout=15  # execution timeout (seconds)
+        login_timeout=min(5, timeout),
+        timeout=timeout  # execution timeout (seconds)
     )
 
 
@@ -30,20 +38,28 @@ def get_connection():
 
 def execute_sql_query(
     sql: str,
-    max_rows: int = 100
+    max_rows: int = 100,
+    params=None,
+    deadline: Optional[Deadline] = None
 ) -> Dict:
     """
     Execute validated SQL safely.
+    params are bound by the driver (%s placeholders).
+    The statement timeout is the remaining request budget (capped).
     Returns structured execution result.
     """
 
     start_time = time.time()
 
     try:
-        conn = get_connection()
+        timeout = stage_timeout(deadline, "sql_execution", SQL_EXECUTION_TIMEOUT_SEC)
+        conn = get_connection(whole_seconds(timeout))
         cursor = conn.cursor(as_dict=True)
 
-        cursor.execute(sql)
+        if params is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql, params)
 
         rows = cursor.fetchall()
 
@@ -55,18 +71,25 @@ def execute_sql_query(
         if len(rows) > max_rows:
             rows = rows[:max_rows]
 
-        df = pd.DataFrame(rows)
+        # Categorical / Arrow-backed / downcast columns
+        df = compact_dataframe(pd.DataFrame(rows))
 
         return {
             "success": True,
             "row_count": len(df),
             "execution_time_sec": execution_time,
+            "memory_bytes": memory_usage_bytes(df),
             "dataframe": df
         }
 
     except Exception as e:
+        if deadline is not None and deadline.expired():
+            # Driver timeouts surface as OperationalError
+            e = DeadlineExceeded("sql_execution")
+
         return {
             "success": False,
+            "deadline_exceeded": isinstance(e, DeadlineExceeded),
             "error": str(e),
             "row_count": 0,
             "execution_time_sec": round(time.time() - start_time, 3),
@@ -0,0 +1,93 @@
+from src.utils.lazy_import import lazy_import, optional_lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pa = optional_lazy_import("pyarrow")
+
+
+# Object columns with at most this share of distinct values become categorical
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+# ============================
+# 🗜️ COMPACT DATAFRAMES
+# ============================
+
+def _downcast_numeric(series: "pd.Series") -> "pd.Series":
+    if pd.api.types.is_bool_dtype(series):
+        return series
+
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="integer")
+
+    if pd.api.types.is_float_dtype(series):
+        # float32 only when it round-trips exactly (spend amounts stay intact)
+        as_float32 = series.astype("float32")
+        if np.array_equal(as_float32.astype("float64"), series, equal_nan=True):
+            return as_float32
+        return series
+
+    return series
+
+
+def _compact_text(series: "pd.Series") -> "pd.Series":
+    non_null = series.notna().sum()
+    if non_null and series.nunique(dropna=True) / non_null <= CATEGORY_MAX_UNIQUE_RATIO:
+        return series.astype("category")
+
+    if pa is not None:
+        return series.astype("string[pyarrow]")
+
+    return series
+
+
+def compact_dataframe(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Memory-compact copy of a result frame built from pymssql dict rows:
+    - low-cardinality strings (state, industry, certification) -> category
+    - remaining strings -> Arrow-backed string storage
+    - DECIMAL columns -> float64, then numerics downcast
+    """
+    if df is None or df.empty:
+        return df
+
+    columns = {}
+
+    for col in df.columns:
+        series = df[col]
+        inferred = pd.api.types.infer_dtype(series, skipna=True)
+
+        if inferred == "decimal":
+            series = series.astype("float64")
+
+        if pd.api.types.is_numeric_dtype(series):
+            columns[col] = _downcast_numeric(series)
+        elif inferred == "string":
+            columns[col] = _compact_text(series)
+        else:
+            columns[col] = series
+
+    return pd.DataFrame(columns, index=df.index)
+
+
+def memory_usage_bytes(df: "pd.DataFrame") -> int:
+    if df is None:
+        return 0
+    return int(df.memory_usage(deep=True).sum())
+
+
+# ============================
+# 📤 ARROW HAND-OFF
+# ============================
+
+def to_display_table(df: "pd.DataFrame"):
+    """
+    Hand a frame to st.dataframe as a pyarrow Table.
+    Arrow-backed and categorical columns convert without copying
+    string data; falls back to the DataFrame without pyarrow.
+    """
+    if df is None or pa is None:
+        return df
+
+    return pa.Table.from_pandas(df, preserve_index=False)
+
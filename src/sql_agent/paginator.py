@@ -0,0 +1,375 @@
+import os
+import re
+import threading
+import sqlparse
+from concurrent.futures import ThreadPoolExecutor
+from sqlparse.sql import Function, Identifier, IdentifierList, Parenthesis, Where
+from typing import Dict, List, Optional
+from src.sql_agent.executor import execute_sql_query
+from src.utils.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+
+TOP_PATTERN = re.compile(
+    r"^\s*SELECT\s+(DISTINCT\s+)?TOP\s*\(?\s*\d+\s*\)?\s*(PERCENT\s+)?",
+    re.IGNORECASE
+)
+
+# Background page prefetches, shared by all pagers in the process
+PAGE_PREFETCH_WORKERS = int(os.getenv("PAGE_PREFETCH_WORKERS", "4"))
+
+_prefetcher = ThreadPoolExecutor(max_workers=PAGE_PREFETCH_WORKERS, thread_name_prefix="page-prefetch")
+
+
+# ============================
+# 🧩 SQL REWRITING
+# ============================
+
+def strip_top_clause(sql: str) -> str:
+    """
+    Remove the outer TOP n so the full result can be paged.
+    """
+    return TOP_PATTERN.sub(
+        lambda m: "SELECT " + (m.group(1) or ""),
+        sql.strip().rstrip(";"),
+        count=1
+    )
+
+
+def extract_output_columns(sql: str) -> List[str]:
+    """
+    Output column names (alias or bare name) of the outer SELECT.
+    Expects SQL without a TOP clause.
+    """
+    statement = sqlparse.parse(sql)[0]
+    columns = []
+
+    for token in statement.tokens:
+        if token.ttype is sqlparse.tokens.Keyword and token.normalized == "FROM":
+            break
+        if isinstance(token, IdentifierList):
+            identifiers = token.get_identifiers()
+        elif isinstance(token, Identifier):
+            identifiers = [token]
+        else:
+            continue
+        for ident in identifiers:
+            name = ident.get_alias() or ident.get_real_name()
+            if name:
+                columns.append(name.strip("[]"))
+
+    return columns
+
+
+def has_order_by(sql: str) -> bool:
+    """
+    True if the outer query has its own ORDER BY. One inside OVER(),
+    a subquery, a comment or a string literal does not count.
+    """
+    statement = sqlparse.parse(sql)[0]
+    return any(
+        token.ttype is sqlparse.tokens.Keyword and token.normalized == "ORDER BY"
+        for token in statement.tokens
+    )
+
+
+def count_select_items(sql: str) -> int:
+    """
+    Number of expressions in the outer SELECT list, named or not.
+    Expects SQL without a TOP clause.
+    """
+    statement = sqlparse.parse(sql)[0]
+    count = 0
+
+    for token in statement.tokens:
+        if token.ttype is sqlparse.tokens.Keyword and token.normalized == "FROM":
+            break
+        if (
+            token.is_whitespace
+            or token.ttype in sqlparse.tokens.Comment
+            or token.ttype in sqlparse.tokens.Keyword
+        ):
+            continue
+        if isinstance(token, IdentifierList):
+            count += len(list(token.get_identifiers()))
+        else:
+            count += 1
+
+    return count
+
+
+def default_order_by(sql: str) -> str:
+    """
+    Deterministic ORDER BY for OFFSET paging of a query without one:
+    every output column, by position (unnamed expressions included),
+    so a page holds the same rows however often it is fetched.
+    """
+    positions = range(1, max(count_select_items(sql), 1) + 1)
+    return "ORDER BY " + ", ".join(str(p) for p in positions)
+
+
+def _select_items(sql: str) -> List[tuple]:
+    """
+    (qualifier, column, output name) per outer SELECT item. column is
+    None for anything but a plain column reference; output name is None
+    for an expression without an alias.
+    """
+    statement = sqlparse.parse(sql)[0]
+    items = []
+
+    for token in statement.tokens:
+        if token.ttype is sqlparse.tokens.Keyword and token.normalized == "FROM":
+            break
+        if token.is_whitespace or token.ttype in sqlparse.tokens.Keyword:
+            continue
+        for item in token.get_identifiers() if isinstance(token, IdentifierList) else [token]:
+            plain = (
+                isinstance(item, Identifier)
+                and not item.is_wildcard()
+                and not any(isinstance(t, (Function, Parenthesis)) for t in item.tokens)
+            )
+            column = item.get_real_name().strip("[]") if plain else None
+            qualifier = item.get_parent_name() if plain else None
+            alias = item.get_alias() if isinstance(item, Identifier) else None
+            name = (alias or column or "").strip("[]") or None
+            items.append((qualifier and qualifier.strip("[]"), column, name))
+
+    return items
+
+
+JOIN_KEYWORDS = ("JOIN", "INNER JOIN", "CROSS JOIN")
+FROM_END_KEYWORDS = ("GROUP BY", "ORDER BY", "HAVING", "OPTION", "UNION", "UNION ALL", "EXCEPT", "INTERSECT")
+
+
+def from_tables(sql: str) -> Optional[List[tuple]]:
+    """
+    (table, alias) for every table in the outer FROM clause. None when
+    it holds anything that can add NULL keys or unknown rows (outer
+    joins, APPLY, derived tables).
+    """
+    statement = sqlparse.parse(sql)[0]
+    tables = []
+    in_from = in_on = False
+
+    for token in statement.tokens:
+        if token.is_whitespace or token.ttype in sqlparse.tokens.Comment:
+            continue
+        if not in_from:
+            in_from = token.ttype is sqlparse.tokens.Keyword and token.normalized == "FROM"
+            continue
+        if isinstance(token, Where) or (token.ttype in sqlparse.tokens.Keyword and token.normalized in FROM_END_KEYWORDS):
+            break
+        if token.ttype in sqlparse.tokens.Keyword and token.normalized in JOIN_KEYWORDS:
+            in_on = False
+        elif token.ttype in sqlparse.tokens.Keyword and token.normalized == "ON":
+            in_on = True
+        elif in_on:
+            continue
+        elif isinstance(token, (Identifier, IdentifierList)):
+            for ident in token.get_identifiers() if isinstance(token, IdentifierList) else [token]:
+                if not isinstance(ident, Identifier) or any(isinstance(t, Parenthesis) for t in ident.tokens):
+                    return None
+                tables.append((ident.get_real_name().strip("[]"), (ident.get_alias() or "").strip("[]") or None))
+        elif not token.match(sqlparse.tokens.Punctuation, ","):
+            return None
+
+    return tables or None
+
+
+def find_keyset_columns(sql: str, schema: Dict) -> List[str]:
+    """
+    Output columns that identify each result row: the primary key of
+    every table in FROM, all of them selected. Empty if keyset paging
+    is not possible - a key of one table repeats across rows as soon as
+    a join fans out, and paging past it would skip the repeats.
+
+    Also empty when the paging wrapper (SELECT * FROM (...) AS page_src)
+    would fail: duplicate or missing output column names.
+    """
+    tables = from_tables(sql)
+    items = _select_items(sql)
+    names = [name.lower() for _, _, name in items if name]
+    if not tables or len(names) != len(items) or len(set(names)) != len(names):
+        return []
+
+    known = {t["name"].lower(): t for t in schema.get("tables", [])}
+    if any(table.lower() not in known for table, _ in tables):
+        return []
+
+    def owners(column):
+        return [
+            n for n, (table, _) in enumerate(tables)
+            if column in (c["name"].lower() for c in known[table.lower()].get("columns", []))
+        ]
+
+    keys = []
+    for n, (table, alias) in enumerate(tables):
+        pks = known[table.lower()].get("primary_keys", [])
+        if not pks:
+            return []
+        for pk in pks:
+            selected = [
+                name for qualifier, column, name in items
+                if column and column.lower() == pk.lower()
+                and (
+                    qualifier.lower() in (table.lower(), (alias or "").lower())
+                    if qualifier else len(tables) == 1 or owners(pk.lower()) == [n]
+                )
+            ]
+            if not selected:
+                return []
+            keys.append(selected[0])
+
+    return keys
+
+
+def _escape_percent(sql: str) -> str:
+    # pymssql applies %-formatting when params are passed
+    return sql.replace("%", "%%")
+
+
+def build_keyset_page_query(
+    base_sql: str,
+    key_columns: List[str],
+    page_size: int,
+    has_last_key: bool,
+    parameterized: bool = False
+) -> str:
+    """
+    Rows after the previous page's last key, in key order. With several
+    key columns the comparison is lexicographic, taking the last key's
+    values as keyset_params() orders them.
+
+    parameterized: base_sql already uses %s placeholders (and %% escapes).
+    """
+    columns = [f"page_src.[{column}]" for column in key_columns]
+    where = ""
+    if has_last_key:
+        if not parameterized:
+            base_sql = _escape_percent(base_sql)
+        after = [
+            " AND ".join([f"{c} = %s" for c in columns[:n]] + [f"{columns[n]} > %s"])
+            for n in range(len(columns))
+        ]
+        where = f"WHERE {after[0]} " if len(after) == 1 else f"WHERE ({' OR '.join(after)}) "
+    return (
+        f"SELECT TOP ({int(page_size)}) * FROM ({base_sql}) AS page_src "
+        f"{where}ORDER BY {', '.join(columns)}"
+    )
+
+
+def keyset_params(last_key: tuple) -> tuple:
+    # One value per placeholder of build_keyset_page_query's WHERE
+    return tuple(value for n in range(len(last_key)) for value in last_key[:n + 1])
+
+
+def build_offset_page_query(base_sql: str, page_size: int, parameterized: bool = False) -> str:
+    """
+    Keeps the query's own ORDER BY; without one, orders by every output
+    column (see default_order_by), since OFFSET over an undefined order
+    can repeat or skip rows between pages.
+    """
+    order_by = "" if has_order_by(base_sql) else " " + default_order_by(base_sql)
+    if not parameterized:
+        base_sql = _escape_percent(base_sql)
+    return (
+        f"{base_sql}{order_by} "
+        f"OFFSET %s ROWS FETCH NEXT {int(page_size)} ROWS ONLY"
+    )
+
+
+# ============================
+# 📄 RESULT PAGER
+# ============================
+
+class ResultPager:
+    """
+    Lazily pages through a validated SELECT.
+
+    Keyset paging (WHERE key > last) is used when the query selects
+    the primary key of every table it reads (see find_keyset_columns)
+    and has no ORDER BY of its own; otherwise OFFSET/FETCH preserves
+    the query's ordering.
+    The next page is prefetched in the background on a pool shared by
+    all pagers, so discarded pagers leave no threads behind.
+    """
+
+    def __init__(self, sql: str, schema: Dict, page_size: int = 50, params=None):
+        self.base_sql = strip_top_clause(sql)
+        self.page_size = page_size
+        # Bound filter values when sql is a parameterized template
+        self.params = tuple(params) if params else None
+
+        self.key_columns = []
+        if not has_order_by(self.base_sql):
+            self.key_columns = find_keyset_columns(self.base_sql, schema)
+
+        self.strategy = "keyset" if self.key_columns else "offset"
+
+        self.pages: Dict[int, pd.DataFrame] = {}
+        self.last_keys: Dict[int, object] = {}
+        self.exhausted_at: Optional[int] = None
+
+        self.lock = threading.Lock()
+        self.prefetch_future = None
+
+    def _fetch(self, page_number: int) -> "pd.DataFrame":
+        parameterized = self.params is not None
+        base_params = self.params or ()
+
+        if self.strategy == "keyset":
+            has_last_key = page_number > 0
+            sql = build_keyset_page_query(
+                self.base_sql, self.key_columns, self.page_size, has_last_key, parameterized
+            )
+            params = base_params + (keyset_params(self.last_keys[page_number - 1]) if has_last_key else ())
+        else:
+            sql = build_offset_page_query(self.base_sql, self.page_size, parameterized)
+            params = base_params + (page_number * self.page_size,)
+
+        params = params or None
+
+        execution = execute_sql_query(sql, max_rows=self.page_size, params=params)
+
+        if not execution["success"]:
+            raise RuntimeError(execution["error"])
+
+        return execution["dataframe"]
+
+    def _load_through(self, page_number: int):
+        with self.lock:
+            # Keyset pages depend on the previous page's last key
+            start = 0 if self.strategy == "keyset" else page_number
+            for n in range(start, page_number + 1):
+                if n in self.pages:
+                    continue
+                if self.exhausted_at is not None and n > self.exhausted_at:
+                    self.pages[n] = pd.DataFrame()
+                    continue
+
+                df = self._fetch(n)
+                self.pages[n] = df
+
+                if self.strategy == "keyset" and len(df):
+                    last_row = df[self.key_columns].iloc[-1]
+                    # numpy scalars -> plain Python for the driver
+                    self.last_keys[n] = tuple(v.item() if hasattr(v, "item") else v for v in last_row)
+                if len(df) < self.page_size:
+                    self.exhausted_at = n
+
+    def get_page(self, page_number: int) -> "pd.DataFrame":
+        self._load_through(page_number)
+
+        if self.has_next(page_number):
+            self.prefetch_future = _prefetcher.submit(self._load_through, page_number + 1)
+
+        return self.pages[page_number]
+
+    def has_next(self, page_number: int) -> bool:
+        return self.exhausted_at is None or page_number < self.exhausted_at
+
+    def close(self):
+        # Drops a prefetch that has not started yet
+        if self.prefetch_future is not None:
+            self.prefetch_future.cancel()
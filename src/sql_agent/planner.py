@@ -1,6 +1,7 @@
 ﻿import json
-from typing import Dict
-from src.utils.llm_client import call_llm_json
+from typing import Dict, Optional
+from src.utils.deadline import Deadline
+from src.utils.llm_client import call_llm_json, stream_llm_json
 
 
 # ============================
@@ -40,8 +41,14 @@ Output must be valid JSON.
 def generate_query_plan(
     user_query: str,
     schema_summary: str,
-    has_uploaded_file: bool = False
+    has_uploaded_file: bool = False,
+    stream: bool = False,
+    deadline: Optional[Deadline] = None
 ) -> Dict:
+    """
+    stream=True returns a StreamingJSONResult; "reasoning" is last in
+    the output structure so SQL generation can start before it completes.
+    """
 
     user_prompt = f"""
 User Query:
@@ -68,10 +75,21 @@ Return JSON with structure:
 }}
 """
 
+    if stream:
+        return stream_llm_json(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+            temperature=0.2,
+            deadline=deadline,
+            stage="sql_plan"
+        )
+
     response = call_llm_json(
         system_prompt=SYSTEM_PROMPT,
         user_prompt=user_prompt,
-        temperature=0.2
+        temperature=0.2,
+        deadline=deadline,
+        stage="sql_plan"
     )
 
     return response
\ No newline at end of file
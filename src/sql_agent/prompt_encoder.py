@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import logging
+from typing import Dict, List, Optional, Set
+from src.utils.token_usage import count_chat_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bound on system + user prompt tokens for SQL generation; over
+# it, metadata the plan does not reference is dropped (see TRIM_STEPS)
+SQL_PROMPT_TOKEN_BUDGET = int(os.getenv("SQL_PROMPT_TOKEN_BUDGET", "3000"))
+
+# Plan fields SQL generation does not read
+PLAN_FIELDS_DROPPED = ("reasoning",)
+
+SCHEMA_FORMAT = """
+Schema metadata format, one block per table:
+<table> rows=<approximate row count>
+cols: <column> <type>, ...
+pk: <primary key columns (indexed)>
+idx: <other columns that lead an index>
+fk: <column>-><table>.<column>, ...
+"""
+
+# Dropped in this order until the prompt fits. Primary keys, foreign
+# keys and columns the plan names are always kept.
+TRIM_STEPS = ("row_counts", "unreferenced_columns", "indexes")
+
+
+# ============================
+# 📦 ENCODING
+# ============================
+
+def _drop_empty(value):
+    if isinstance(value, dict):
+        value = {k: _drop_empty(v) for k, v in value.items()}
+        return {k: v for k, v in value.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [v for v in map(_drop_empty, value) if v not in (None, "", [], {})]
+    return value
+
+
+def encode_plan(plan: Dict) -> str:
+    """
+    The plan as whitespace-free JSON without empty or unused fields.
+    """
+    plan = {k: v for k, v in plan.items() if k not in PLAN_FIELDS_DROPPED}
+    return json.dumps(_drop_empty(plan), separators=(",", ":"), ensure_ascii=False)
+
+
+def plan_identifiers(plan: Dict) -> Set[str]:
+    """
+    Lower-cased identifiers appearing anywhere in the plan
+    ("Vendors.State" yields both "vendors" and "state").
+    """
+    words = set()
+
+    def walk(value):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                walk(k)
+                walk(v)
+        elif isinstance(value, list):
+            for v in value:
+                walk(v)
+        elif isinstance(value, str):
+            words.update(w.lower() for w in re.findall(r"\w+", value))
+
+    walk(plan)
+    return words
+
+
+def _unique(items) -> List:
+    return list(dict.fromkeys(items))
+
+
+def compact_table(table: Dict, table_names: Set[str]) -> Dict:
+    """
+    What SQL generation needs from one table's metadata:
+    column names and types, primary key, leading index columns (one
+    entry per column, however many indexes it leads) and foreign keys
+    into the other tables in play (one entry per column pair).
+
+    As in cost_guard.index_metadata, caches written before key_ordinal
+    was captured count every index column as leading.
+    """
+    return {
+        "name": table["name"],
+        "row_count": table.get("row_count"),
+        "columns": [(c["name"], c["type"]) for c in table.get("columns", [])],
+        "primary_keys": _unique(table.get("primary_keys", [])),
+        "indexed": _unique(
+            idx["column"] for idx in table.get("indexes", [])
+            if idx.get("key_ordinal", 1) == 1 and not idx.get("included")
+            and idx["column"] not in table.get("primary_keys", [])
+        ),
+        "foreign_keys": _unique(
+            (fk["column"], fk["references_table"], fk["references_column"])
+            for fk in table.get("foreign_keys", [])
+            if fk["references_table"] in table_names
+        )
+    }
+
+
+def encode_table(table: Dict, trimmed: Set[str] = frozenset(), referenced: Set[str] = frozenset()) -> str:
+    lines = [table["name"]]
+    if table["row_count"] is not None and "row_counts" not in trimmed:
+        lines[0] += f" rows={table['row_count']}"
+
+    keys = set(table["primary_keys"]) | {fk[0] for fk in table["foreign_keys"]}
+    columns = table["columns"]
+    if "unreferenced_columns" in trimmed:
+        columns = [c for c in columns if c[0] in keys or c[0].lower() in referenced]
+    lines.append("cols: " + ", ".join(f"{name} {type_}" for name, type_ in columns))
+
+    if table["primary_keys"]:
+        lines.append("pk: " + ", ".join(table["primary_keys"]))
+    if table["indexed"] and "indexes" not in trimmed:
+        lines.append("idx: " + ", ".join(table["indexed"]))
+    if table["foreign_keys"]:
+        lines.append("fk: " + ", ".join(f"{col}->{ref}.{ref_col}" for col, ref, ref_col in table["foreign_keys"]))
+
+    return "\n".join(lines)
+
+
+def _user_prompt(plan_text: str, tables: List[Dict], trimmed: Set[str], referenced: Set[str], feedback: Optional[str]) -> str:
+    schema_text = "\n\n".join(encode_table(t, trimmed, referenced) for t in tables)
+    prompt = f"Structured Plan:\n{plan_text}\n\nRelevant Schema Metadata:\n{schema_text}\n\nGenerate SQL now."
+    if feedback:
+        prompt += f"\n\nThe previous SQL for this plan was rejected:\n{feedback}"
+    return prompt
+
+
+# ============================
+# 🎯 BUDGETED PROMPT
+# ============================
+
+def build_sql_prompt(
+    system_prompt: str,
+    plan: Dict,
+    schema: Dict,
+    feedback: Optional[str] = None,
+    budget: int = SQL_PROMPT_TOKEN_BUDGET
+) -> Dict:
+    """
+    User prompt for SQL generation within budget tokens (system prompt
+    included), trimming per TRIM_STEPS when needed.
+
+    Returns:
+    - user_prompt
+    - prompt_tokens: counted before sending
+    - trimmed: TRIM_STEPS that were applied
+    - over_budget: still over after every step (sent as is)
+    """
+    table_names = set(plan.get("tables", []))
+    tables = [
+        compact_table(table, table_names)
+        for table in schema["tables"]
+        if table["name"] in table_names
+    ]
+    plan_text = encode_plan(plan)
+    referenced = plan_identifiers(plan)
+
+    trimmed: List[str] = []
+    user_prompt = _user_prompt(plan_text, tables, set(), referenced, feedback)
+    tokens = count_chat_tokens(system_prompt, user_prompt)
+
+    for step in TRIM_STEPS:
+        if tokens <= budget:
+            break
+        trimmed.append(step)
+        user_prompt = _user_prompt(plan_text, tables, set(trimmed), referenced, feedback)
+        tokens = count_chat_tokens(system_prompt, user_prompt)
+
+    if trimmed:
+        logger.info("SQL prompt trimmed (%s) to %s tokens", ", ".join(trimmed), tokens)
+    if tokens > budget:
+        logger.warning("SQL prompt is %s tokens, over the %s token budget", tokens, budget)
+
+    return {
+        "user_prompt": user_prompt,
+        "prompt_tokens": tokens,
+        "trimmed": trimmed,
+        "over_budget": tokens > budget
+    }
@@ -1,12 +1,19 @@
 ﻿import os
 import json
-import pymssql
+import threading
 from typing import Dict, List
 from dotenv import load_dotenv
+from src.utils.atomic_file import atomic_write
+from src.utils.lazy_import import lazy_import
+
+pymssql = lazy_import("pymssql")
 
 load_dotenv()
 
 
+SCHEMA_CACHE_PATH = "data/schema_cache.json"
+
+
 # ============================
 # 🔐 DATABASE CONNECTION
 # ============================
@@ -21,6 +28,40 @@ def get_connection():
     )
 
 
+# ============================
+# 🔖 SCHEMA VERSION (CHANGE SIGNAL)
+# ============================
+
+SCHEMA_VERSION_QUERY = """
+    SELECT
+        CONVERT(VARCHAR(33), MAX(modify_date), 126) AS max_modify_date,
+        COUNT(*) AS object_count
+    FROM sys.objects
+    WHERE is_ms_shipped = 0
+"""
+
+
+def fetch_schema_version(cursor) -> Dict:
+    """
+    Cheap change signal: latest user-object modify_date plus object
+    count (drops do not bump modify_date).
+    """
+    cursor.execute(SCHEMA_VERSION_QUERY)
+    row = cursor.fetchone()
+    return {
+        "max_modify_date": row["max_modify_date"],
+        "object_count": row["object_count"]
+    }
+
+
+def get_schema_version() -> Dict:
+    conn = get_connection()
+    try:
+        return fetch_schema_version(conn.cursor(as_dict=True))
+    finally:
+        conn.close()
+
+
 # ============================
 # 📦 MAIN SCHEMA LOADER
 # ============================
@@ -35,6 +76,7 @@ def load_schema_from_db() -> Dict:
 
     schema = {
         "database": os.getenv("AZURE_SQL_DATABASE"),
+        "version": fetch_schema_version(cursor),
         "tables": []
     }
 
@@ -57,7 +99,8 @@ def load_schema_from_db() -> Dict:
             "columns": [],
             "primary_keys": [],
             "foreign_keys": [],
-            "indexes": []
+            "indexes": [],
+            "row_count": None
         }
 
         # ----------------------------
@@ -130,7 +173,11 @@ def load_schema_from_db() -> Dict:
         # 5️⃣ INDEXES
         # ----------------------------
         cursor.execute(f"""
-            SELECT i.name AS index_name, col.name AS column_name
+            SELECT
+                i.name AS index_name,
+                col.name AS column_name,
+                ic.key_ordinal,
+                ic.is_included_column
             FROM sys.indexes i
             INNER JOIN sys.index_columns ic
                 ON i.object_id = ic.object_id
@@ -141,15 +188,32 @@ def load_schema_from_db() -> Dict:
             INNER JOIN sys.tables t
                 ON t.object_id = i.object_id
             WHERE t.name = '{table_name}'
+            AND i.is_hypothetical = 0
         """)
         indexes = cursor.fetchall()
 
+        # key_ordinal 1 = leading key column (the one a seek can use)
         for idx in indexes:
             table_info["indexes"].append({
                 "index_name": idx["index_name"],
-                "column": idx["column_name"]
+                "column": idx["column_name"],
+                "key_ordinal": idx["key_ordinal"],
+                "included": bool(idx["is_included_column"])
             })
 
+        # ----------------------------
+        # 6️⃣ ROW COUNT (heap or clustered index)
+        # ----------------------------
+        cursor.execute(f"""
+            SELECT SUM(p.rows) AS row_count
+            FROM sys.partitions p
+            INNER JOIN sys.tables t
+                ON t.object_id = p.object_id
+            WHERE t.name = '{table_name}'
+            AND p.index_id IN (0, 1)
+        """)
+        table_info["row_count"] = cursor.fetchone()["row_count"]
+
         schema["tables"].append(table_info)
 
     conn.close()
@@ -160,19 +224,55 @@ def load_schema_from_db() -> Dict:
 # 💾 CACHE HANDLING
 # ============================
 
-def save_schema_cache(schema: Dict, path: str = "data/schema_cache.json"):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
+def save_schema_cache(schema: Dict, path: str = SCHEMA_CACHE_PATH):
+    """
+    Atomic write, so readers never see a half-written cache.
+    """
+    with atomic_write(path) as f:
         json.dump(schema, f, indent=2)
 
 
-def load_schema_cache(path: str = "data/schema_cache.json") -> Dict:
+def load_schema_cache(path: str = SCHEMA_CACHE_PATH) -> Dict:
     if not os.path.exists(path):
         raise FileNotFoundError("Schema cache not found. Run load_schema_from_db() first.")
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
+# ============================
+# 🔁 IN-MEMORY SCHEMA (HOT-SWAP)
+# ============================
+
+_current = {"schema": None, "mtime": None}
+_current_lock = threading.Lock()
+
+
+def set_current_schema(schema: Dict, mtime=None):
+    """
+    Swap the in-memory schema by reference. Requests that already
+    hold the previous dict keep using it unchanged.
+    """
+    with _current_lock:
+        _current["schema"] = schema
+        _current["mtime"] = mtime
+
+
+def get_current_schema(path: str = SCHEMA_CACHE_PATH) -> Dict:
+    """
+    In-memory schema, reloaded only when the cache file changed on disk
+    (e.g. refreshed by another process).
+    """
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+
+    schema = _current["schema"]
+    if schema is not None and (mtime is None or mtime == _current["mtime"]):
+        return schema
+
+    schema = load_schema_cache(path)
+    set_current_schema(schema, mtime)
+    return schema
+
+
 # ============================
 # 🤖 LLM-FRIENDLY SUMMARY
 # ============================
@@ -0,0 +1,90 @@
+import os
+import logging
+import threading
+from typing import Dict, Optional
+from src.sql_agent.schema_loader import (
+    SCHEMA_CACHE_PATH,
+    get_current_schema,
+    get_schema_version,
+    load_schema_from_db,
+    save_schema_cache,
+    set_current_schema
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaRefresher(threading.Thread):
+    """
+    Background thread that keeps schema_cache.json current.
+
+    Polls the cheap sys.objects version signal every interval_sec and
+    only runs the full load_schema_from_db() when it changed. The new
+    cache is written atomically and hot-swapped in memory.
+    """
+
+    def __init__(self, interval_sec: float = 300, path: str = SCHEMA_CACHE_PATH):
+        super().__init__(name="schema-refresher", daemon=True)
+        self.interval_sec = interval_sec
+        self.path = path
+        self.stop_event = threading.Event()
+        self.stats = {"checks": 0, "refreshes": 0, "errors": 0, "last_error": None}
+
+    def _cached_version(self) -> Optional[Dict]:
+        try:
+            return get_current_schema(self.path).get("version")
+        except FileNotFoundError:
+            return None
+
+    def refresh_if_changed(self) -> bool:
+        self.stats["checks"] += 1
+
+        if get_schema_version() == self._cached_version():
+            return False
+
+        schema = load_schema_from_db()
+        save_schema_cache(schema, self.path)
+        set_current_schema(schema, os.path.getmtime(self.path))
+
+        self.stats["refreshes"] += 1
+        logger.info("Schema cache refreshed (%s tables)", len(schema["tables"]))
+        return True
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.refresh_if_changed()
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.stats["last_error"] = str(e)
+                logger.warning("Schema refresh failed: %s", e)
+
+            self.stop_event.wait(self.interval_sec)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+_refresher: Optional[SchemaRefresher] = None
+_refresher_lock = threading.Lock()
+
+
+def start_schema_refresher(interval_sec: Optional[float] = None) -> Optional[SchemaRefresher]:
+    """
+    Start the process-wide refresher once.
+    interval defaults to SCHEMA_REFRESH_INTERVAL_SEC; unset or 0 disables it.
+    """
+    global _refresher
+
+    if interval_sec is None:
+        interval_sec = float(os.getenv("SCHEMA_REFRESH_INTERVAL_SEC", "0") or 0)
+
+    if interval_sec <= 0:
+        return None
+
+    with _refresher_lock:
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = SchemaRefresher(interval_sec=interval_sec)
+            _refresher.start()
+        return _refresher
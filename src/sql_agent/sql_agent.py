@@ -1,12 +1,82 @@
-﻿from typing import Dict
+﻿import logging
+from typing import Callable, Dict, Optional
 from src.sql_agent.schema_loader import (
-    load_schema_cache,
+    get_current_schema,
     get_schema_summary_for_llm
 )
 from src.sql_agent.planner import generate_query_plan
 from src.sql_agent.sql_generator import generate_sql_from_plan
 from src.sql_agent.validator import validate_sql
+from src.sql_agent.cost_guard import SQL_COST_MAX_REGENERATIONS, review_sql_cost
 from src.sql_agent.executor import execute_sql_query
+from src.sql_agent.paginator import ResultPager
+from src.sql_agent.template_cache import template_store
+from src.utils.deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+# Plan fields SQL generation depends on ("reasoning" is not one of them)
+PLAN_FIELDS_FOR_SQL = ("tables", "columns", "filters", "aggregations", "requires_rag")
+
+
+def _is_rag_only(plan: Dict) -> bool:
+    return bool(plan.get("requires_rag") and not plan.get("tables"))
+
+
+def _generate_sql(plan: Dict, schema: Dict, sql_stream, emit: Callable, deadline: Deadline) -> tuple:
+    """
+    Generate → Validate → Cost review, generating again with the
+    review's reason while it asks for that and attempts are left.
+    sql_stream: generation already started for this plan, if any.
+
+    Returns (sql_query, validation, cost_review).
+    """
+    feedback = None
+    cost_review = None
+
+    for attempt in range(SQL_COST_MAX_REGENERATIONS + 1):
+        if sql_stream is None:
+            sql_stream = generate_sql_from_plan(
+                plan, schema, stream=True, deadline=deadline, feedback=feedback
+            )
+
+        for key, value in sql_stream.iter_fields(deadline):
+            emit("sql", key, value)
+
+        sql_output = sql_stream.result(deadline)
+        sql_query = sql_output["sql"]
+        sql_stream = None
+
+        # --------------------------------
+        # 4️⃣ Validate SQL
+        # --------------------------------
+        validation = validate_sql(
+            sql=sql_query,
+            allowed_tables=plan.get("tables", [])
+        )
+        if not validation["valid"]:
+            break
+
+        # --------------------------------
+        # 4️⃣b Index-aware cost review
+        # --------------------------------
+        cost_review = review_sql_cost(
+            sql_query,
+            schema,
+            allow_regenerate=attempt < SQL_COST_MAX_REGENERATIONS
+        )
+        emit("sql", "cost_review", cost_review)
+
+        if cost_review["action"] != "regenerate":
+            if cost_review["sql"] != sql_query:
+                sql_query = cost_review["sql"]
+                emit("sql", "sql", sql_query)
+            break
+
+        feedback = cost_review["reason"]
+
+    return sql_query, validation, cost_review
 
 
 # ============================
@@ -15,31 +85,71 @@ from src.sql_agent.executor import execute_sql_query
 
 def run_sql_agent(
     user_query: str,
-    has_uploaded_file: bool = False
+    has_uploaded_file: bool = False,
+    on_event: Optional[Callable] = None,
+    deadline: Optional[Deadline] = None
 ) -> Dict:
     """
     Full SQL Agent pipeline:
-    Plan → Generate SQL → Validate → Execute
+    Plan → Generate SQL → Validate → Cost review → Execute
+
+    The cost review checks the SQL against the schema's index metadata
+    and, per SQL_COST_POLICY, warns, rewrites it, or has it generated
+    again with the reason (at most SQL_COST_MAX_REGENERATIONS times).
+
+    A known plan shape reuses recorded SQL (template_cache) instead of
+    generating; if that SQL fails to execute, the template is dropped
+    and SQL is generated.
+
+    Plan and SQL are streamed. on_event(stage, key, value) is called on
+    the caller's thread as each field completes, and SQL generation
+    starts as soon as the plan fields it needs are available.
+
+    Every stage gets the remaining deadline budget (default:
+    REQUEST_DEADLINE_SEC); running out returns stage "deadline_exceeded".
     """
 
+    emit = on_event or (lambda stage, key, value: None)
+    deadline = deadline or Deadline()
+
     try:
         # --------------------------------
         # 1️⃣ Load schema
         # --------------------------------
-        schema = load_schema_cache()
+        # One reference per request: a background hot-swap won't affect it
+        schema = get_current_schema()
         schema_summary = get_schema_summary_for_llm(schema)
+        schema_version = schema.get("version")
 
         # --------------------------------
-        # 2️⃣ Generate structured plan
+        # 2️⃣ Generate structured plan (streamed)
         # --------------------------------
-        plan = generate_query_plan(
+        plan_stream = generate_query_plan(
             user_query=user_query,
             schema_summary=schema_summary,
-            has_uploaded_file=has_uploaded_file
+            has_uploaded_file=has_uploaded_file,
+            stream=True,
+            deadline=deadline
         )
 
+        sql_stream = None
+        templated = None
+
+        for key, value in plan_stream.iter_fields(deadline):
+            emit("plan", key, value)
+
+            if sql_stream is None and templated is None and plan_stream.has(*PLAN_FIELDS_FOR_SQL):
+                partial_plan = plan_stream.snapshot()
+                if not _is_rag_only(partial_plan):
+                    # Known plan shape: bind filter values, no LLM call
+                    templated = template_store.lookup(partial_plan, schema_version)
+                    if templated is None:
+                        sql_stream = generate_sql_from_plan(partial_plan, schema, stream=True, deadline=deadline)
+
+        plan = plan_stream.result(deadline)
+
         # If planner says RAG required only, skip SQL
-        if plan.get("requires_rag") and not plan.get("tables"):
+        if _is_rag_only(plan):
             return {
                 "success": True,
                 "mode": "rag_only",
@@ -51,42 +161,79 @@ def run_sql_agent(
             }
 
         # --------------------------------
-        # 3️⃣ Generate SQL
+        # 3️⃣ SQL from template, else generate (may already be in flight)
         # --------------------------------
-        sql_output = generate_sql_from_plan(plan, schema)
-        sql_query = sql_output["sql"]
+        if sql_stream is None and templated is None:
+            templated = template_store.lookup(plan, schema_version)
 
-        # --------------------------------
-        # 4️⃣ Validate SQL
-        # --------------------------------
-        validation = validate_sql(
-            sql=sql_query,
-            allowed_tables=plan.get("tables", [])
-        )
+        sql_params = None
+        sql_source = "generated"
+        validation = None
+        cost_review = None
 
-        if not validation["valid"]:
-            return {
-                "success": False,
-                "stage": "validation_failed",
-                "reason": validation["reason"],
-                "plan": plan,
-                "sql": sql_query
-            }
+        if templated is not None and sql_stream is None:
+            sql_query, sql_params = templated
+            validation = validate_sql(
+                sql=sql_query,
+                allowed_tables=plan.get("tables", [])
+            )
+            if validation["valid"]:
+                # Recorded templates already passed a review; no regeneration
+                cost_review = review_sql_cost(sql_query, schema, allow_regenerate=False)
+                sql_query = cost_review["sql"]
+                sql_source = "template"
+                emit("sql", "sql", sql_query)
+            else:
+                sql_params = None
 
-        # --------------------------------
-        # 5️⃣ Execute SQL
-        # --------------------------------
-        execution = execute_sql_query(sql_query)
+        while True:
+            if sql_source == "generated":
+                sql_query, validation, cost_review = _generate_sql(plan, schema, sql_stream, emit, deadline)
+                sql_stream = None
+
+            if not validation["valid"]:
+                return {
+                    "success": False,
+                    "stage": "validation_failed",
+                    "reason": validation["reason"],
+                    "plan": plan,
+                    "sql": sql_query
+                }
+
+            # --------------------------------
+            # 5️⃣ Execute SQL
+            # --------------------------------
+            execution = execute_sql_query(sql_query, params=sql_params, deadline=deadline)
+
+            if execution["success"] or sql_source != "template" or execution["deadline_exceeded"]:
+                break
+
+            # Stale template (e.g. a column renamed since it was recorded)
+            logger.warning("SQL template failed, generating instead: %s", execution["error"])
+            try:
+                template_store.discard(plan, schema_version)
+            except Exception as e:
+                logger.warning("SQL template not dropped: %s", e)
+            sql_source = "generated"
+            sql_params = None
 
         if not execution["success"]:
             return {
                 "success": False,
-                "stage": "execution_failed",
+                "stage": "deadline_exceeded" if execution["deadline_exceeded"] else "execution_failed",
                 "error": execution["error"],
                 "plan": plan,
-                "sql": sql_query
+                "sql": sql_query,
+                "cost_review": cost_review
             }
 
+        if sql_source == "generated":
+            # Best effort: the query already succeeded
+            try:
+                template_store.record(plan, sql_query, schema_version)
+            except Exception as e:
+                logger.warning("SQL template not cached: %s", e)
+
         # --------------------------------
         # 6️⃣ Return structured result
         # --------------------------------
@@ -95,10 +242,23 @@ def run_sql_agent(
             "mode": "sql",
             "plan": plan,
             "sql": sql_query,
+            "sql_params": sql_params,
+            "sql_source": sql_source,
             "validation": validation,
+            "cost_review": cost_review,
             "execution_time_sec": execution["execution_time_sec"],
             "row_count": execution["row_count"],
-            "dataframe": execution["dataframe"]
+            "memory_bytes": execution["memory_bytes"],
+            "dataframe": execution["dataframe"],
+            # Lazy full-result browsing beyond the TOP-limited first page
+            "pager": ResultPager(sql_query, schema, params=sql_params)
+        }
+
+    except DeadlineExceeded as e:
+        return {
+            "success": False,
+            "stage": "deadline_exceeded",
+            "error": str(e)
         }
 
     except Exception as e:
@@ -1,6 +1,7 @@
-﻿import json
-from typing import Dict
-from src.utils.llm_client import call_llm_json
+﻿from typing import Dict, Optional
+from src.sql_agent.prompt_encoder import SCHEMA_FORMAT, build_sql_prompt
+from src.utils.deadline import Deadline
+from src.utils.llm_client import call_llm_json, stream_llm_json
 
 
 # ============================
@@ -13,7 +14,7 @@ You are a SQL generation engine.
 Your task:
 Given:
 - A structured query plan
-- Full schema metadata
+- Schema metadata for the plan's tables
 
 Generate a SAFE SQL SELECT query.
 
@@ -27,6 +28,9 @@ Rules:
 - Use proper JOINs based on foreign keys.
 - No SELECT *.
 - No subqueries unless absolutely required.
+- Prefer filters, JOINs and ORDER BY on indexed columns (pk, idx).
+- No LIKE patterns starting with % and no functions around filtered
+  columns unless the query cannot be answered otherwise.
 
 Return JSON:
 {
@@ -34,35 +38,45 @@ Return JSON:
   "tables_used": [],
   "notes": []
 }
-"""
+""" + SCHEMA_FORMAT
 
 
 # ============================
 # 📦 MAIN FUNCTION
 # ============================
 
-def generate_sql_from_plan(plan: Dict, schema: Dict) -> Dict:
-
-    # Extract only relevant tables from schema
-    relevant_tables = [
-        table for table in schema["tables"]
-        if table["name"] in plan.get("tables", [])
-    ]
-
-    user_prompt = f"""
-Structured Plan:
-{json.dumps(plan, indent=2)}
-
-Relevant Schema Metadata:
-{json.dumps(relevant_tables, indent=2)}
-
-Generate SQL now.
-"""
+def generate_sql_from_plan(
+    plan: Dict,
+    schema: Dict,
+    stream: bool = False,
+    deadline: Optional[Deadline] = None,
+    feedback: Optional[str] = None
+) -> Dict:
+    """
+    stream=True returns a StreamingJSONResult ("sql" arrives first).
+    feedback: why the previous SQL for this plan was sent back.
+    """
+
+    # Compact metadata of the plan's tables only, within
+    # SQL_PROMPT_TOKEN_BUDGET
+    prompt = build_sql_prompt(SYSTEM_PROMPT, plan, schema, feedback=feedback)
+    user_prompt = prompt["user_prompt"]
+
+    if stream:
+        return stream_llm_json(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=user_prompt,
+            temperature=0.1,
+            deadline=deadline,
+            stage="sql_generation"
+        )
 
     response = call_llm_json(
         system_prompt=SYSTEM_PROMPT,
         user_prompt=user_prompt,
-        temperature=0.1
+        temperature=0.1,
+        deadline=deadline,
+        stage="sql_generation"
     )
 
     return response
\ No newline at end of file
@@ -0,0 +1,259 @@
+import os
+import json
+import threading
+import contextlib
+import sqlparse
+from typing import Dict, List, Optional, Tuple
+from src.utils.atomic_file import atomic_write
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+DEFAULT_TEMPLATE_PATH = "data/sql_templates.json"
+
+
+# ============================
+# 🔑 PLAN SIGNATURE
+# ============================
+
+def _scalar_filters(plan: Dict) -> Optional[Dict]:
+    """
+    Filters as {key: scalar}. None if any value is not a plain
+    string / number (lists, nested operators) - those are not templated.
+    """
+    filters = plan.get("filters") or {}
+    if not isinstance(filters, dict):
+        return None
+
+    for value in filters.values():
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            return None
+
+    return filters
+
+
+def plan_signature(plan: Dict, schema_version: Optional[Dict] = None) -> Optional[str]:
+    """
+    Structural shape of a plan: tables, columns, filter keys and
+    aggregation, plus the schema version (see schema_loader) so SQL
+    recorded against an older schema is not reused. Filter values are
+    deliberately excluded.
+    """
+    filters = _scalar_filters(plan)
+    if filters is None:
+        return None
+
+    aggregation = plan.get("aggregations") or {}
+    if not isinstance(aggregation, dict):
+        aggregation = {}
+
+    signature = {
+        "tables": sorted(t.lower() for t in plan.get("tables", [])),
+        "columns": sorted(str(c).lower() for c in plan.get("columns", [])),
+        "filter_keys": sorted(filters.keys()),
+        "aggregation": [
+            str(aggregation.get("type") or "").lower(),
+            str(aggregation.get("column") or "").lower()
+        ],
+        "schema_version": schema_version
+    }
+    return json.dumps(signature, sort_keys=True, default=str)
+
+
+# ============================
+# 🧩 TEMPLATE EXTRACTION
+# ============================
+
+def _literal_text(token) -> Tuple[str, bool]:
+    if token.ttype in sqlparse.tokens.Literal.String:
+        return token.value[1:-1].replace("''", "'"), True
+    return token.value, False
+
+
+def _is_wildcard_wrapper(text: str) -> bool:
+    return all(ch in "%_" for ch in text)
+
+
+def extract_template(sql: str, filters: Dict) -> Optional[Dict]:
+    """
+    Replace the literal holding each filter value with a %s placeholder.
+
+    A string literal must be the value itself, or the value wrapped in
+    LIKE wildcards only (e.g. '%value%'); the wildcards are kept so new
+    values bind the same way. Any other surrounding text ('Kuala
+    Selangor' for "Selangor") would be bound with the next value too, so
+    the SQL is not templated. Returns None when any filter value cannot
+    be matched to exactly one literal.
+    """
+    tokens = list(sqlparse.parse(sql)[0].flatten())
+
+    matches = {}
+    for key, value in filters.items():
+        needle = str(value)
+        found = []
+        for i, token in enumerate(tokens):
+            if token.ttype not in sqlparse.tokens.Literal:
+                continue
+            text, is_string = _literal_text(token)
+            if not is_string:
+                if text == needle:
+                    found.append((i, "", "", False))
+            elif needle and needle.lower() in text.lower():
+                start = text.lower().index(needle.lower())
+                found.append((i, text[:start], text[start + len(needle):], is_string))
+        if len(found) != 1:
+            return None
+        i, prefix, suffix, is_string = found[0]
+        if not (_is_wildcard_wrapper(prefix) and _is_wildcard_wrapper(suffix)):
+            return None
+        matches[i] = (key, prefix, suffix, is_string)
+
+    if len(matches) != len(filters):
+        return None
+
+    if not matches:
+        # Nothing to bind: keep the SQL verbatim (no %-escaping)
+        return {"sql": sql, "bindings": []}
+
+    parts: List[str] = []
+    bindings = []
+
+    for i, token in enumerate(tokens):
+        if i in matches:
+            key, prefix, suffix, is_string = matches[i]
+            # Driver quotes str params as N'...' itself
+            if parts and parts[-1].upper() == "N":
+                parts.pop()
+            parts.append("%s")
+            bindings.append({"key": key, "prefix": prefix, "suffix": suffix})
+        else:
+            parts.append(token.value.replace("%", "%%"))
+
+    return {"sql": "".join(parts), "bindings": bindings}
+
+
+def bind_template(template: Dict, filters: Dict) -> Tuple[str, Optional[tuple]]:
+    if not template["bindings"]:
+        return template["sql"], None
+
+    params = []
+    for binding in template["bindings"]:
+        value = filters[binding["key"]]
+        if binding["prefix"] or binding["suffix"]:
+            value = f"{binding['prefix']}{value}{binding['suffix']}"
+        params.append(value)
+    return template["sql"], tuple(params)
+
+
+# ============================
+# 💾 TEMPLATE STORE
+# ============================
+
+class SQLTemplateStore:
+    """
+    Validated SQL keyed by plan signature.
+    A plan with a known shape gets its SQL by binding filter values
+    as query parameters instead of calling the SQL generator.
+
+    Recording a template drops those of other schema versions; a
+    template that fails to execute is dropped with discard().
+    """
+
+    def __init__(self, path: str = DEFAULT_TEMPLATE_PATH):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.lock = threading.Lock()
+        self.templates: Dict[str, Dict] = {}
+        self.mtime = None
+
+        with self.lock:
+            self._load_if_changed()
+
+    def _load_if_changed(self, force: bool = False):
+        # Other worker processes may have recorded templates
+        if not os.path.exists(self.path):
+            return
+
+        mtime = os.path.getmtime(self.path)
+        if force or mtime != self.mtime:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.templates = json.load(f)
+            self.mtime = mtime
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        # Serializes read-modify-write across worker processes;
+        # readers need no lock since the file is replaced atomically
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save(self):
+        with atomic_write(self.path) as f:
+            json.dump(self.templates, f, indent=2)
+        self.mtime = os.path.getmtime(self.path)
+
+    def record(self, plan: Dict, sql: str, schema_version: Optional[Dict] = None) -> bool:
+        signature = plan_signature(plan, schema_version)
+        if signature is None:
+            return False
+
+        template = extract_template(sql, _scalar_filters(plan))
+        if template is None:
+            return False
+
+        version = json.dumps(schema_version, sort_keys=True, default=str)
+        with self.lock, self._file_lock():
+            # Under the file lock: a write within the same mtime tick
+            # must not be lost
+            self._load_if_changed(force=True)
+            self.templates = {
+                key: entry for key, entry in self.templates.items()
+                if entry.get("schema_version") == version
+            }
+            self.templates[signature] = dict(template, schema_version=version)
+            self._save()
+        return True
+
+    def discard(self, plan: Dict, schema_version: Optional[Dict] = None) -> bool:
+        signature = plan_signature(plan, schema_version)
+        if signature is None:
+            return False
+
+        with self.lock, self._file_lock():
+            self._load_if_changed(force=True)
+            if self.templates.pop(signature, None) is None:
+                return False
+            self._save()
+        return True
+
+    def lookup(self, plan: Dict, schema_version: Optional[Dict] = None) -> Optional[Tuple[str, Optional[tuple]]]:
+        """
+        (parameterized_sql, params) for a known plan shape, else None.
+        """
+        signature = plan_signature(plan, schema_version)
+        if signature is None:
+            return None
+
+        with self.lock:
+            self._load_if_changed()
+            template = self.templates.get(signature)
+
+        if template is None:
+            return None
+
+        return bind_template(template, _scalar_filters(plan))
+
+
+template_store = SQLTemplateStore()
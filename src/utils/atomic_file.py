@@ -0,0 +1,35 @@
+import os
+import tempfile
+import contextlib
+from typing import IO, Iterator
+
+
+@contextlib.contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """
+    Temp file path in the same directory as path, renamed over path
+    once the block completes, so readers never see a half-written file.
+    On error the temp file is removed and path is left as it was.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, encoding: str = "utf-8") -> Iterator[IO[str]]:
+    """
+    Text file opened for writing that replaces path atomically (see atomic_path).
+    """
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w", encoding=encoding) as f:
+            yield f
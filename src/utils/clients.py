@@ -0,0 +1,109 @@
+import os
+import time
+import random
+import threading
+from typing import Optional
+from dotenv import load_dotenv
+from src.utils.deadline import Deadline
+from src.utils.lazy_import import lazy_import
+
+# openai takes most of the import time; it loads with the first client
+openai = lazy_import("openai")
+
+load_dotenv()
+
+# Retries of transient failures (429, 5xx, dropped connections) under a
+# deadline; see call_with_retries
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY_SEC = 0.5
+RETRY_MAX_DELAY_SEC = 8.0
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    """
+    Single AzureOpenAI client shared by chat and embeddings,
+    created on first use.
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = openai.AzureOpenAI(
+                    api_key=os.getenv("AZURE_OPENAI_KEY"),
+                    api_version="2024-02-15-preview",
+                    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
+                )
+    return _client
+
+
+def client_for(deadline: Optional[Deadline], stage: str):
+    """
+    Shared client bounded by the remaining request budget.
+    SDK retries are off under a deadline (they would not see it);
+    call_with_retries retries within the budget instead.
+    """
+    client = get_openai_client()
+    if deadline is None:
+        return client
+    return client.with_options(timeout=deadline.timeout(stage), max_retries=0)
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, openai.APITimeoutError):
+        # The attempt had the whole remaining budget
+        return False
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    return isinstance(error, openai.APIStatusError) and (
+        error.status_code in (408, 409, 429) or error.status_code >= 500
+    )
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    return min(RETRY_BASE_DELAY_SEC * 2 ** attempt, RETRY_MAX_DELAY_SEC) * random.uniform(0.75, 1.0)
+
+
+def call_with_retries(deadline: Optional[Deadline], stage: str, request):
+    """
+    request(client) on the shared client.
+
+    Without a deadline the SDK retries as usual. Under one, each attempt
+    gets the remaining budget, and transient failures are retried (up
+    to OPENAI_MAX_RETRIES times, honouring Retry-After) only while the
+    backoff wait still leaves budget for another attempt.
+    """
+    if deadline is None:
+        return request(get_openai_client())
+
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        try:
+            return request(client_for(deadline, stage))
+        except Exception as e:
+            if attempt == OPENAI_MAX_RETRIES or not _is_transient(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            if delay >= deadline.remaining():
+                raise
+            time.sleep(delay)
+
+
+def set_openai_client(client):
+    """
+    Replace the shared client (e.g. with a fake for load tests).
+    Returns the previous one, which may be None if never created.
+    """
+    global _client
+
+    with _client_lock:
+        previous, _client = _client, client
+    return previous
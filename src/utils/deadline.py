@@ -0,0 +1,144 @@
+import os
+import math
+import time
+import threading
+from typing import Dict, List, Optional
+
+
+# End-to-end budget for one request (plan + SQL + RAG + scoring)
+DEFAULT_REQUEST_DEADLINE_SEC = float(os.getenv("REQUEST_DEADLINE_SEC", "60"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised by a stage that found its deadline expired or its branch cancelled.
+    """
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """
+    Per-request time budget.
+
+    Every stage asks for the remaining budget (timeout()) instead of
+    using its own fixed limit. branch() gives a parallel branch its own
+    cancel flag under the same expiry, so an abandoned branch can be
+    stopped without affecting the rest of the request.
+
+    Stages that return partial results call degrade(); the notes are
+    shared by all branches and returned with the final result.
+    """
+
+    def __init__(self, budget_sec: float = DEFAULT_REQUEST_DEADLINE_SEC, parent: Optional["Deadline"] = None):
+        self.budget_sec = budget_sec
+        self.expires_at = time.monotonic() + budget_sec
+        self.parent = parent
+        self.cancelled = threading.Event()
+
+        if parent is not None:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+            self.notes = parent.notes
+            self.lock = parent.lock
+        else:
+            self.notes: List[Dict] = []
+            self.lock = threading.Lock()
+
+    def branch(self) -> "Deadline":
+        return Deadline(self.remaining(), parent=self)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self.cancelled.is_set() or (
+            self.parent is not None and self.parent.is_cancelled()
+        )
+
+    def remaining(self) -> float:
+        if self.is_cancelled():
+            return 0.0
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, stage: str):
+        if self.expired():
+            raise DeadlineExceeded(stage)
+
+    def timeout(self, stage: str, cap: Optional[float] = None) -> float:
+        """
+        Seconds a blocking call in this stage may take:
+        the remaining budget, optionally capped. Raises if none is left.
+        """
+        self.check(stage)
+        remaining = self.remaining()
+        return min(remaining, cap) if cap is not None else remaining
+
+    def degrade(self, stage: str, reason: str):
+        with self.lock:
+            self.notes.append({"stage": stage, "reason": reason})
+
+    @property
+    def degraded(self) -> List[Dict]:
+        with self.lock:
+            return list(self.notes)
+
+
+class SharedDeadline:
+    """
+    Deadline of work shared by several callers (e.g. one coalesced LLM
+    stream). It expires only once every joined caller's deadline has,
+    so the caller that started the work does not cut it short for the
+    others. Usable wherever a Deadline bounds a call (timeout(),
+    remaining(), expired()).
+    """
+
+    def __init__(self, deadline: Deadline):
+        self.lock = threading.Lock()
+        self.deadlines: List[Deadline] = [deadline]
+
+    def _remaining(self) -> float:
+        return max(d.remaining() for d in self.deadlines)
+
+    def join(self, deadline: Optional[Deadline]) -> bool:
+        """
+        Adds a caller. False if the work can no longer serve it: every
+        deadline so far has run out, or the caller has none (the work
+        may be stopped before the caller is done with it).
+        """
+        with self.lock:
+            if deadline is None or self._remaining() <= 0:
+                return False
+            self.deadlines.append(deadline)
+            return True
+
+    def remaining(self) -> float:
+        with self.lock:
+            return self._remaining()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, stage: str, cap: Optional[float] = None) -> float:
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(stage)
+        return min(remaining, cap) if cap is not None else remaining
+
+
+def stage_timeout(deadline: Optional[Deadline], stage: str, default: Optional[float] = None) -> Optional[float]:
+    """
+    timeout() for an optional deadline; default when there is none.
+    """
+    if deadline is None:
+        return default
+    return deadline.timeout(stage, cap=default)
+
+
+def whole_seconds(timeout: float) -> int:
+    # Drivers that take integer seconds (0 would mean "no limit")
+    return max(int(math.ceil(timeout)), 1)
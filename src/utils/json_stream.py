@@ -0,0 +1,181 @@
+import copy
+import json
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.utils.deadline import Deadline, stage_timeout
+
+
+# Waits wake at least this often to notice a cancelled branch
+CANCEL_POLL_SEC = 0.25
+
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a single top-level JSON object.
+    feed() returns the (key, value) pairs whose values completed
+    in the newly received text, in document order.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+
+    def _finish_value(self, end: int, completed: List[Tuple[str, object]]):
+        if self.key is not None and self.value_start is not None:
+            value = json.loads(self.buffer[self.value_start:end].strip())
+            completed.append((self.key, value))
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+
+    def feed(self, text: str) -> List[Tuple[str, object]]:
+        self.buffer += text
+        completed = []
+
+        for i in range(self.pos, len(self.buffer)):
+            ch = self.buffer[i]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.key is None and self.key_start is not None:
+                        self.key = json.loads(self.buffer[self.key_start:i + 1])
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                if self.depth == 1:
+                    if self.key is None:
+                        self.key_start = i
+                    elif self.value_start is None:
+                        self.value_start = i
+            elif ch in "{[":
+                if self.depth == 1 and self.key is not None and self.value_start is None:
+                    self.value_start = i
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self._finish_value(i, completed)
+            elif self.depth == 1:
+                if ch == ",":
+                    self._finish_value(i, completed)
+                elif ch != ":" and not ch.isspace():
+                    if self.key is not None and self.value_start is None:
+                        # number / true / false / null
+                        self.value_start = i
+
+        self.pos = len(self.buffer)
+        return completed
+
+
+class StreamingJSONResult:
+    """
+    Consumes a stream of text chunks on a background thread and
+    exposes top-level JSON fields as soon as each one completes.
+
+    - iter_fields(): yields (key, value) in arrival order (blocking)
+    - wait_for(*keys): blocks until the keys are available
+    - result(): blocks until the full object is parsed
+
+    Each wait takes an optional Deadline and raises DeadlineExceeded
+    when it runs out; the stream itself keeps going for other callers.
+    """
+
+    def __init__(self, chunk_source: Callable[[], Iterable[str]]):
+        self.fields: Dict[str, object] = {}
+        self.order: List[str] = []
+        self.final = None
+        self.error = None
+        self.done = False
+        self.condition = threading.Condition()
+
+        self.thread = threading.Thread(target=self._run, args=(chunk_source,), daemon=True)
+        self.thread.start()
+
+    def _publish(self, key: str, value):
+        with self.condition:
+            if key not in self.fields:
+                self.order.append(key)
+            self.fields[key] = value
+            self.condition.notify_all()
+
+    def _run(self, chunk_source):
+        parser = IncrementalJSONParser()
+        try:
+            for text in chunk_source():
+                for key, value in parser.feed(text):
+                    self._publish(key, value)
+
+            # The complete document stays authoritative
+            self.final = json.loads(parser.buffer)
+            for key, value in self.final.items():
+                if key not in self.fields:
+                    self._publish(key, value)
+        except Exception as e:
+            self.error = e
+        finally:
+            with self.condition:
+                self.done = True
+                self.condition.notify_all()
+
+    def _wait(self, predicate: Callable[[], bool], deadline: Optional[Deadline]):
+        # Caller holds self.condition
+        while not predicate():
+            timeout = stage_timeout(deadline, "llm_stream")
+            self.condition.wait(None if timeout is None else min(timeout, CANCEL_POLL_SEC))
+
+    def iter_fields(self, deadline: Optional[Deadline] = None) -> Iterator[Tuple[str, object]]:
+        i = 0
+        while True:
+            with self.condition:
+                self._wait(lambda: len(self.order) > i or self.done, deadline)
+                if len(self.order) > i:
+                    key = self.order[i]
+                    value = self.fields[key]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            i += 1
+            yield key, value
+
+    def has(self, *keys) -> bool:
+        with self.condition:
+            return all(k in self.fields for k in keys)
+
+    def snapshot(self) -> Dict:
+        with self.condition:
+            return dict(self.fields)
+
+    def wait_for(self, *keys, deadline: Optional[Deadline] = None) -> Dict:
+        """
+        Returns the fields parsed so far once all keys are present
+        (or the stream ended without them).
+        """
+        with self.condition:
+            self._wait(
+                lambda: self.done or all(k in self.fields for k in keys),
+                deadline
+            )
+            if self.error is not None:
+                raise self.error
+            return dict(self.fields)
+
+    def result(self, deadline: Optional[Deadline] = None) -> Dict:
+        with self.condition:
+            self._wait(lambda: self.done, deadline)
+        if self.error is not None:
+            raise self.error
+        # Results may be shared between coalesced callers
+        return copy.deepcopy(self.final)
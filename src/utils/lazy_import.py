@@ -0,0 +1,50 @@
+import sys
+import types
+import importlib
+import importlib.util
+import threading
+from typing import Optional
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a heavy module: the real import happens on first
+    attribute access (e.g. faiss.IndexFlatL2), then the module's
+    namespace is copied in so later lookups cost nothing extra.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                module = importlib.import_module(self.__name__)
+                self.__dict__.update(module.__dict__)
+                self.__dict__["_lazy_module"] = module
+        return self._lazy_module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str):
+    """
+    Module proxy imported on first use (the module itself if already loaded).
+    """
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def optional_lazy_import(name: str) -> Optional[types.ModuleType]:
+    """
+    lazy_import() for optional dependencies: None when not installed.
+    Checks availability without importing.
+    """
+    if name not in sys.modules and importlib.util.find_spec(name) is None:
+        return None
+    return lazy_import(name)
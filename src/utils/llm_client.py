@@ -1,27 +1,150 @@
 import os
 import json
-from openai import AzureOpenAI
-from dotenv import load_dotenv
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Optional
+from src.utils.clients import call_with_retries, openai
+from src.utils.deadline import Deadline, DeadlineExceeded, SharedDeadline
+from src.utils.json_stream import StreamingJSONResult
+from src.utils.single_flight import llm_flight, llm_stream_flight, payload_key
+from src.utils.token_usage import count_chat_tokens, count_tokens, token_usage, usage_counts
 
-load_dotenv()
 
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_KEY"),
-    api_version="2024-02-15-preview",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
+def call_llm_json(
+    system_prompt: str,
+    user_prompt: str,
+    temperature=0.2,
+    deadline: Optional[Deadline] = None,
+    stage: str = "llm"
+):
+    """
+    Identical concurrent calls are coalesced into one request.
+    Token usage and latency are recorded under stage (see token_usage).
+    """
+    key = payload_key(os.getenv("AZURE_OPENAI_DEPLOYMENT"), system_prompt, user_prompt, temperature)
 
+    try:
+        return llm_flight.do(
+            key,
+            lambda: _call_llm_json(system_prompt, user_prompt, temperature, deadline, stage),
+            timeout=deadline.timeout("llm_call") if deadline else None
+        )
+    except FuturesTimeoutError:
+        # Gave up waiting on a coalesced call
+        raise DeadlineExceeded("llm_call")
 
-def call_llm_json(system_prompt: str, user_prompt: str, temperature=0.2):
 
-    response = client.chat.completions.create(
-        model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
-        temperature=temperature,
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
+def _call_llm_json(
+    system_prompt: str,
+    user_prompt: str,
+    temperature=0.2,
+    deadline: Optional[Deadline] = None,
+    stage: str = "llm"
+):
+
+    started = time.perf_counter()
+    try:
+        response = call_with_retries(deadline, "llm_call", lambda client: client.chat.completions.create(
+            model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            temperature=temperature,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+        ))
+    except openai.APITimeoutError:
+        if deadline is None:
+            raise
+        raise DeadlineExceeded("llm_call")
+
+    content = response.choices[0].message.content
+    counts = usage_counts(getattr(response, "usage", None))
+    token_usage.record(
+        stage,
+        *(counts or (count_chat_tokens(system_prompt, user_prompt), count_tokens(content))),
+        latency_ms=(time.perf_counter() - started) * 1000,
+        estimated=counts is None
     )
 
-    return json.loads(response.choices[0].message.content)
\ No newline at end of file
+    return json.loads(content)
+
+
+def stream_llm_json(
+    system_prompt: str,
+    user_prompt: str,
+    temperature=0.2,
+    deadline: Optional[Deadline] = None,
+    stage: str = "llm"
+) -> StreamingJSONResult:
+    """
+    Streaming variant of call_llm_json.
+    Returns immediately; top-level fields become available as they complete.
+    Identical in-flight streams are shared between callers.
+
+    A shared stream runs while any caller sharing it still has budget
+    (SharedDeadline): the HTTP stream is closed once every one of their
+    deadlines has expired or their branches are cancelled. A caller
+    without a deadline only shares streams that have none either.
+    Callers pass their own deadline to the result's waits.
+
+    Usage is counted locally (the stream reports none unless asked for
+    it), including streams closed early.
+    """
+
+    bound = SharedDeadline(deadline) if deadline is not None else None
+
+    def chunks():
+        started = time.perf_counter()
+        while True:
+            try:
+                stream = call_with_retries(bound, "llm_stream", lambda client: client.chat.completions.create(
+                    model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+                    temperature=temperature,
+                    response_format={"type": "json_object"},
+                    stream=True,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ]
+                ))
+                break
+            except openai.APITimeoutError:
+                if bound is None:
+                    raise
+                if bound.expired():
+                    raise DeadlineExceeded("llm_stream")
+                # Callers that joined meanwhile still have budget
+
+        received = []
+        try:
+            with stream:
+                for event in stream:
+                    if bound is not None and bound.expired():
+                        # Closing the response aborts generation server-side
+                        raise DeadlineExceeded("llm_stream")
+                    # Azure may send an initial event without choices
+                    if event.choices and event.choices[0].delta.content:
+                        received.append(event.choices[0].delta.content)
+                        yield event.choices[0].delta.content
+        finally:
+            token_usage.record(
+                stage,
+                count_chat_tokens(system_prompt, user_prompt),
+                count_tokens("".join(received)),
+                latency_ms=(time.perf_counter() - started) * 1000,
+                estimated=True
+            )
+
+    key = payload_key(os.getenv("AZURE_OPENAI_DEPLOYMENT"), system_prompt, user_prompt, temperature)
+
+    def start():
+        result = StreamingJSONResult(chunks)
+        result.bound = bound
+        return result
+
+    return llm_stream_flight.share(
+        key,
+        start,
+        join=lambda handle: handle.bound is None or handle.bound.join(deadline)
+    )
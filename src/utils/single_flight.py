@@ -0,0 +1,133 @@
+import copy
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from typing import Callable, Dict, Optional
+from src.utils.deadline import DeadlineExceeded
+
+
+def payload_key(*parts) -> str:
+    """
+    Stable hash of a request payload.
+    """
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _LeaderGaveUp(Exception):
+    """
+    Set on the shared future when the leader ran out of its own
+    deadline; waiters then retry under theirs.
+    """
+
+
+class SingleFlight:
+    """
+    Process-wide request coalescing.
+
+    Concurrent calls with the same key wait on one in-flight execution
+    and share its result (or its exception). Waiters receive a deep copy
+    so callers can mutate what they get back.
+
+    A leader that fails on its own deadline (DeadlineExceeded) does not
+    pass that error on: one waiter takes over as leader and runs its
+    own fn, the others wait on it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, Future] = {}
+        self.shared: Dict[str, object] = {}
+        self.counters = {"calls": 0, "executed": 0, "coalesced": 0, "errors": 0, "handovers": 0}
+
+    def do(self, key: str, fn: Callable, timeout: Optional[float] = None):
+        """
+        timeout bounds how long a coalesced caller waits in total
+        (concurrent.futures.TimeoutError); the leader bounds its own call.
+        """
+        started = time.monotonic()
+        with self.lock:
+            self.counters["calls"] += 1
+
+        while True:
+            with self.lock:
+                future = self.in_flight.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self.in_flight[key] = future
+                    self.counters["executed"] += 1
+                else:
+                    self.counters["coalesced"] += 1
+
+            if leader:
+                break
+
+            wait = None if timeout is None else timeout - (time.monotonic() - started)
+            if wait is not None and wait <= 0:
+                raise FuturesTimeoutError()
+            try:
+                return copy.deepcopy(future.result(timeout=wait))
+            except _LeaderGaveUp:
+                with self.lock:
+                    self.counters["handovers"] += 1
+
+        try:
+            result = fn()
+        except BaseException as e:
+            gave_up = isinstance(e, DeadlineExceeded)
+            # Unregistered first, so retrying waiters start a new flight
+            with self.lock:
+                del self.in_flight[key]
+                if not gave_up:
+                    self.counters["errors"] += 1
+            future.set_exception(_LeaderGaveUp() if gave_up else e)
+            raise
+
+        with self.lock:
+            del self.in_flight[key]
+        future.set_result(result)
+        return result
+
+    def share(self, key: str, start: Callable, join: Optional[Callable] = None):
+        """
+        For long-lived handles with a .done flag (e.g. StreamingJSONResult):
+        returns the in-flight handle for key, or starts a new one.
+
+        join(handle) -> False when the in-flight handle cannot serve this
+        caller; a new one is started and shared from then on.
+        """
+        with self.lock:
+            self.counters["calls"] += 1
+
+            for k in [k for k, handle in self.shared.items() if handle.done]:
+                del self.shared[k]
+
+            handle = self.shared.get(key)
+            if handle is not None and (join is None or join(handle)):
+                self.counters["coalesced"] += 1
+                return handle
+
+            handle = start()
+            self.shared[key] = handle
+            self.counters["executed"] += 1
+            return handle
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return dict(self.counters, in_flight=len(self.in_flight) + len(self.shared))
+
+
+llm_flight = SingleFlight("llm")
+llm_stream_flight = SingleFlight("llm_stream")
+embedding_flight = SingleFlight("embedding")
+
+
+def get_coalescing_stats() -> Dict:
+    return {
+        flight.name: flight.stats()
+        for flight in (llm_flight, llm_stream_flight, embedding_flight)
+    }
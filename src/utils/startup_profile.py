@@ -0,0 +1,142 @@
+import os
+import re
+import ast
+import sys
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+
+# Startup = importing what app.py imports
+DEFAULT_ENTRY = "app.py"
+
+PHASE_MARKER = "-- startup_profile: first use --"
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+PROBE = """
+import sys, importlib
+for name in {modules!r}:
+    importlib.import_module(name)
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+if {first_use!r}:
+    from src.utils.lazy_import import LazyModule
+    for module_name, module in list(sys.modules.items()):
+        if module_name.startswith("src."):
+            for value in list(getattr(module, "__dict__", {{}}).values()):
+                if isinstance(value, LazyModule):
+                    value._load()
+"""
+
+
+def entry_imports(path: str = DEFAULT_ENTRY) -> List[str]:
+    """
+    Top-level modules imported by a script, in order.
+    """
+    with open(path, "r", encoding="utf-8-sig") as f:
+        tree = ast.parse(f.read())
+
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+
+    return list(dict.fromkeys(modules))
+
+
+def parse_importtime(stderr: str) -> Dict[str, List[Tuple[str, int, int, int]]]:
+    """
+    -X importtime output split at the phase marker:
+    {"startup": [(module, self_us, cumulative_us, depth)], "first_use": [...]}
+    """
+    phases = {"startup": [], "first_use": []}
+    phase = "startup"
+
+    for line in stderr.splitlines():
+        if line.strip() == PHASE_MARKER:
+            phase = "first_use"
+            continue
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            phases[phase].append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+
+    return phases
+
+
+def summarize(entries: List[Tuple[str, int, int, int]], top: int) -> Dict:
+    by_package: Dict[str, int] = {}
+    for name, self_us, _, _ in entries:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+
+    roots = [(name, cumulative) for name, _, cumulative, depth in entries if depth == 0]
+
+    return {
+        "total_ms": round(sum(cumulative for _, cumulative in roots) / 1000, 1),
+        "packages": sorted(
+            ((package, round(us / 1000, 1)) for package, us in by_package.items()),
+            key=lambda item: -item[1]
+        )[:top],
+        "roots": sorted(
+            ((name, round(us / 1000, 1)) for name, us in roots),
+            key=lambda item: -item[1]
+        )[:top]
+    }
+
+
+def profile_imports(modules: List[str], first_use: bool = False) -> Dict[str, List]:
+    """
+    Imports modules in a fresh interpreter with -X importtime
+    (nothing is cached in-process, like a cold container start).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get("PYTHONPATH", ""))
+
+    probe = PROBE.format(modules=modules, marker=PHASE_MARKER, first_use=first_use)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=root,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    return parse_importtime(completed.stderr)
+
+
+def format_summary(title: str, summary: Dict) -> str:
+    lines = [f"{title}: {summary['total_ms']} ms", "  by package (self time):"]
+    lines += [f"    {package:<32}{ms:>10.1f} ms" for package, ms in summary["packages"]]
+    lines.append("  slowest top-level imports (cumulative):")
+    lines += [f"    {name:<32}{ms:>10.1f} ms" for name, ms in summary["roots"]]
+    return "\n".join(lines)
+
+
+# ============================
+# 🚀 RUN DIRECTLY
+# ============================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report import cost per module at startup.")
+    parser.add_argument("modules", nargs="*", help=f"modules to import (default: the imports of {DEFAULT_ENTRY})")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument(
+        "--first-use",
+        action="store_true",
+        help="also load every lazily imported dependency and report that cost separately"
+    )
+    args = parser.parse_args()
+
+    modules = args.modules or entry_imports()
+    phases = profile_imports(modules, first_use=args.first_use)
+
+    print(format_summary("startup imports", summarize(phases["startup"], args.top)))
+    if args.first_use:
+        print()
+        print(format_summary("deferred to first use", summarize(phases["first_use"], args.top)))
@@ -0,0 +1,111 @@
+import os
+import threading
+from typing import Dict, Optional
+from src.utils.lazy_import import optional_lazy_import
+
+tiktoken = optional_lazy_import("tiktoken")
+
+
+# Tokenizer used to count prompts before sending (o200k_base: GPT-4o
+# family). Without tiktoken installed counts are estimated.
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+
+# Rough English/JSON average, only used without tiktoken
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if tiktoken is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(_get_encoding().encode(text, disallowed_special=()))
+
+
+def count_chat_tokens(system_prompt: str, user_prompt: str) -> int:
+    # ~4 tokens of chat framing per message plus 3 to prime the reply
+    return count_tokens(system_prompt) + count_tokens(user_prompt) + 2 * 4 + 3
+
+
+class TokenUsage:
+    """
+    Per-stage prompt / completion token totals of the LLM calls this
+    process actually sent (coalesced callers are not counted twice).
+    estimated_calls were counted locally instead of reported by the API.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages: Dict[str, Dict] = {}
+
+    def record(
+        self,
+        stage: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency_ms: float,
+        estimated: bool = False
+    ):
+        with self.lock:
+            totals = self.stages.setdefault(stage, {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "latency_ms": 0.0,
+                "estimated_calls": 0
+            })
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["latency_ms"] += latency_ms
+            totals["estimated_calls"] += int(estimated)
+            totals["last"] = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "latency_ms": round(latency_ms, 1)
+            }
+
+    def stats(self) -> Dict:
+        with self.lock:
+            stats = {}
+            for stage, totals in self.stages.items():
+                calls = totals["calls"]
+                stats[stage] = {
+                    "calls": calls,
+                    "prompt_tokens": totals["prompt_tokens"],
+                    "completion_tokens": totals["completion_tokens"],
+                    "avg_prompt_tokens": round(totals["prompt_tokens"] / calls, 1),
+                    "avg_completion_tokens": round(totals["completion_tokens"] / calls, 1),
+                    "avg_latency_ms": round(totals["latency_ms"] / calls, 1),
+                    "estimated_calls": totals["estimated_calls"],
+                    "last": dict(totals["last"])
+                }
+            return stats
+
+
+token_usage = TokenUsage()
+
+
+def usage_counts(usage) -> Optional[tuple]:
+    """
+    (prompt_tokens, completion_tokens) from an API usage object, if any.
+    """
+    if usage is None or getattr(usage, "prompt_tokens", None) is None:
+        return None
+    return usage.prompt_tokens, usage.completion_tokens or 0
+
+
+def get_token_usage_stats() -> Dict:
+    return token_usage.stats()
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from src.utils.atomic_file import atomic_write
+
+
+def test_atomic_write_replaces_file_and_leaves_no_temp(tmp_path):
+    path = str(tmp_path / "nested" / "data.json")
+    with atomic_write(path) as f:
+        f.write("first")
+    with atomic_write(path) as f:
+        f.write("second")
+
+    assert open(path, encoding="utf-8").read() == "second"
+    assert os.listdir(os.path.dirname(path)) == ["data.json"]
+
+
+def test_atomic_write_failure_keeps_old_file(tmp_path):
+    path = str(tmp_path / "data.json")
+    with atomic_write(path) as f:
+        f.write("old")
+
+    with pytest.raises(ValueError):
+        with atomic_write(path) as f:
+            f.write("partial")
+            raise ValueError("boom")
+
+    assert open(path, encoding="utf-8").read() == "old"
+    assert os.listdir(tmp_path) == ["data.json"]
@@ -0,0 +1,169 @@
+import pytest
+
+from src.sql_agent import cost_guard
+from src.sql_agent.cost_guard import analyze_sql_cost, review_sql_cost, rewrite_sql
+
+
+def column(name, type_):
+    return {"name": name, "type": type_}
+
+
+SCHEMA = {
+    "tables": [
+        {
+            "name": "Vendors",
+            "row_count": 2_000_000,
+            "primary_keys": ["VendorID"],
+            "columns": [
+                column("VendorID", "int"),
+                column("Name", "nvarchar"),
+                column("State", "nvarchar"),
+                column("Code", "varchar"),
+                column("CreatedAt", "datetime2"),
+                column("Founded", "int"),
+            ],
+            "indexes": [
+                {"column": "Name", "key_ordinal": 1},
+                {"column": "State", "key_ordinal": 2},
+                {"column": "CreatedAt", "key_ordinal": 1},
+                {"column": "Code", "key_ordinal": 1},
+            ],
+        },
+        {
+            "name": "Orders",
+            "row_count": 5_000,
+            "primary_keys": ["OrderID"],
+            "columns": [column("OrderID", "int"), column("VendorID", "int"), column("Total", "money")],
+            "indexes": [],
+        },
+    ]
+}
+
+
+def rewritten(where):
+    return rewrite_sql(f"SELECT VendorID FROM Vendors v WHERE {where}", SCHEMA)
+
+
+# ============================
+# ✏️ REWRITES
+# ============================
+
+def test_upper_and_lower_are_removed_from_compared_columns():
+    result = rewritten("UPPER(v.Name) = 'ACME' AND LOWER(State) IN ('tx', 'ca')")
+
+    assert result["sql"] == "SELECT VendorID FROM Vendors v WHERE v.Name = 'ACME' AND State IN ('tx', 'ca')"
+    assert len(result["rewrites"]) == 2
+
+
+def test_upper_outside_where_is_kept():
+    sql = "SELECT UPPER(Name) AS Name FROM Vendors WHERE Name = 'ACME' ORDER BY UPPER(Name)"
+
+    assert rewrite_sql(sql, SCHEMA) == {"sql": sql, "rewrites": []}
+
+
+def test_upper_is_kept_with_case_sensitive_collation(monkeypatch):
+    monkeypatch.setattr(cost_guard, "CASE_INSENSITIVE_COLLATION", False)
+
+    assert rewritten("UPPER(Name) = 'ACME'")["rewrites"] == []
+
+
+def test_year_becomes_half_open_date_range():
+    result = rewritten("YEAR(v.CreatedAt) = 2024")
+
+    assert result["sql"] == (
+        "SELECT VendorID FROM Vendors v "
+        "WHERE (v.CreatedAt >= '2024-01-01' AND v.CreatedAt < '2025-01-01')"
+    )
+
+
+def test_year_on_non_date_column_is_kept():
+    assert rewritten("YEAR(Founded) = 2024")["rewrites"] == []
+
+
+def test_like_without_wildcards_becomes_equality():
+    assert rewritten("Code LIKE 'ABC'")["sql"].endswith("WHERE Code = 'ABC'")
+    assert rewritten("Code LIKE N'O''Neil'")["sql"].endswith("WHERE Code = N'O''Neil'")
+
+
+@pytest.mark.parametrize("predicate", [
+    "Code LIKE 'AB%'",
+    "Code LIKE 'A_C'",
+    "Code LIKE '[AB]C'",
+    "Code LIKE 'ABC '",
+    "Code NOT LIKE 'ABC'",
+])
+def test_like_with_wildcards_or_trailing_space_is_kept(predicate):
+    assert rewritten(predicate)["rewrites"] == []
+
+
+def test_rewrites_chain_within_one_call():
+    result = rewritten("UPPER(Name) LIKE 'ACME'")
+
+    assert result["sql"].endswith("WHERE Name = 'ACME'")
+    assert len(result["rewrites"]) == 2
+
+
+def test_string_literals_are_never_rewritten():
+    sql = "SELECT VendorID FROM Vendors WHERE Code = 'YEAR(CreatedAt) = 2024 UPPER(Name) = x'"
+
+    assert rewrite_sql(sql, SCHEMA)["sql"] == sql
+
+
+# ============================
+# 📊 ANALYSIS AND POLICY
+# ============================
+
+def test_indexed_filter_seeks():
+    analysis = analyze_sql_cost("SELECT VendorID FROM Vendors WHERE Name = 'ACME'", SCHEMA)
+
+    assert analysis["access"] == {"Vendors": "seek"}
+    assert analysis["risk"] == "none"
+
+
+def test_non_leading_index_column_scans():
+    analysis = analyze_sql_cost("SELECT VendorID FROM Vendors WHERE State = 'TX'", SCHEMA)
+
+    assert analysis["access"] == {"Vendors": "scan"}
+    assert [(f["kind"], f["column"], f["risk"]) for f in analysis["findings"]] == [
+        ("unindexed_filter", "State", "high")
+    ]
+
+
+def test_leading_wildcard_scans():
+    analysis = analyze_sql_cost("SELECT VendorID FROM Vendors WHERE Name LIKE '%acme'", SCHEMA)
+
+    assert analysis["access"] == {"Vendors": "scan"}
+    assert analysis["findings"][0]["kind"] == "leading_wildcard"
+
+
+def test_review_rewrites_before_analysis():
+    review = review_sql_cost("SELECT VendorID FROM Vendors WHERE YEAR(CreatedAt) = 2024", SCHEMA, policy="rewrite")
+
+    assert review["action"] == "pass"
+    assert review["access"] == {"Vendors": "seek"}
+    assert review["rewrites"]
+
+
+def test_review_warn_policy_leaves_sql_alone():
+    sql = "SELECT VendorID FROM Vendors WHERE YEAR(CreatedAt) = 2024"
+    review = review_sql_cost(sql, SCHEMA, policy="warn")
+
+    assert review["sql"] == sql
+    assert review["action"] == "warn"
+    assert review["findings"][0]["kind"] == "wrapped_column"
+
+
+def test_review_regenerates_high_risk_only_when_allowed():
+    sql = "SELECT VendorID FROM Vendors WHERE State = 'TX'"
+
+    review = review_sql_cost(sql, SCHEMA, policy="regenerate")
+    assert review["action"] == "regenerate"
+    assert review["reason"].startswith("High scan risk: Vendors.State: filter column has no leading index.")
+    assert "Indexed columns: Vendors(Code, CreatedAt, Name, VendorID)." in review["reason"]
+
+    assert review_sql_cost(sql, SCHEMA, policy="regenerate", allow_regenerate=False)["action"] == "warn"
+
+
+def test_review_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        review_sql_cost("SELECT 1", SCHEMA, policy="block")
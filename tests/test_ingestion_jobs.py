@@ -0,0 +1,64 @@
+import threading
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+from src.rag import requirement_store
+from src.rag.ingestion_jobs import IngestionJobManager, IngestionQueueFull
+from src.rag.requirement_store import RequirementStore
+
+
+def wait_for(manager, job_id, statuses=("done", "failed"), timeout=10):
+    stop = time.monotonic() + timeout
+    while time.monotonic() < stop:
+        job = manager.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(manager.get(job_id))
+
+
+@pytest.fixture
+def release(monkeypatch):
+    # Embedding blocks until the test releases it
+    event = threading.Event()
+
+    def fake_embed(texts, deadline=None):
+        event.wait(10)
+        return np.stack([
+            np.random.default_rng(zlib.crc32(t.encode("utf-8"))).standard_normal(8).astype("float32")
+            for t in texts
+        ])
+
+    monkeypatch.setattr(requirement_store, "embed_texts", fake_embed)
+    return event
+
+
+def test_jobs_beyond_max_pending_are_rejected(tmp_path, release):
+    manager = IngestionJobManager(RequirementStore(str(tmp_path / "store")), max_workers=1, max_pending=2)
+
+    first = manager.submit("a.txt", "text/plain", b"Requirement one. " * 20)
+    second = manager.submit("b.txt", "text/plain", b"Requirement two. " * 20)
+    with pytest.raises(IngestionQueueFull):
+        manager.submit("c.txt", "text/plain", b"Requirement three. " * 20)
+    assert manager.stats() == {"pending": 2, "max_pending": 2}
+
+    release.set()
+    assert wait_for(manager, first["job_id"])["status"] == "done"
+    assert wait_for(manager, second["job_id"])["status"] == "done"
+
+    third = manager.submit("c.txt", "text/plain", b"Requirement three. " * 20)
+    assert wait_for(manager, third["job_id"])["status"] == "done"
+    assert manager.stats()["pending"] == 0
+
+
+def test_status_is_readable_from_another_manager(tmp_path, release):
+    store = RequirementStore(str(tmp_path / "store"))
+    job = IngestionJobManager(store).submit("a.txt", "text/plain", b"Requirement one. " * 20)
+    release.set()
+
+    other = IngestionJobManager(RequirementStore(store.path))
+    assert wait_for(other, job["job_id"])["document_id"] == job["document_id"]
+    assert other.get("../../etc/passwd") is None
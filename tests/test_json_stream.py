@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from src.utils.json_stream import IncrementalJSONParser, StreamingJSONResult
+
+
+DOCUMENT = {
+    "intent": "list_vendors",
+    "tables": ["Vendors", "Certifications"],
+    "filters": {"grade": "G7", "note": "a \"quoted\", {braced} value\\"},
+    "limit": 100,
+    "ratio": -1.5e3,
+    "distinct": True,
+    "group_by": None,
+    "reasoning": "done",
+}
+TEXT = json.dumps(DOCUMENT, indent=2)
+
+
+def feed_all(parser, pieces):
+    completed = []
+    for piece in pieces:
+        completed.extend(parser.feed(piece))
+    return completed
+
+
+def test_whole_document_in_one_feed():
+    assert feed_all(IncrementalJSONParser(), [TEXT]) == list(DOCUMENT.items())
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16])
+def test_fixed_size_splits(size):
+    pieces = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+
+    assert feed_all(IncrementalJSONParser(), pieces) == list(DOCUMENT.items())
+
+
+def test_every_two_way_split():
+    for cut in range(len(TEXT) + 1):
+        pieces = [TEXT[:cut], TEXT[cut:]]
+        assert feed_all(IncrementalJSONParser(), pieces) == list(DOCUMENT.items()), cut
+
+
+def test_split_inside_escape_sequence():
+    text = '{"note": "line\\"one\\\\", "n": 1}'
+    cut = text.index("\\") + 1
+
+    assert feed_all(IncrementalJSONParser(), [text[:cut], text[cut:]]) == [
+        ("note", 'line"one\\'), ("n", 1)
+    ]
+
+
+def test_values_are_reported_once_complete():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"intent": "list_vendors", "tables": ["Ven') == [("intent", "list_vendors")]
+    assert parser.feed('dors"], "limit": 10') == [("tables", ["Vendors"])]
+    # A scalar is only complete once the next delimiter arrives
+    assert parser.feed("0") == []
+    assert parser.feed("}") == [("limit", 100)]
+
+
+def test_streaming_result_collects_all_fields():
+    pieces = [TEXT[i:i + 5] for i in range(0, len(TEXT), 5)]
+    result = StreamingJSONResult(lambda: iter(pieces))
+
+    assert result.wait_for("tables")["tables"] == DOCUMENT["tables"]
+    assert result.result() == DOCUMENT
+    assert [key for key, _ in result.iter_fields()] == list(DOCUMENT)
+
+
+def test_streaming_result_raises_on_invalid_json():
+    result = StreamingJSONResult(lambda: iter(['{"intent": "x", ', '"tables": [']))
+
+    with pytest.raises(json.JSONDecodeError):
+        result.result()
@@ -0,0 +1,63 @@
+from src.rag.lexical_index import BM25Index, tokenize
+from src.rag.retriever import reciprocal_rank_fusion
+
+
+CHUNKS = [
+    "The contractor shall hold a CIDB grading of G7 or higher.",
+    "The contractor shall hold a CIDB grading of G5 or higher.",
+    "Quality management shall comply with ISO 9001.",
+    "Payment is made within 30 days of an approved invoice.",
+]
+
+
+def build_index():
+    index = BM25Index()
+    index.add_documents(CHUNKS)
+    return index
+
+
+def test_tokenize_keeps_codes_intact():
+    assert tokenize("CIDB G7, ISO-9001") == ["cidb", "g7", "iso", "9001"]
+
+
+def test_exact_code_ranks_its_chunk_first():
+    index = build_index()
+
+    assert index.search_ids("G7 grading")[0][0] == 0
+    assert index.search_ids("G5 grading")[0][0] == 1
+    assert index.search("ISO 9001", top_k=1) == [CHUNKS[2]]
+
+
+def test_rarer_term_outweighs_common_term():
+    index = build_index()
+    (first, first_score), (second, second_score) = index.search_ids("contractor G7")
+
+    assert first == 0 and second == 1
+    assert first_score > second_score
+
+
+def test_unmatched_documents_are_not_returned():
+    index = build_index()
+
+    assert [doc_id for doc_id, _ in index.search_ids("invoice")] == [3]
+    assert index.search_ids("tender") == []
+    assert BM25Index().search_ids("G7") == []
+
+
+def test_top_k_limits_results():
+    index = build_index()
+
+    assert len(index.search_ids("shall", top_k=2)) == 2
+
+
+def test_rrf_prefers_ids_ranked_well_in_both_lists():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 3, 4]])
+
+    assert fused[0] == 2
+    assert set(fused) == {1, 2, 3, 4}
+    assert fused[-1] == 4
+
+
+def test_rrf_single_list_keeps_order():
+    assert reciprocal_rank_fusion([[5, 3, 9]]) == [5, 3, 9]
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from src.planner import merge_and_score
+from src.planner.merge_and_score import score_vendors_against_requirements
+
+
+VENDORS = pd.DataFrame({
+    "VendorName": ["Acme Roads", "Bina Civil", "Cahaya Electrical"],
+    "Speciality": ["road works", "civil construction CIDB G7", "electrical installation"],
+})
+
+
+def fake_embed(texts, deadline=None):
+    fake_embed.calls.append(list(texts))
+    # Shared words -> similar vectors
+    vocabulary = sorted({w for t in texts for w in t.lower().split()})
+    return np.array([[t.lower().split().count(w) for w in vocabulary] for t in texts], dtype="float32")
+
+
+def test_no_requirement_chunks_skips_scoring(monkeypatch):
+    fake_embed.calls = []
+    monkeypatch.setattr(merge_and_score, "embed_texts", fake_embed)
+
+    assert score_vendors_against_requirements(VENDORS, {"retrieved_chunks": []}) is None
+    assert fake_embed.calls == []
+
+
+def test_rerank_orders_by_requirement_similarity(monkeypatch):
+    fake_embed.calls = []
+    monkeypatch.setattr(merge_and_score, "embed_texts", fake_embed)
+
+    result = score_vendors_against_requirements(
+        VENDORS, {"retrieved_chunks": ["civil construction", "CIDB G7 required"]}, rerank_top_n=2
+    )
+
+    assert result["ranked_dataframe"]["VendorName"].iloc[0] == "Bina Civil"
+    assert result["candidates_embedded"] == 2
+    assert fake_embed.calls[0][0] == "civil construction CIDB G7 required"
+    assert len(fake_embed.calls[0]) == 3
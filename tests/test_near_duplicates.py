@@ -0,0 +1,94 @@
+import pytest
+
+from src.rag.near_duplicates import (
+    NearDuplicateIndex,
+    collapse_near_duplicates,
+    estimated_similarity,
+    minhash_signature,
+)
+
+
+BOILERPLATE = (
+    "The tenderer shall submit a valid tax clearance certificate, proof of "
+    "registration on the central supplier database, a certified copy of the "
+    "company registration documents, a signed declaration of interest, and a "
+    "letter of good standing from the compensation fund, together with the "
+    "audited financial statements for the three most recent financial years, "
+    "failing which the tender will be regarded as non-responsive and will not "
+    "be evaluated further by the bid evaluation committee."
+)
+
+
+def test_identical_signatures_for_identical_text():
+    assert estimated_similarity(minhash_signature(BOILERPLATE), minhash_signature(BOILERPLATE)) == 1.0
+
+
+def test_exact_duplicates_collapse_onto_first_occurrence():
+    chunks = ["alpha beta gamma delta", "one two three four", "alpha beta gamma delta"]
+    result = collapse_near_duplicates(chunks)
+
+    assert result["unique_chunks"] == chunks[:2]
+    assert result["mapping"] == [0, 1, 0]
+    assert result["stats"]["duplicate_chunks"] == 1
+    assert result["stats"]["chars_saved"] == len(chunks[2])
+
+
+def test_case_spacing_and_punctuation_differences_collapse():
+    variant = BOILERPLATE.upper().replace(", ", " ,  ")
+    result = collapse_near_duplicates([BOILERPLATE, variant])
+
+    assert result["mapping"] == [0, 0]
+
+
+def test_one_word_edit_in_a_long_paragraph_collapses():
+    variant = BOILERPLATE.replace("committee.", "panel.")
+
+    assert collapse_near_duplicates([BOILERPLATE, variant])["mapping"] == [0, 0]
+
+
+@pytest.mark.parametrize("first, second", [
+    # Requirements that differ only in a code or a number
+    ("The contractor shall hold a CIDB grading of G7 or higher in the CE class.",
+     "The contractor shall hold a CIDB grading of G5 or higher in the CE class."),
+    ("Payment shall be made within 30 days of receipt of a valid invoice.",
+     "Payment shall be made within 60 days of receipt of a valid invoice."),
+    ("Quality management shall comply with ISO 9001.",
+     "Quality management shall comply with ISO 14001."),
+    # Short chunks
+    ("G7", "G5"),
+    ("Section 4", "Section 5"),
+    # Unrelated text
+    (BOILERPLATE, "Site meetings are held fortnightly on the project site."),
+])
+def test_distinct_requirements_do_not_collapse(first, second):
+    result = collapse_near_duplicates([first, second])
+
+    assert result["mapping"] == [0, 1]
+    assert result["unique_chunks"] == [first, second]
+    assert result["stats"]["duplicate_chunks"] == 0
+
+
+def test_mapping_follows_original_order():
+    chunks = ["a b c d", "e f g h", "a b c d", "i j k l", "e f g h"]
+    result = collapse_near_duplicates(chunks)
+
+    assert result["unique_chunks"] == ["a b c d", "e f g h", "i j k l"]
+    assert result["mapping"] == [0, 1, 0, 2, 1]
+    assert [result["unique_chunks"][m] for m in result["mapping"]] == chunks
+
+
+def test_index_returns_most_similar_key_above_threshold():
+    index = NearDuplicateIndex(threshold=0.85)
+    index.add("original", minhash_signature(BOILERPLATE))
+    index.add("other", minhash_signature("Site meetings are held fortnightly on the project site."))
+
+    assert index.find(minhash_signature(BOILERPLATE.lower())) == "original"
+    assert index.find(minhash_signature("Completely unrelated text about rates and levies.")) is None
+    assert len(index) == 2
+
+
+def test_empty_input():
+    result = collapse_near_duplicates([])
+
+    assert result["unique_chunks"] == [] and result["mapping"] == []
+    assert result["stats"]["saved_ratio"] == 0.0
@@ -0,0 +1,190 @@
+import pandas as pd
+
+from src.sql_agent import paginator
+from src.sql_agent.paginator import (
+    ResultPager,
+    build_keyset_page_query,
+    build_offset_page_query,
+    count_select_items,
+    default_order_by,
+    extract_output_columns,
+    find_keyset_columns,
+    from_tables,
+    has_order_by,
+    keyset_params,
+    strip_top_clause,
+)
+
+
+def table(name, primary_keys, *columns):
+    return {
+        "name": name,
+        "primary_keys": primary_keys,
+        "columns": [{"name": c, "type": "int"} for c in primary_keys + list(columns)],
+    }
+
+
+SCHEMA = {
+    "tables": [
+        table("Vendors", ["VendorID"], "Name", "State"),
+        table("Certifications", ["CertID"], "VendorID", "CertType"),
+        table("OrderLines", ["OrderID", "LineNo"], "Qty"),
+    ]
+}
+
+
+def test_strip_top_clause():
+    assert strip_top_clause("SELECT TOP (100) VendorID FROM Vendors;") == "SELECT VendorID FROM Vendors"
+    assert strip_top_clause("select distinct top 5 percent Name from V") == "SELECT distinct Name from V"
+    assert strip_top_clause("SELECT VendorID FROM Vendors") == "SELECT VendorID FROM Vendors"
+
+
+def test_output_columns_use_aliases():
+    sql = "SELECT v.VendorID, v.Name AS VendorName, [State] FROM Vendors v"
+
+    assert extract_output_columns(sql) == ["VendorID", "VendorName", "State"]
+
+
+def test_has_order_by_only_counts_the_outer_query():
+    assert has_order_by("SELECT Name FROM Vendors ORDER BY Name")
+    assert not has_order_by(
+        "SELECT Name, ROW_NUMBER() OVER (ORDER BY Name) AS rn FROM Vendors"
+    )
+    assert not has_order_by(
+        "SELECT Name FROM (SELECT TOP 10 Name FROM Vendors ORDER BY Name) AS t"
+    )
+    assert not has_order_by("SELECT Name FROM Vendors WHERE Note = 'ORDER BY'")
+    assert not has_order_by("SELECT Name FROM Vendors -- ORDER BY Name")
+
+
+def test_default_order_by_covers_every_select_item():
+    sql = "SELECT Name, COUNT(*), State FROM Vendors GROUP BY Name, State"
+
+    assert count_select_items(sql) == 3
+    assert default_order_by(sql) == "ORDER BY 1, 2, 3"
+    assert default_order_by("SELECT * FROM Vendors") == "ORDER BY 1"
+
+
+def test_keyset_query():
+    first = build_keyset_page_query("SELECT VendorID FROM V", ["VendorID"], 50, has_last_key=False)
+    later = build_keyset_page_query("SELECT VendorID FROM V", ["VendorID"], 50, has_last_key=True)
+
+    assert first == (
+        "SELECT TOP (50) * FROM (SELECT VendorID FROM V) AS page_src "
+        "ORDER BY page_src.[VendorID]"
+    )
+    assert later == (
+        "SELECT TOP (50) * FROM (SELECT VendorID FROM V) AS page_src "
+        "WHERE page_src.[VendorID] > %s ORDER BY page_src.[VendorID]"
+    )
+
+
+def test_keyset_query_escapes_percent_unless_parameterized():
+    sql = "SELECT VendorID FROM V WHERE Name LIKE 'A%'"
+
+    assert "LIKE 'A%%'" in build_keyset_page_query(sql, ["VendorID"], 10, has_last_key=True)
+    assert "LIKE 'A%'" in build_keyset_page_query(sql, ["VendorID"], 10, has_last_key=False)
+
+    template = "SELECT VendorID FROM V WHERE Name LIKE %s"
+    assert "LIKE %s" in build_keyset_page_query(template, ["VendorID"], 10, True, parameterized=True)
+
+
+def test_offset_query_adds_deterministic_order():
+    assert build_offset_page_query("SELECT VendorName FROM Vendors WHERE State = 'TX'", 50) == (
+        "SELECT VendorName FROM Vendors WHERE State = 'TX' ORDER BY 1 "
+        "OFFSET %s ROWS FETCH NEXT 50 ROWS ONLY"
+    )
+
+
+def test_offset_query_keeps_own_order_by():
+    assert build_offset_page_query("SELECT Name, State FROM V ORDER BY State", 25) == (
+        "SELECT Name, State FROM V ORDER BY State "
+        "OFFSET %s ROWS FETCH NEXT 25 ROWS ONLY"
+    )
+
+
+def test_offset_query_escapes_percent():
+    sql = build_offset_page_query("SELECT Name FROM V WHERE Name LIKE '%co'", 10)
+
+    assert "LIKE '%%co'" in sql
+    assert sql.endswith("OFFSET %s ROWS FETCH NEXT 10 ROWS ONLY")
+
+
+def test_composite_keyset_query_compares_lexicographically():
+    sql = build_keyset_page_query("SELECT OrderID, LineNo FROM OrderLines", ["OrderID", "LineNo"], 20, True)
+
+    assert sql == (
+        "SELECT TOP (20) * FROM (SELECT OrderID, LineNo FROM OrderLines) AS page_src "
+        "WHERE (page_src.[OrderID] > %s OR page_src.[OrderID] = %s AND page_src.[LineNo] > %s) "
+        "ORDER BY page_src.[OrderID], page_src.[LineNo]"
+    )
+    assert keyset_params((7, 3)) == (7, 7, 3)
+
+
+def test_from_tables():
+    assert from_tables("SELECT 1 FROM dbo.Vendors AS v INNER JOIN [Certifications] c ON c.VendorID = v.VendorID AND c.CertType = 'x' WHERE 1 = 1") == [
+        ("Vendors", "v"), ("Certifications", "c")
+    ]
+    assert from_tables("SELECT 1 FROM Vendors v LEFT JOIN Certifications c ON c.VendorID = v.VendorID") is None
+    assert from_tables("SELECT 1 FROM (SELECT VendorID FROM Vendors) AS t") is None
+
+
+def test_keyset_columns_single_table():
+    assert find_keyset_columns("SELECT vendorid, Name FROM Vendors", SCHEMA) == ["vendorid"]
+    assert find_keyset_columns("SELECT [VendorID] AS Id FROM dbo.Vendors AS v", SCHEMA) == ["Id"]
+    assert find_keyset_columns("SELECT OrderID, LineNo, Qty FROM OrderLines", SCHEMA) == ["OrderID", "LineNo"]
+    assert find_keyset_columns("SELECT Name FROM Vendors", SCHEMA) == []
+    assert find_keyset_columns("SELECT OrderID, Qty FROM OrderLines", SCHEMA) == []
+    assert find_keyset_columns("SELECT * FROM Vendors", SCHEMA) == []
+    # An unnamed column cannot be selected from the paging subquery
+    assert find_keyset_columns("SELECT VendorID, COUNT(*) FROM Vendors GROUP BY VendorID", SCHEMA) == []
+
+
+def test_keyset_columns_for_joins_need_every_tables_key():
+    join = " FROM Vendors v JOIN Certifications c ON c.VendorID = v.VendorID"
+
+    # VendorID repeats once per certification: paging on it would skip rows
+    assert find_keyset_columns("SELECT v.VendorID, v.Name, c.CertType" + join, SCHEMA) == []
+    assert find_keyset_columns("SELECT v.VendorID, c.CertID, c.CertType" + join, SCHEMA) == ["VendorID", "CertID"]
+    # Two output columns named VendorID break SELECT * FROM (...) AS page_src
+    assert find_keyset_columns("SELECT v.VendorID, c.VendorID, c.CertID" + join, SCHEMA) == []
+    # Ambiguous unqualified key
+    assert find_keyset_columns("SELECT VendorID, CertID" + join, SCHEMA) == []
+    # Outer joins can add NULL keys
+    assert find_keyset_columns(
+        "SELECT v.VendorID, c.CertID FROM Vendors v LEFT JOIN Certifications c ON c.VendorID = v.VendorID", SCHEMA
+    ) == []
+
+
+def test_pager_falls_back_to_offset_for_fanning_out_joins():
+    pager = ResultPager(
+        "SELECT v.VendorID, v.Name, c.CertType FROM Vendors v JOIN Certifications c ON c.VendorID = v.VendorID",
+        SCHEMA
+    )
+    assert pager.strategy == "offset"
+    assert ResultPager("SELECT TOP 10 VendorID, Name FROM Vendors", SCHEMA).strategy == "keyset"
+
+
+def test_composite_keyset_pages_pass_the_last_key(monkeypatch):
+    pages = [
+        pd.DataFrame({"VendorID": [1, 1], "CertID": [10, 11], "CertType": ["a", "b"]}),
+        pd.DataFrame({"VendorID": [2], "CertID": [12], "CertType": ["c"]}),
+    ]
+    calls = []
+
+    def fake_execute(sql, max_rows, params=None):
+        calls.append((sql, params))
+        return {"success": True, "dataframe": pages[len(calls) - 1]}
+
+    monkeypatch.setattr(paginator, "execute_sql_query", fake_execute)
+    pager = ResultPager(
+        "SELECT v.VendorID, c.CertID, c.CertType FROM Vendors v JOIN Certifications c ON c.VendorID = v.VendorID",
+        SCHEMA, page_size=2
+    )
+
+    assert pager.get_page(0)["CertID"].tolist() == [10, 11]
+    pager.close()
+    assert pager.get_page(1)["CertID"].tolist() == [12]
+    assert calls[0][1] is None
+    assert calls[1][1] == (1, 1, 11)
+    assert not pager.has_next(1)
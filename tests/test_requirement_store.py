@@ -0,0 +1,224 @@
+import os
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+from src.rag import requirement_store
+from src.rag.requirement_store import IngestionLeaseLost, RequirementStore, ScopedStoreView
+from src.utils.deadline import Deadline, DeadlineExceeded
+
+
+DIMENSION = 16
+
+TENDER_A = [
+    "The contractor shall hold a CIDB grading of G7 or higher.",
+    "All site staff must complete a safety induction before starting work.",
+    "Payment is made within 30 days of an approved invoice.",
+]
+TENDER_B = [
+    "Quality management shall comply with ISO 9001.",
+    "All site staff must complete a safety induction before starting work.",
+]
+
+
+def embedding(text):
+    return np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(DIMENSION).astype("float32")
+
+
+class FakeEmbedder:
+    """
+    Deterministic embed_texts; raises DeadlineExceeded on the calls
+    listed in fail_on (1-based).
+    """
+
+    def __init__(self, fail_on=()):
+        self.calls = []
+        self.fail_on = set(fail_on)
+
+    def __call__(self, texts, deadline=None):
+        self.calls.append(list(texts))
+        if len(self.calls) in self.fail_on:
+            raise DeadlineExceeded("embedding")
+        return np.stack([embedding(t) for t in texts])
+
+    @property
+    def embedded(self):
+        return [t for call in self.calls for t in call]
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    fake = FakeEmbedder()
+    monkeypatch.setattr(requirement_store, "embed_texts", fake)
+    return fake
+
+
+@pytest.fixture(params=["flat", "fp16", "pq"])
+def store(request, tmp_path, monkeypatch, embedder):
+    monkeypatch.setattr(requirement_store, "VECTOR_STORAGE", request.param)
+    return RequirementStore(str(tmp_path / "store"))
+
+
+def add(store, name, chunks, **kwargs):
+    return store.add_document(name, "\n".join(chunks).encode("utf-8"), chunks, **kwargs)
+
+
+def top_text(store, text, document_ids=None):
+    return store.search(embedding(text), top_k=1, document_ids=document_ids)
+
+
+def test_add_and_search(store, embedder):
+    result = add(store, "a.pdf", TENDER_A, metadata={"project": "N2"})
+
+    assert result["added"] and result["embedded_chunks"] == 3
+    assert [(d["name"], d["status"], d["chunk_count"]) for d in store.list_documents()] == [("a.pdf", "ready", 3)]
+    assert store.list_documents({"project": "N3"}) == []
+    assert top_text(store, TENDER_A[2]) == [TENDER_A[2]]
+
+
+def test_identical_content_is_not_added_twice(store, embedder):
+    first = add(store, "a.pdf", TENDER_A)
+    again = add(store, "copy.pdf", TENDER_A)
+
+    assert again == {
+        "document_id": first["document_id"],
+        "added": False,
+        "embedded_chunks": 0,
+        "duplicate_chunks": 0,
+    }
+    assert len(embedder.embedded) == 3
+
+
+def test_shared_chunks_are_embedded_once(store, embedder):
+    add(store, "a.pdf", TENDER_A)
+    result = add(store, "b.pdf", TENDER_B)
+
+    assert result["embedded_chunks"] == 1 and result["duplicate_chunks"] == 1
+    assert embedder.embedded.count(TENDER_B[1]) == 1
+    assert {d["name"]: d["duplicate_chunks"] for d in store.list_documents()} == {"a.pdf": 0, "b.pdf": 1}
+
+
+def test_delete_hands_shared_vectors_to_remaining_documents(store, embedder):
+    doc_a = add(store, "a.pdf", TENDER_A)["document_id"]
+    doc_b = add(store, "b.pdf", TENDER_B)["document_id"]
+
+    assert store.delete_document(doc_a)
+    assert not store.delete_document(doc_a)
+
+    assert [d["document_id"] for d in store.list_documents()] == [doc_b]
+    assert top_text(store, TENDER_B[1]) == [TENDER_B[1]]
+    assert top_text(store, TENDER_A[0]) != [TENDER_A[0]]
+    assert [c["text"] for c in store.get_chunks([doc_b])] == TENDER_B
+
+    # The survivor's chunk owns the vector now, so adding A back embeds it again
+    add(store, "a.pdf", TENDER_A)
+    assert embedder.embedded.count(TENDER_B[1]) == 1
+
+
+def test_state_survives_reopening(store, embedder):
+    doc_a = add(store, "a.pdf", TENDER_A)["document_id"]
+    add(store, "b.pdf", TENDER_B)
+    store.delete_document(doc_a)
+
+    reopened = RequirementStore(store.path)
+
+    assert [d["name"] for d in reopened.list_documents()] == ["b.pdf"]
+    assert top_text(reopened, TENDER_B[0]) == [TENDER_B[0]]
+
+
+def test_search_scoped_to_documents(store, embedder):
+    doc_a = add(store, "a.pdf", TENDER_A)["document_id"]
+    doc_b = add(store, "b.pdf", TENDER_B)["document_id"]
+
+    assert top_text(store, TENDER_A[0], document_ids=[doc_b]) != [TENDER_A[0]]
+    # B's duplicate chunk is searched through the vector held by A
+    assert top_text(store, TENDER_B[1], document_ids=[doc_b]) == [TENDER_B[1]]
+    assert store.search_ids(embedding(TENDER_A[0]), document_ids=["missing"]) == []
+    assert len(store.search_ids(embedding(TENDER_A[0]), top_k=10, document_ids=[doc_a, doc_b])) == 4
+
+
+def test_resume_after_deadline(tmp_path, monkeypatch):
+    monkeypatch.setattr(requirement_store, "EMBED_BATCH_SIZE", 2)
+    embedder = FakeEmbedder(fail_on=[2])
+    monkeypatch.setattr(requirement_store, "embed_texts", embedder)
+    store = RequirementStore(str(tmp_path / "store"))
+    chunks = [f"Clause {n}: requirement number {n} of the specification." for n in range(5)]
+
+    deadline = Deadline(60)
+    first = add(store, "spec.pdf", chunks, deadline=deadline)
+
+    assert first["partial"] and first["embedded_chunks"] == 2
+    assert store.list_documents()[0]["status"] == "partial"
+    assert deadline.degraded == [{"stage": "ingestion", "reason": "spec.pdf: 2/5 chunks indexed"}]
+
+    second = add(store, "spec.pdf", chunks, deadline=Deadline(60))
+
+    assert second["added"] and second["embedded_chunks"] == 3
+    assert [(d["status"], d["chunk_count"]) for d in store.list_documents()] == [("ready", 5)]
+    assert [c["text"] for c in store.get_chunks([first["document_id"]])] == chunks
+    assert sorted(embedder.embedded) == sorted(chunks + chunks[2:4])
+
+
+def test_failed_document_can_be_resumed(store, embedder):
+    content = "\n".join(TENDER_A).encode("utf-8")
+    doc_id = store.begin_document("a.pdf", content)
+    store.append_chunks(doc_id, TENDER_A[:1])
+    store.finish_document(doc_id, status="failed")
+
+    result = store.add_document("a.pdf", content, TENDER_A)
+
+    assert result["document_id"] == doc_id and result["embedded_chunks"] == 2
+    assert store.list_documents()[0]["status"] == "ready"
+    assert store.begin_document("a.pdf", content) is None
+
+
+def test_abandoned_ingestion_is_taken_over_once_its_lease_expires(tmp_path, embedder):
+    path = str(tmp_path / "store")
+    content = "\n".join(TENDER_A).encode("utf-8")
+
+    crashed = RequirementStore(path)
+    doc_id = crashed.begin_document("a.pdf", content)
+    crashed.append_chunks(doc_id, TENDER_A[:1])
+
+    other = RequirementStore(path)
+    assert other.begin_document("a.pdf", content) is None
+    assert other.is_stored(doc_id)
+
+    # No heartbeat for longer than the lease
+    stale = time.time() - requirement_store.INGEST_LEASE_SEC - 1
+    os.utime(os.path.join(path, "leases", doc_id), (stale, stale))
+
+    assert not other.is_stored(doc_id)
+    assert other.begin_document("a.pdf", content) == doc_id
+
+    with pytest.raises(IngestionLeaseLost):
+        crashed.append_chunks(doc_id, TENDER_A[1:])
+    crashed.finish_document(doc_id, status="failed")
+    assert other.list_documents()[0]["status"] == "ingesting"
+
+    other.append_chunks(doc_id, TENDER_A[other.stored_chunk_count(doc_id):])
+    other.finish_document(doc_id)
+
+    assert [(d["status"], d["chunk_count"]) for d in other.list_documents()] == [("ready", 3)]
+    assert not os.path.exists(os.path.join(path, "leases", doc_id))
+
+
+def test_deleted_document_stops_its_ingestion(store, embedder):
+    doc_id = store.begin_document("a.pdf", b"content")
+    store.delete_document(doc_id)
+
+    with pytest.raises(IngestionLeaseLost):
+        store.append_chunks(doc_id, TENDER_A)
+
+
+def test_scoped_view_reports_every_duplicate_position(store, embedder):
+    doc_a = add(store, "a.pdf", TENDER_A)["document_id"]
+    doc_b = add(store, "b.pdf", TENDER_B)["document_id"]
+    view = ScopedStoreView(store, [doc_a, doc_b], store.get_chunks([doc_a, doc_b]))
+
+    assert len(view.text_chunks) == 5
+    hits = view.search_ids(embedding(TENDER_A[1]), top_k=2)
+    assert sorted(pos for pos, _ in hits) == [1, 4]
+    assert hits[0][1] == hits[1][1]
@@ -0,0 +1,69 @@
+import copy
+
+import pytest
+
+from src.loadtest.backends import FakeBackends, StageRecorder
+from src.loadtest.harness import DEFAULT_PROFILE
+from src.sql_agent import sql_agent
+from src.sql_agent.sql_agent import run_sql_agent
+from src.sql_agent.template_cache import SQLTemplateStore
+
+
+QUERY = "List construction vendors in Gauteng"
+
+
+@pytest.fixture
+def templates(tmp_path, monkeypatch):
+    profile = copy.deepcopy(DEFAULT_PROFILE)
+    for name in profile["latency_ms"]:
+        profile["latency_ms"][name] = {"median": 0.001, "p95": 0.002}
+
+    store = SQLTemplateStore(str(tmp_path / "sql_templates.json"))
+    monkeypatch.setattr(sql_agent, "template_store", store)
+    with FakeBackends(profile, StageRecorder()).install():
+        yield store
+
+
+def test_second_run_uses_the_recorded_template(templates):
+    first = run_sql_agent(QUERY)
+    second = run_sql_agent(QUERY)
+
+    assert first["success"] and first["sql_source"] == "generated"
+    assert second["success"] and second["sql_source"] == "template"
+    assert second["sql_params"]
+
+
+def test_failing_template_is_dropped_and_sql_generated(templates, monkeypatch):
+    run_sql_agent(QUERY)
+    for template in templates.templates.values():
+        template["sql"] = template["sql"].replace("SELECT", "SELECT RenamedColumn,", 1)
+    templates._save()
+
+    execute = sql_agent.execute_sql_query
+
+    def fail_on_renamed_column(sql, params=None, deadline=None):
+        if "RenamedColumn" in sql:
+            return {"success": False, "deadline_exceeded": False, "error": "Invalid column name 'RenamedColumn'."}
+        return execute(sql, params=params, deadline=deadline)
+
+    monkeypatch.setattr(sql_agent, "execute_sql_query", fail_on_renamed_column)
+    result = run_sql_agent(QUERY)
+
+    assert result["success"] and result["sql_source"] == "generated"
+    assert "RenamedColumn" not in result["sql"]
+    # Re-recorded from the generated SQL
+    assert [t["sql"] for t in templates.templates.values() if "RenamedColumn" in t["sql"]] == []
+    assert run_sql_agent(QUERY)["sql_source"] == "template"
+
+
+def test_templates_are_keyed_by_schema_version(templates, monkeypatch):
+    run_sql_agent(QUERY)
+    schema = sql_agent.get_current_schema()
+    changed = dict(schema, version={"max_modify_date": "2026-10-19T00:00:00", "object_count": 99})
+    monkeypatch.setattr(sql_agent, "get_current_schema", lambda: changed)
+
+    result = run_sql_agent(QUERY)
+
+    assert result["sql_source"] == "generated"
+    # Templates of the old version were replaced
+    assert len(templates.templates) == 1
@@ -0,0 +1,134 @@
+from src.sql_agent.template_cache import (
+    SQLTemplateStore,
+    bind_template,
+    extract_template,
+    plan_signature,
+)
+
+
+SQL = (
+    "SELECT TOP 100 VendorName FROM Vendors "
+    "WHERE Certification LIKE '%CIDB G7%' AND State = N'TX' AND Employees > 50"
+)
+FILTERS = {"grade": "CIDB G7", "state": "TX", "min_employees": 50}
+
+
+def plan(**filters):
+    return {
+        "tables": ["Vendors"],
+        "columns": ["VendorName"],
+        "filters": filters,
+        "aggregations": {},
+    }
+
+
+def test_round_trip_keeps_like_wildcards():
+    template = extract_template(SQL, FILTERS)
+
+    assert template["sql"] == (
+        "SELECT TOP 100 VendorName FROM Vendors "
+        "WHERE Certification LIKE %s AND State = %s AND Employees > %s"
+    )
+    assert bind_template(template, FILTERS)[1] == ("%CIDB G7%", "TX", 50)
+    assert bind_template(template, {"grade": "CIDB G5", "state": "KZN", "min_employees": 10})[1] == (
+        "%CIDB G5%", "KZN", 10
+    )
+
+
+def test_whole_literal_match_is_case_insensitive():
+    template = extract_template("SELECT * FROM V WHERE Grade = 'cidb g7'", {"grade": "CIDB G7"})
+
+    assert template["bindings"] == [{"key": "grade", "prefix": "", "suffix": ""}]
+    assert bind_template(template, {"grade": "CIDB G3"}) == (
+        "SELECT * FROM V WHERE Grade = %s", ("CIDB G3",)
+    )
+
+
+def test_single_character_wildcards_are_kept():
+    template = extract_template("SELECT * FROM V WHERE Code LIKE '_G7%'", {"grade": "G7"})
+
+    assert bind_template(template, {"grade": "G5"})[1] == ("_G5%",)
+
+
+def test_value_inside_other_text_is_not_templated():
+    # Binding "Penang" next time would query 'Kuala Penang'
+    assert extract_template("SELECT * FROM V WHERE City = 'Kuala Selangor'", {"state": "Selangor"}) is None
+    assert extract_template("SELECT * FROM V WHERE Cert LIKE '%CIDB G7%'", {"grade": "G7"}) is None
+    assert extract_template("SELECT * FROM V WHERE Grade = 'cidb g7'", {"grade": "G7"}) is None
+
+
+def test_escaped_quotes_and_percent_signs():
+    sql = "SELECT * FROM V WHERE Name = 'O''Brien' AND Note LIKE 'A%'"
+    template = extract_template(sql, {"name": "O'Brien"})
+
+    assert template["sql"] == "SELECT * FROM V WHERE Name = %s AND Note LIKE 'A%%'"
+    assert bind_template(template, {"name": "D'Arcy"})[1] == ("D'Arcy",)
+
+
+def test_ambiguous_or_missing_values_are_not_templated():
+    # "7" appears both inside 'CIDB G7' and as the number 7
+    assert extract_template("SELECT * FROM V WHERE Cert = 'CIDB G7' AND Years > 7", {"years": 7}) is None
+    # Two string literals contain "G7"
+    assert extract_template("SELECT * FROM V WHERE A = 'G7' OR B = 'CIDB G7'", {"grade": "G7"}) is None
+    assert extract_template("SELECT * FROM V WHERE Grade = 'G5'", {"grade": "G7"}) is None
+
+
+def test_numbers_only_match_whole_literals():
+    template = extract_template("SELECT TOP 100 * FROM V WHERE Years > 10", {"years": 10})
+
+    assert template["sql"] == "SELECT TOP 100 * FROM V WHERE Years > %s"
+
+
+def test_sql_without_filters_is_kept_verbatim():
+    sql = "SELECT * FROM V WHERE Note LIKE 'A%'"
+
+    assert bind_template(extract_template(sql, {}), {}) == (sql, None)
+
+
+def test_signature_ignores_filter_values_only():
+    assert plan_signature(plan(grade="G7")) == plan_signature(plan(grade="G5"))
+    assert plan_signature(plan(grade="G7")) != plan_signature(plan(state="TX"))
+    assert plan_signature(plan(grade=["G7", "G5"])) is None
+
+
+def test_store_records_and_looks_up_across_instances(tmp_path):
+    path = str(tmp_path / "templates.json")
+    store = SQLTemplateStore(path)
+
+    assert store.record(plan(**FILTERS), SQL)
+    assert not store.record(plan(grade=["G7"]), SQL)
+
+    reloaded = SQLTemplateStore(path)
+    assert reloaded.lookup(plan(grade="CIDB G5", state="TX", min_employees=5)) == (
+        "SELECT TOP 100 VendorName FROM Vendors "
+        "WHERE Certification LIKE %s AND State = %s AND Employees > %s",
+        ("%CIDB G5%", "TX", 5),
+    )
+    assert reloaded.lookup(plan(grade="G5")) is None
+
+
+def test_schema_version_is_part_of_the_key(tmp_path):
+    store = SQLTemplateStore(str(tmp_path / "templates.json"))
+    old, new = {"object_count": 10}, {"object_count": 11}
+
+    assert plan_signature(plan(grade="G7"), old) != plan_signature(plan(grade="G7"), new)
+
+    store.record(plan(**FILTERS), SQL, old)
+    assert store.lookup(plan(**FILTERS), old) is not None
+    assert store.lookup(plan(**FILTERS), new) is None
+
+    # Recording under the new version drops the old one's templates
+    store.record(plan(grade="G7"), "SELECT * FROM Vendors WHERE Grade = 'G7'", new)
+    assert store.lookup(plan(**FILTERS), old) is None
+    assert len(SQLTemplateStore(store.path).templates) == 1
+
+
+def test_discard_drops_one_template(tmp_path):
+    store = SQLTemplateStore(str(tmp_path / "templates.json"))
+    store.record(plan(**FILTERS), SQL)
+    store.record(plan(grade="G7"), "SELECT * FROM Vendors WHERE Grade = 'G7'")
+
+    assert store.discard(plan(grade="G5"))
+    assert not store.discard(plan(grade="G5"))
+    assert SQLTemplateStore(store.path).lookup(plan(grade="G5")) is None
+    assert SQLTemplateStore(store.path).lookup(plan(**FILTERS)) is not None